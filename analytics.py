@@ -0,0 +1,140 @@
+# analytics.py
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+DAY = np.timedelta64(1, "D")
+
+
+class ExerciseAnalytics:
+    """
+    Stats par (user, exercice) calculées en colonnes (pandas/NumPy) :
+    - performances mises en DataFrame typé (user_id / exercise_id catégoriels,
+      dates datetime64, poids et reps float64)
+    - agrégats en un seul groupby : séances, volume, charge max, dernière date,
+      1RM estimé (Epley), volume de la dernière semaine, tendance (kg / semaine)
+    Reconstruit entièrement quand la table de perfs est rechargée ; après un ajout ou
+    une suppression (add / remove), seuls les groupes du user touché sont recalculés.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dirty_lock = threading.Lock()  # jamais tenu pendant un calcul (appelé depuis la boucle)
+        self._source = None
+        self._version = -1
+        self._stats = {}  # user_id -> {exercise_id: stats}
+        self._dirty = set()  # users dont une perf a changé depuis le dernier calcul
+
+    def is_current(self, perfs) -> bool:
+        return self._source is perfs and self._version == perfs.version and not self._dirty
+
+    def ensure(self, perfs):
+        with self._lock:
+            if self.is_current(perfs):
+                return
+            if self._source is perfs and self._dirty:
+                self._refresh_users(perfs)
+            else:
+                # Nouvelle table, ou changement de version sans user noté : tout recalculer
+                self._build(perfs)
+
+    # ---------- mises à jour incrémentales ----------
+
+    def add(self, row):
+        with self._dirty_lock:
+            self._dirty.add(str(row.user_id))
+
+    def remove(self, row):
+        self.add(row)
+
+    def for_user(self, user_id) -> dict:
+        """exercise_id -> stats (seulement les exercices ayant au moins une perf)."""
+        return self._stats.get(str(user_id), {})
+
+    # ---------- construction ----------
+
+    @staticmethod
+    def _frame(rows: list) -> pd.DataFrame:
+        # _weight / _reps / _date sont déjà convertis par PerformanceRecord
+        dates = [r._date.replace(tzinfo=None) if r._date is not None else None for r in rows]
+        return pd.DataFrame({
+            "user_id": pd.Categorical([str(r.user_id) for r in rows]),
+            "exercise_id": pd.Categorical([str(r.exercise_id) for r in rows]),
+            "date": pd.to_datetime(pd.Series(dates, dtype="object")),
+            "weight": np.array([np.nan if r._weight is None else r._weight for r in rows], dtype="float64"),
+            "reps": np.array([np.nan if r._reps is None else r._reps for r in rows], dtype="float64"),
+        })
+
+    def _build(self, perfs):
+        with self._dirty_lock:
+            self._dirty = set()
+        version = perfs.version
+        self._stats = self._compute(self._frame(list(perfs.rows)))
+        self._source = perfs
+        self._version = version
+
+    def _refresh_users(self, perfs):
+        """Recalcule seulement les (user, exercice) des users notés par add / remove."""
+        with self._dirty_lock:
+            users, self._dirty = self._dirty, set()
+        # Version lue avant les lignes : une modif arrivée entre-temps renotera son user
+        version = perfs.version
+        rows = [r for user_id in users for r in perfs.for_user(user_id)]
+        stats = self._compute(self._frame(rows))
+        for user_id in users:
+            if user_id in stats:
+                self._stats[user_id] = stats[user_id]
+            else:
+                self._stats.pop(user_id, None)
+        self._version = version
+
+    @staticmethod
+    def _compute(df: pd.DataFrame) -> dict:
+        """user_id -> {exercise_id: stats} pour les lignes de `df`."""
+        stats = {}
+        if len(df):
+            df["tonnage"] = df["weight"] * df["reps"]
+            df["e1rm"] = df["weight"] * (1 + df["reps"] / 30)
+
+            # Semaine (lundi) de chaque perf, et dernière semaine travaillée par exercice
+            df["week"] = df["date"].dt.normalize() - pd.to_timedelta(df["date"].dt.dayofweek, unit="D")
+            keys = ["user_id", "exercise_id"]
+            last_week = df.groupby(keys, observed=True)["week"].transform("max")
+            df["last_week_tonnage"] = df["tonnage"].where(df["week"] == last_week)
+
+            # Régression poids ~ jours, par sommes (sans boucle par groupe)
+            valid = df["weight"].notna() & df["date"].notna()
+            x = ((df["date"] - df["date"].min()) / DAY).where(valid)
+            y = df["weight"].where(valid)
+            df["n"] = valid.astype("float64")
+            df["x"], df["y"], df["xy"], df["xx"] = x, y, x * y, x * x
+
+            agg = df.groupby(keys, observed=True, sort=False).agg(
+                sessions=("weight", "size"),
+                volume=("weight", "sum"),
+                max_weight=("weight", "max"),
+                last_date=("date", "max"),
+                est_1rm=("e1rm", "max"),
+                weekly_volume=("last_week_tonnage", "sum"),
+                n=("n", "sum"), sx=("x", "sum"), sy=("y", "sum"), sxy=("xy", "sum"), sxx=("xx", "sum"),
+            )
+            denom = agg["n"] * agg["sxx"] - agg["sx"] ** 2
+            agg["trend"] = ((agg["n"] * agg["sxy"] - agg["sx"] * agg["sy"]) / denom * 7).where(
+                (agg["n"] >= 2) & (denom > 0)
+            )
+
+            for (user_id, exercise_id), s in zip(agg.index, agg.itertuples(index=False)):
+                stats.setdefault(user_id, {})[exercise_id] = {
+                    "sessions": int(s.sessions),
+                    "volume": float(s.volume),
+                    "max_weight": None if pd.isna(s.max_weight) else float(s.max_weight),
+                    "last_date": None if pd.isna(s.last_date) else s.last_date.to_pydatetime(),
+                    "est_1rm": None if pd.isna(s.est_1rm) else round(float(s.est_1rm), 1),
+                    "weekly_volume": round(float(s.weekly_volume), 1),
+                    "trend": None if pd.isna(s.trend) else round(float(s.trend), 2),
+                }
+
+        return stats
@@ -0,0 +1,104 @@
+# bench/datasets.py
+
+import random
+import uuid
+from datetime import date, datetime, timedelta
+
+import bcrypt
+
+from storage import TABLES
+
+
+# -------------------
+# JEUX DE DONNÉES (déterministes pour une graine donnée)
+# -------------------
+
+SCALES = {
+    "small": {"users": 100, "performances": 10_000},
+    "medium": {"users": 1_000, "performances": 100_000},
+    "full": {"users": 1_000, "performances": 1_000_000},
+}
+
+PASSWORD = "bench-password"
+
+CATALOG = [
+    ("Développé couché", "pecs"), ("Squat", "jambes"), ("Soulevé de terre", "dos"),
+    ("Développé militaire", "épaules"), ("Tractions", "dos"), ("Rowing barre", "dos"),
+    ("Fentes", "jambes"), ("Curl biceps", "bras"), ("Dips", "triceps"), ("Hip thrust", "fessiers"),
+    ("Presse à cuisses", "jambes"), ("Gainage", "abdos"),
+]
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+class Dataset:
+    """
+    Onglets users / exercises / performances (en-tête + lignes, ordre de TABLES).
+    Tous les users ont le même mot de passe (PASSWORD) : un seul hash bcrypt
+    est calculé, au coût `rounds`, et partagé.
+    """
+
+    def __init__(self, users: int = 1_000, performances: int = 100_000, exercises_per_user: int = 8,
+                 rounds: int = 12, days: int = 365, seed: int = 42):
+        self.rounds = rounds
+        rng = random.Random(seed)
+        password_hash = bcrypt.hashpw(PASSWORD.encode("utf-8"), bcrypt.gensalt(rounds=rounds)).decode("utf-8")
+        start = datetime(2024, 1, 1)
+
+        self.users = [list(TABLES["users"])]
+        self.exercises = [list(TABLES["exercises"])]
+        self.performances = [list(TABLES["performances"])]
+        self.user_ids = []
+        self.usernames = []
+        self.exercises_of = {}
+
+        for i in range(users):
+            user_id = _uuid(rng)
+            username = f"athlete{i:04d}"
+            self.user_ids.append(user_id)
+            self.usernames.append(username)
+            self.users.append([
+                user_id, username, password_hash, "admin" if i == 0 else "user",
+                rng.choice(["M", "F"]), rng.randint(16, 65), rng.randint(150, 200),
+                "TRUE", (start + timedelta(minutes=i)).isoformat(),
+            ])
+
+            ids = []
+            for name, zone in rng.sample(CATALOG, min(exercises_per_user, len(CATALOG))):
+                exercise_id = _uuid(rng)
+                ids.append(exercise_id)
+                self.exercises.append([
+                    exercise_id, user_id, name, zone, "", (start + timedelta(minutes=i)).isoformat(),
+                ])
+            self.exercises_of[user_id] = ids
+
+        first_day = date(2025, 1, 1)
+        created = datetime(2025, 1, 1)
+        for i in range(performances):
+            user_id = self.user_ids[rng.randrange(users)]
+            weight = rng.randrange(0, 61) * 2.5
+            self.performances.append([
+                _uuid(rng),
+                user_id,
+                rng.choice(self.exercises_of[user_id]),
+                (first_day + timedelta(days=rng.randrange(days))).isoformat(),
+                weight if weight else "",
+                rng.randint(3, 15),
+                rng.randint(5, 10),
+                "",
+                (created + timedelta(seconds=i * 30)).isoformat(),
+            ])
+
+    @classmethod
+    def scale(cls, name: str, **kwargs) -> "Dataset":
+        return cls(**{**SCALES[name], **kwargs})
+
+    def tabs(self, names: dict) -> dict:
+        """Onglets pour FakeSpreadsheet ; `names` = table -> nom d'onglet."""
+        return {
+            names["users"]: self.users,
+            names["exercises"]: self.exercises,
+            names["performances"]: self.performances,
+        }
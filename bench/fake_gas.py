@@ -0,0 +1,124 @@
+# bench/fake_gas.py
+
+import json
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from chat import ts_value
+
+
+# -------------------
+# FAUX WEBAPP GAS (chat) : serveur HTTP local, latence injectée
+# -------------------
+
+class FakeGas:
+    """
+    Reproduit le WebApp Apps Script du chat :
+    - GET  ?action=ping
+    - GET  ?action=list&room=&limit=&before_ts=   -> {"ok": true, "items": [...]}
+    - POST {"action": "send", room, user_id, username, message} -> {"ok": true, "id", "ts"}
+    Chaque requête dort `latency` secondes (GAS répond rarement en moins de 300 ms).
+    """
+
+    def __init__(self, latency: float = 0.3, history: int = 500, rooms=("general",)):
+        self.latency = latency
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._rooms = defaultdict(list)
+        self._server = None
+        self._thread = None
+
+        t0 = time.time() - history * 30
+        for room in rooms:
+            for i in range(history):
+                self._rooms[room].append({
+                    "id": str(uuid.uuid4()),
+                    "ts": t0 + i * 30,
+                    "user": f"athlete{i % 97:04d}",
+                    "message": f"Message {i}",
+                })
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/exec"
+
+    def start(self):
+        gas = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                query = {k: v[-1] for k, v in parse_qs(urlparse(self.path).query).items()}
+                self._reply(gas.handle(query))
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    payload = {}
+                self._reply(gas.handle(payload))
+
+            def _reply(self, data: dict):
+                body = json.dumps(data).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-gas", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def handle(self, data: dict) -> dict:
+        action = data.get("action") or ""
+        with self._lock:
+            self.calls[action] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        room = data.get("room") or "general"
+        if action == "ping":
+            return {"ok": True}
+
+        if action == "list":
+            limit = max(1, min(int(data.get("limit") or 50), 200))
+            with self._lock:
+                items = self._rooms[room]
+                if data.get("before_ts"):
+                    before = ts_value(data["before_ts"])
+                    items = [m for m in items if m["ts"] < before]
+                return {"ok": True, "items": list(items[-limit:])}
+
+        if action == "send":
+            message = {
+                "id": str(uuid.uuid4()),
+                "ts": time.time(),
+                "user": data.get("username") or "Profil",
+                "message": data.get("message") or "",
+            }
+            with self._lock:
+                self._rooms[room].append(message)
+            return {"ok": True, "id": message["id"], "ts": message["ts"]}
+
+        return {"ok": False, "error": f"action inconnue: {action}"}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"calls": dict(self.calls), "messages": {r: len(m) for r, m in self._rooms.items()}}
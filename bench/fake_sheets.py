@@ -0,0 +1,185 @@
+# bench/fake_sheets.py
+
+import random
+import threading
+import time
+from collections import Counter
+
+import gspread
+from gspread.utils import a1_range_to_grid_range, rowcol_to_a1
+
+
+# -------------------
+# FAUX GOOGLE SHEETS (en mémoire, latence injectée)
+# -------------------
+
+class _Response:
+    """Juste ce qu'il faut à gspread.exceptions.APIError (status_code + json())."""
+
+    def __init__(self, status: int, message: str):
+        self.status_code = status
+        self.text = message
+        self._message = message
+
+    def json(self):
+        return {"error": {"code": self.status_code, "message": self._message, "status": "RESOURCE_EXHAUSTED"}}
+
+
+def _cell(v) -> str:
+    """Valeur telle que renvoyée par l'API (FORMATTED_VALUE) : toujours du texte."""
+    if v is None:
+        return ""
+    if isinstance(v, bool):
+        return "TRUE" if v else "FALSE"
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v)
+
+
+def _trim(row: list) -> list:
+    """L'API omet les cellules vides en fin de ligne."""
+    end = len(row)
+    while end and row[end - 1] == "":
+        end -= 1
+    return row[:end]
+
+
+class FakeSpreadsheet:
+    """
+    Remplace gspread.Spreadsheet pour les appels utilisés par l'app
+    (values_batch_get, batch_update, worksheet). Chaque appel « réseau » :
+    - dort `latency` secondes (+ jitter uniforme dans [0, `jitter`])
+    - échoue en 429 avec la probabilité `error_rate` (chemin quota / backoff)
+    - est compté dans `calls`
+    """
+
+    def __init__(self, tabs: dict, latency: float = 0.15, jitter: float = 0.05, error_rate: float = 0.0,
+                 seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.RLock()
+        self._worksheets = {
+            name: FakeWorksheet(self, i + 1, name, values) for i, (name, values) in enumerate(tabs.items())
+        }
+
+    def _network(self, call: str):
+        with self._lock:
+            self.calls[call] += 1
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            throttled = self.error_rate and self._rng.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if throttled:
+            raise gspread.exceptions.APIError(_Response(429, "Quota exceeded (bench)"))
+
+    def worksheet(self, name: str) -> "FakeWorksheet":
+        self._network("worksheet")
+        try:
+            return self._worksheets[name]
+        except KeyError:
+            raise gspread.exceptions.WorksheetNotFound(name)
+
+    def values_batch_get(self, ranges: list, params: dict = None) -> dict:
+        self._network("values_batch_get")
+        with self._lock:
+            value_ranges = []
+            for rng in ranges:
+                name, _, a1 = rng.partition("!")
+                ws = self._worksheets[name.strip("'").replace("''", "'")]
+                value_ranges.append({"range": rng, "values": ws._slice(a1)})
+        return {"valueRanges": value_ranges}
+
+    def batch_update(self, body: dict) -> dict:
+        self._network("batch_update")
+        with self._lock:
+            by_id = {ws.id: ws for ws in self._worksheets.values()}
+            for request in body.get("requests", []):
+                rng = request["deleteDimension"]["range"]
+                del by_id[rng["sheetId"]]._values[rng["startIndex"]:rng["endIndex"]]
+        return {"replies": [{} for _ in body.get("requests", [])]}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": dict(self.calls),
+                "rows": {name: max(0, len(ws._values) - 1) for name, ws in self._worksheets.items()},
+            }
+
+
+class FakeWorksheet:
+    """
+    Onglet en mémoire (liste de lignes de texte, en-tête en 1re ligne).
+    Implémente les appels gspread historiques (get_all_records, get_all_values,
+    append_row, delete_rows) et ceux du code actuel (append_rows, batch_update).
+    """
+
+    def __init__(self, spreadsheet: FakeSpreadsheet, sheet_id: int, title: str, values: list):
+        self.spreadsheet = spreadsheet
+        self.id = sheet_id
+        self.title = title
+        self._values = [[_cell(v) for v in row] for row in values]
+
+    def _slice(self, a1: str) -> list:
+        """Plage A1 (vide = onglet entier) -> lignes, sans les cellules vides finales."""
+        if not a1:
+            rows = self._values
+            c0, c1 = 0, None
+        else:
+            grid = a1_range_to_grid_range(a1)
+            rows = self._values[grid.get("startRowIndex", 0):grid.get("endRowIndex")]
+            c0, c1 = grid.get("startColumnIndex", 0), grid.get("endColumnIndex")
+        out = [_trim(row[c0:c1]) for row in rows]
+        while out and not out[-1]:
+            out.pop()
+        return out
+
+    # ---------- lectures ----------
+
+    def get_all_values(self) -> list:
+        self.spreadsheet._network("get_all_values")
+        with self.spreadsheet._lock:
+            return [list(row) for row in self._values]
+
+    def get_all_records(self) -> list:
+        from storage import records_of
+        return records_of(self.get_all_values())
+
+    # ---------- écritures ----------
+
+    def append_row(self, row: list, **kwargs) -> dict:
+        return self.append_rows([row], **kwargs)
+
+    def append_rows(self, rows: list, **kwargs) -> dict:
+        self.spreadsheet._network("append_rows")
+        with self.spreadsheet._lock:
+            first = len(self._values) + 1
+            self._values.extend([_cell(v) for v in row] for row in rows)
+            last = len(self._values)
+        width = max((len(r) for r in rows), default=1)
+        return {"updates": {"updatedRange": f"{self.title}!A{first}:{rowcol_to_a1(last, width)}"}}
+
+    def batch_update(self, data: list, **kwargs) -> dict:
+        """Mises à jour de cellules [{"range": "C5", "values": [[v]]}, ...]."""
+        self.spreadsheet._network("values_batch_update")
+        with self.spreadsheet._lock:
+            for item in data:
+                grid = a1_range_to_grid_range(item["range"])
+                r0, c0 = grid["startRowIndex"], grid["startColumnIndex"]
+                for i, values in enumerate(item["values"]):
+                    while len(self._values) <= r0 + i:
+                        self._values.append([])
+                    row = self._values[r0 + i]
+                    for j, v in enumerate(values):
+                        while len(row) <= c0 + j:
+                            row.append("")
+                        row[c0 + j] = _cell(v)
+        return {"totalUpdatedCells": sum(len(v) for item in data for v in item["values"])}
+
+    def delete_rows(self, start_index: int, end_index: int = None) -> dict:
+        self.spreadsheet._network("delete_rows")
+        with self.spreadsheet._lock:
+            del self._values[start_index - 1:(end_index or start_index)]
+        return {}
@@ -0,0 +1,165 @@
+# bench/run.py
+"""
+Banc de charge local : l'app complète (main.app, cache, quotas, batchGet, bcrypt...)
+servie en mémoire via httpx.ASGITransport, contre un faux Google Sheets et un faux
+WebApp GAS avec latences injectées. Rien ne sort de la machine.
+
+    python -m bench.run                                  # 1k users, 100k perfs
+    python -m bench.run --scale full                     # 1k users, 1M perfs
+    python -m bench.run --scenarios login,chat --concurrency 32 --requests 1000
+    python -m bench.run --json bench.json                # résultats pour comparaison
+    python -m bench.run --baseline bench.json            # code retour 1 si régression
+
+Les variables d'environnement de l'app (SHEETS_READS_PER_MINUTE, CACHE_TTL_*,
+BCRYPT_WORKERS...) s'appliquent comme en production.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import httpx
+
+from bench.datasets import Dataset, SCALES
+from bench.fake_gas import FakeGas
+from bench.fake_sheets import FakeSpreadsheet
+from bench.scenarios import SCENARIOS, run_scenario, report, compare
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Banc de charge (faux Sheets + faux GAS)")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="medium")
+    parser.add_argument("--users", type=int, help="remplace le nombre de users de --scale")
+    parser.add_argument("--performances", type=int, help="remplace le nombre de perfs de --scale")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=300, help="requêtes par scénario")
+    parser.add_argument("--concurrency", type=int, default=16, help="clients simultanés")
+    parser.add_argument("--sheets-latency", type=float, default=0.15, help="secondes par appel Sheets")
+    parser.add_argument("--sheets-jitter", type=float, default=0.05)
+    parser.add_argument("--sheets-429-rate", type=float, default=0.0, help="probabilité de 429 par appel")
+    parser.add_argument("--gas-latency", type=float, default=0.3, help="secondes par appel GAS")
+    parser.add_argument("--bcrypt-rounds", type=int, default=int(os.environ.get("BCRYPT_ROUNDS", "12")))
+    parser.add_argument("--ready-timeout", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="écrit les résultats dans ce fichier")
+    parser.add_argument("--baseline", help="résultats précédents (--json) à comparer")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="écart toléré vs --baseline (0.2 = 20 %%)")
+    return parser.parse_args(argv)
+
+
+def _diff(after: dict, before: dict) -> dict:
+    return dict(Counter(after) - Counter(before))
+
+
+async def _wait_ready(client: httpx.AsyncClient, timeout: float) -> float:
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < timeout:
+        if (await client.get("/ready")).status_code == 200:
+            return time.perf_counter() - t0
+        await asyncio.sleep(0.05)
+    raise RuntimeError(f"App pas prête après {timeout:.0f}s")
+
+
+async def bench(args, data: Dataset, spreadsheet: FakeSpreadsheet, gas: FakeGas) -> dict:
+    import main
+
+    results = []
+    out = {"scenarios": {}}
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            out["warmup_seconds"] = round(await _wait_ready(client, args.ready_timeout), 3)
+            print(f"✅ App prête en {out['warmup_seconds']:.2f}s")
+
+            for name in [s.strip() for s in args.scenarios.split(",") if s.strip()]:
+                sheets_before, gas_before = dict(spreadsheet.calls), dict(gas.calls)
+                result = await run_scenario(name, client, data, args.requests, args.concurrency, args.seed)
+                result.upstream = {
+                    **{f"sheets.{k}": v for k, v in _diff(spreadsheet.calls, sheets_before).items()},
+                    **{f"gas.{k}": v for k, v in _diff(gas.calls, gas_before).items()},
+                }
+                results.append(result)
+                out["scenarios"][name] = result.summary()
+
+            out["sheets"] = (await client.get("/api/sheets/stats")).json()
+
+    print()
+    print(report(results))
+    return out
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    unknown = [s for s in args.scenarios.split(",") if s.strip() and s.strip() not in SCENARIOS]
+    if unknown:
+        print(f"Scénarios inconnus: {', '.join(unknown)} (dispo: {', '.join(SCENARIOS)})")
+        return 2
+
+    os.chdir(ROOT)  # static/ et templates/ sont relatifs
+    workdir = tempfile.mkdtemp(prefix="gym-bench-")
+
+    t0 = time.perf_counter()
+    sizes = {k: v for k, v in (("users", args.users), ("performances", args.performances)) if v}
+    data = Dataset.scale(args.scale, rounds=args.bcrypt_rounds, seed=args.seed, **sizes)
+    print(f"📦 Jeu de données : {len(data.users) - 1} users, {len(data.exercises) - 1} exercices, "
+          f"{len(data.performances) - 1} perfs ({time.perf_counter() - t0:.1f}s)")
+
+    gas = FakeGas(latency=args.gas_latency).start()
+
+    # Avant l'import de main : la config est lue au chargement du module
+    os.environ["STORAGE_BACKEND"] = "sheets"
+    os.environ["GS_CHAT_WEBAPP"] = gas.url
+    os.environ["CACHE_SNAPSHOT"] = ""
+    os.environ["WRITE_BEHIND_JOURNAL"] = os.path.join(workdir, "write_behind.jsonl")
+    os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    import main as app_main
+
+    names = {"users": app_main.USERS_SHEET, "exercises": app_main.EXERCISES_SHEET,
+             "performances": app_main.PERFORMANCES_SHEET}
+    spreadsheet = FakeSpreadsheet(data.tabs(names), latency=args.sheets_latency, jitter=args.sheets_jitter,
+                                  error_rate=args.sheets_429_rate, seed=args.seed)
+    app_main.SHEETS._spreadsheet = spreadsheet  # pas d'authentification : le client gspread n'est jamais créé
+
+    try:
+        out = asyncio.run(bench(args, data, spreadsheet, gas))
+    finally:
+        gas.stop()
+
+    out["config"] = {
+        "scale": args.scale,
+        "users": len(data.users) - 1,
+        "performances": len(data.performances) - 1,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "sheets_latency": args.sheets_latency,
+        "gas_latency": args.gas_latency,
+        "bcrypt_rounds": args.bcrypt_rounds,
+    }
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(out, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(out, json.load(f), args.tolerance)
+        if regressions:
+            print("\n❌ Régressions :")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print(f"\n✅ Pas de régression vs {args.baseline} (tolérance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
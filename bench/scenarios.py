@@ -0,0 +1,145 @@
+# bench/scenarios.py
+
+import asyncio
+import math
+import random
+import time
+from collections import Counter
+
+from bench.datasets import PASSWORD
+
+
+# -------------------
+# SCÉNARIOS (une requête par appel ; `state` propre à chaque client simulé)
+# -------------------
+
+async def leaderboard(client, data, rng: random.Random, state: dict):
+    """Top N paginé (3 fois sur 4), sinon voisinage d'un user."""
+    if rng.random() < 0.25:
+        return await client.get("/api/leaderboard", params={"user_id": rng.choice(data.user_ids), "window": 5})
+    return await client.get("/api/leaderboard", params={"offset": rng.randrange(0, 100, 20), "limit": 20})
+
+
+async def dashboard(client, data, rng: random.Random, state: dict):
+    """Ouverture du dashboard d'un user (user + exercices + perfs + exercice le moins travaillé)."""
+    return await client.get("/api/dashboard", params={"user_id": rng.choice(data.user_ids)})
+
+
+async def login(client, data, rng: random.Random, state: dict):
+    return await client.post("/api/login", json={"username": rng.choice(data.usernames), "password": PASSWORD})
+
+
+async def chat(client, data, rng: random.Random, state: dict):
+    """Polling du chat comme le front : If-None-Match avec le dernier ETag reçu."""
+    headers = {"If-None-Match": state["etag"]} if state.get("etag") else {}
+    response = await client.get("/api/chat/list", params={"room": "general", "limit": 50}, headers=headers)
+    if response.status_code == 200 and response.headers.get("etag"):
+        state["etag"] = response.headers["etag"]
+    return response
+
+
+SCENARIOS = {
+    "leaderboard": leaderboard,
+    "dashboard": dashboard,
+    "login": login,
+    "chat": chat,
+}
+
+
+# -------------------
+# EXÉCUTION + MESURES
+# -------------------
+
+def percentile(values: list, q: float) -> float:
+    """Rang le plus proche sur une liste triée ; 0 si vide."""
+    if not values:
+        return 0.0
+    k = max(0, min(len(values) - 1, math.ceil(q / 100 * len(values)) - 1))
+    return values[k]
+
+
+class Result:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies = []
+        self.statuses = Counter()
+        self.failures = Counter()
+        self.elapsed = 0.0
+        self.upstream = {}
+
+    @property
+    def errors(self) -> int:
+        return sum(n for status, n in self.statuses.items() if status >= 400) + sum(self.failures.values())
+
+    def summary(self) -> dict:
+        lat = sorted(self.latencies)
+        count = len(lat)
+        return {
+            "requests": count,
+            "errors": self.errors,
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+            "seconds": round(self.elapsed, 3),
+            "rps": round(count / self.elapsed, 1) if self.elapsed else 0.0,
+            "p50_ms": round(percentile(lat, 50) * 1000, 2),
+            "p90_ms": round(percentile(lat, 90) * 1000, 2),
+            "p99_ms": round(percentile(lat, 99) * 1000, 2),
+            "max_ms": round(lat[-1] * 1000, 2) if lat else 0.0,
+            "upstream": self.upstream,
+        }
+
+
+async def run_scenario(name: str, client, data, requests: int, concurrency: int, seed: int = 0) -> Result:
+    """`requests` requêtes réparties sur `concurrency` clients en boucle fermée."""
+    scenario = SCENARIOS[name]
+    result = Result(name)
+    remaining = [requests]
+
+    async def worker(i: int):
+        rng = random.Random(f"{seed}-{name}-{i}")
+        state = {}
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            t0 = time.perf_counter()
+            try:
+                response = await scenario(client, data, rng, state)
+                result.statuses[response.status_code] += 1
+            except Exception as e:
+                result.failures[type(e).__name__] += 1
+            result.latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(max(1, concurrency))))
+    result.elapsed = time.perf_counter() - t0
+    return result
+
+
+def report(results: list) -> str:
+    lines = [
+        f"{'scénario':<12} {'req':>7} {'err':>5} {'req/s':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    ]
+    for r in results:
+        s = r.summary()
+        lines.append(
+            f"{r.name:<12} {s['requests']:>7} {s['errors']:>5} {s['rps']:>9.1f} "
+            f"{s['p50_ms']:>9.2f} {s['p90_ms']:>9.2f} {s['p99_ms']:>9.2f} {s['max_ms']:>9.2f}"
+        )
+        if s["upstream"]:
+            calls = ", ".join(f"{k}={v}" for k, v in sorted(s["upstream"].items()))
+            lines.append(f"{'':<12} appels upstream : {calls}")
+    return "\n".join(lines)
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """Régressions vs une exécution précédente : p99 plus haut ou débit plus bas que `tolerance`."""
+    regressions = []
+    for name, base in baseline.get("scenarios", {}).items():
+        now = current["scenarios"].get(name)
+        if now is None:
+            continue
+        if base["p99_ms"] and now["p99_ms"] > base["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {base['p99_ms']} ms -> {now['p99_ms']} ms")
+        if base["rps"] and now["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: débit {base['rps']} -> {now['rps']} req/s")
+        if now["errors"] > base["errors"]:
+            regressions.append(f"{name}: erreurs {base['errors']} -> {now['errors']}")
+    return regressions
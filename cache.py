@@ -0,0 +1,157 @@
+# cache.py
+
+import threading
+import time
+from concurrent.futures import Future
+
+import anyio
+
+from metrics import Histogram
+
+
+CACHE_LOAD_SECONDS = Histogram("cache_load_duration_seconds", "Durée des chargements du cache", ["key", "outcome"])
+
+
+class _Entry:
+    def __init__(self, key, loader, ttl):
+        self.key = key
+        self.loader = loader
+        self.ttl = ttl
+
+        self.data = None
+        self.ts = float("-inf")
+        self.version = 0
+
+        self.lock = threading.Lock()
+        self.inflight = None  # Future du chargement en cours (single-flight)
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.errors = 0
+        self.last_load_ms = 0.0
+
+
+class Cache:
+    """
+    Cache "stale-while-revalidate" :
+    - donnée fraîche -> servie directement
+    - donnée expirée -> servie quand même, un seul rafraîchissement part en tâche de fond
+    - pas de donnée -> un seul appel au loader, les requêtes concurrentes attendent son résultat
+    TTL par clé, compteurs hit/miss/refresh par clé.
+    """
+
+    def __init__(self):
+        self._entries = {}
+
+    def register(self, key: str, loader, ttl: float):
+        self._entries[key] = _Entry(key, loader, ttl)
+
+    def get(self, key: str):
+        entry = self._entries[key]
+        data = entry.data
+
+        if data is not None:
+            if time.monotonic() - entry.ts <= entry.ttl:
+                entry.hits += 1
+            else:
+                entry.stale_hits += 1
+                self._refresh(entry, background=True)
+            return data
+
+        entry.misses += 1
+        return self._refresh(entry, background=False).result()
+
+    async def aget(self, key: str, limiter=None):
+        """
+        Version async de get : une donnée présente (fraîche ou périmée) est renvoyée
+        sans quitter la boucle ; un chargement à froid attend dans un thread.
+        """
+        if self._entries[key].data is not None:
+            return self.get(key)
+        return await anyio.to_thread.run_sync(self.get, key, limiter=limiter)
+
+    def prime(self, key: str, data, fresh: bool = False):
+        """
+        Donnée restaurée (snapshot disque). fresh=False : servie comme périmée,
+        le premier get déclenche un rafraîchissement en tâche de fond.
+        """
+        entry = self._entries[key]
+        with entry.lock:
+            if entry.data is None:
+                entry.data = data
+                entry.version += 1
+                if fresh:
+                    entry.ts = time.monotonic()
+
+    def invalidate(self, key: str):
+        """Donnée changée ailleurs (autre worker) : rechargement en tâche de fond, l'ancienne reste servie."""
+        entry = self._entries[key]
+        if entry.data is not None:
+            self._refresh(entry, background=True)
+
+    def peek(self, key: str):
+        """Donnée en cache sans déclencher de chargement (None si pas chargée)."""
+        return self._entries[key].data
+
+    def version(self, key: str) -> int:
+        return self._entries[key].version
+
+    # ---------- chargement ----------
+
+    def _refresh(self, entry: _Entry, background: bool) -> Future:
+        with entry.lock:
+            if entry.inflight is not None:
+                return entry.inflight
+            fut = entry.inflight = Future()
+
+        if background:
+            threading.Thread(target=self._load, args=(entry, fut), name=f"cache-{entry.key}", daemon=True).start()
+        else:
+            self._load(entry, fut)
+        return fut
+
+    def _load(self, entry: _Entry, fut: Future):
+        print(f"🔄 Refresh cache: {entry.key}")
+        t0 = time.monotonic()
+        try:
+            data = entry.loader()
+        except BaseException as e:
+            CACHE_LOAD_SECONDS.observe(time.monotonic() - t0, key=entry.key, outcome="error")
+            entry.errors += 1
+            print(f"⚠️ Refresh cache {entry.key} échoué: {e}")
+            with entry.lock:
+                entry.inflight = None
+            fut.set_exception(e)
+            return
+
+        entry.last_load_ms = (time.monotonic() - t0) * 1000
+        CACHE_LOAD_SECONDS.observe(entry.last_load_ms / 1000, key=entry.key, outcome="ok")
+        with entry.lock:
+            entry.data = data
+            entry.ts = time.monotonic()
+            entry.version += 1
+            entry.refreshes += 1
+            entry.inflight = None
+        fut.set_result(data)
+
+    # ---------- métriques ----------
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            key: {
+                "ttl": e.ttl,
+                "loaded": e.data is not None,
+                "age": round(now - e.ts, 1) if e.data is not None else None,
+                "version": e.version,
+                "hits": e.hits,
+                "stale_hits": e.stale_hits,
+                "misses": e.misses,
+                "refreshes": e.refreshes,
+                "errors": e.errors,
+                "last_load_ms": round(e.last_load_ms, 1),
+            }
+            for key, e in self._entries.items()
+        }
@@ -0,0 +1,239 @@
+# chat.py
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from conditional import RenderedCache
+
+
+def message_key(m: dict) -> str:
+    """Identité d'un message GAS (id si présent, sinon ts + auteur + texte)."""
+    if m.get("id"):
+        return str(m["id"])
+    return f'{m.get("ts")}_{m.get("user")}_{m.get("message")}'
+
+
+def ts_value(v) -> float:
+    """ts GAS (epoch ou ISO) -> nombre comparable ; 0 si illisible."""
+    if v in ["", None]:
+        return 0.0
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.fromisoformat(str(v).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return 0.0
+
+
+class _Room:
+    def __init__(self, buffer_size: int):
+        self.subscribers = set()
+        self.buffer = deque(maxlen=buffer_size)  # messages récents, du plus ancien au plus récent
+        self.keys = set()
+        self.loaded = False
+        self.complete = False   # le buffer contient tout l'historique de la room
+        self.fetched_at = float("-inf")
+        self.version = 0
+        self.task = None
+        self.wake = asyncio.Event()
+        self.fill_lock = asyncio.Lock()
+
+
+class ChatHub:
+    """
+    Chat côté serveur :
+    - ring buffer des derniers messages par room (rempli depuis GAS, complété par /send)
+    - /list servi depuis la mémoire (curseurs since / before_ts, ETag) ; GAS seulement
+      si le buffer est périmé ou si on pagine au-delà de ce qu'il contient
+    - un seul poller GAS par room tant qu'au moins un client écoute en SSE,
+      les nouveaux messages sont poussés à tous les abonnés
+    - erreur GAS (ok: false) renvoyée telle quelle, jamais mise en cache
+    - au plus `max_rooms` rooms en mémoire (noms choisis par le client) : les moins
+      récemment utilisées sans abonné sont oubliées
+    """
+
+    def __init__(self, gas, poll_interval: float = 2.0, limit: int = 50,
+                 buffer_size: int = 200, list_ttl: float = 2.0, queue_size: int = 100,
+                 max_rooms: int = 100):
+        self._gas = gas
+        self.poll_interval = poll_interval
+        self.limit = limit
+        self.buffer_size = buffer_size
+        self.list_ttl = list_ttl
+        self.queue_size = queue_size
+        self.max_rooms = max_rooms
+        self._rooms = OrderedDict()  # LRU
+
+    def _room(self, name: str) -> _Room:
+        room = self._rooms.get(name)
+        if room is None:
+            room = self._rooms[name] = _Room(self.buffer_size)
+            self._evict(keep=name)
+        else:
+            self._rooms.move_to_end(name)
+        return room
+
+    def _evict(self, keep: str):
+        excess = len(self._rooms) - self.max_rooms
+        if excess <= 0:
+            return
+        idle = [n for n, r in self._rooms.items() if n != keep and not r.subscribers and r.task is None]
+        for name in idle[:excess]:
+            del self._rooms[name]
+
+    # ---------- SSE ----------
+
+    @asynccontextmanager
+    async def subscribe(self, name: str):
+        """File d'événements (event, items) pour un client ; None = fermeture."""
+        room = self._room(name)
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        room.subscribers.add(queue)
+
+        if room.loaded:
+            queue.put_nowait(("snapshot", list(room.buffer)[-self.limit:]))
+        if room.task is None:
+            room.task = asyncio.create_task(self._poll(name, room))
+
+        try:
+            yield queue
+        finally:
+            room.subscribers.discard(queue)
+
+    def sent(self, name: str, message: dict = None):
+        """
+        Un message vient d'être envoyé : ajouté au buffer s'il est identifié
+        (id renvoyé par GAS), puis repoll de la room sans attendre l'intervalle.
+        """
+        room = self._rooms.get(name)
+        if room is None:
+            return
+        if message is not None and message.get("id"):
+            self._merge(room, [message])
+        else:
+            room.fetched_at = float("-inf")
+        room.wake.set()
+
+    async def close(self):
+        for room in self._rooms.values():
+            for queue in list(room.subscribers):
+                self._offer(queue, None)
+            if room.task is not None:
+                room.task.cancel()
+
+    # ---------- lecture (/api/chat/list) ----------
+
+    async def list(self, name: str, limit: int, since: str = "", before_ts: str = ""):
+        """
+        Renvoie (réponse, etag). etag vaut None quand la réponse vient directement
+        de GAS (page plus ancienne que le buffer).
+        """
+        room = self._room(name)
+        error = await self._ensure_fresh(name, room, limit)
+        if error is not None:
+            return error, None
+
+        items = list(room.buffer)
+        if since:
+            s = ts_value(since)
+            items = [m for m in items if ts_value(m.get("ts")) > s][:limit]
+        elif before_ts:
+            b = ts_value(before_ts)
+            older = [m for m in items if ts_value(m.get("ts")) < b]
+            if len(older) < limit and not room.complete:
+                # Au-delà du buffer : on va chercher la page chez GAS
+                data = await self._gas.get({
+                    "action": "list", "room": name, "limit": str(limit), "before_ts": before_ts,
+                })
+                return data, None
+            items = older[-limit:]
+        else:
+            items = items[-limit:]
+
+        # room.version est propre au process : ETag haché avec l'identifiant d'instance
+        # (même numéro dans deux workers != même buffer), sans nom de room en clair
+        etag = RenderedCache.etag(("chat", name, limit, since, before_ts), str(room.version))
+        return {"ok": True, "items": items}, etag
+
+    async def _ensure_fresh(self, name: str, room: _Room, limit: int):
+        """None si le buffer est à jour ; réponse GAS en erreur sinon (la room reste périmée)."""
+        # Un poller actif tient déjà le buffer à jour
+        if room.task is not None and room.loaded:
+            return
+        fresh = time.monotonic() - room.fetched_at <= self.list_ttl
+        if fresh and (room.complete or len(room.buffer) >= min(limit, self.buffer_size)):
+            return
+
+        async with room.fill_lock:
+            if time.monotonic() - room.fetched_at <= self.list_ttl:
+                return  # rempli par une requête concurrente
+            want = min(max(limit, self.limit), self.buffer_size)
+            data = await self._gas.get({"action": "list", "room": name, "limit": str(want)})
+            if not data or not data.get("ok"):
+                return data
+            items = data.get("items") or []
+            self._merge(room, items)
+            room.complete = len(items) < want
+            room.fetched_at = time.monotonic()
+
+    # ---------- interne ----------
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass  # client trop lent : il rattrapera au prochain snapshot
+
+    def _broadcast(self, room: _Room, event: str, items: list):
+        for queue in list(room.subscribers):
+            self._offer(queue, (event, items))
+
+    def _merge(self, room: _Room, items: list):
+        """Ajoute au buffer les messages inconnus (ordre chronologique) et prévient les abonnés."""
+        new = []
+        for m in items:
+            k = message_key(m)
+            if k not in room.keys:
+                room.keys.add(k)
+                new.append(m)
+
+        if new:
+            merged = sorted(list(room.buffer) + new, key=lambda m: ts_value(m.get("ts")))
+            room.buffer.clear()
+            room.buffer.extend(merged)  # maxlen : les plus anciens sortent
+            if len(merged) > self.buffer_size:
+                room.complete = False
+            room.keys = {message_key(m) for m in room.buffer}
+            room.version += 1
+
+        if not room.loaded:
+            room.loaded = True
+            self._broadcast(room, "snapshot", list(room.buffer)[-self.limit:])
+        elif new:
+            self._broadcast(room, "messages", new)
+
+    async def _poll(self, name: str, room: _Room):
+        try:
+            while room.subscribers:
+                try:
+                    data = await self._gas.get({"action": "list", "room": name, "limit": str(self.limit)})
+                    if data and data.get("ok"):
+                        self._merge(room, data.get("items") or [])
+                        room.fetched_at = time.monotonic()
+                except Exception as e:
+                    print(f"⚠️ Chat poll {name}: {e}")
+
+                try:
+                    await asyncio.wait_for(room.wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                room.wake.clear()
+        finally:
+            room.task = None
+            room.loaded = False  # plus d'abonnés : la prochaine connexion repart d'un snapshot frais
@@ -0,0 +1,136 @@
+# conditional.py
+
+import gzip
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+
+import anyio
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+from metrics import Counter
+
+
+RENDERED = Counter("rendered_responses_total", "Réponses JSON conditionnelles", ["route", "outcome"])
+
+# Les numéros de version des tables sont propres au process : deux workers
+# peuvent avoir le même numéro pour des données différentes
+INSTANCE = uuid.uuid4().hex[:8]
+
+
+def etag_matches(header: str, etags: list) -> str:
+    """ETag de `etags` cité dans If-None-Match (None sinon) ; "*" et W/ acceptés."""
+    if not header:
+        return None
+    sent = {t.strip().removeprefix("W/") for t in header.split(",")}
+    if "*" in sent:
+        return etags[0]
+    return next((e for e in etags if e in sent), None)
+
+
+class _Rendered:
+    __slots__ = ("etag", "body", "gzipped")
+
+    def __init__(self, etag: str, body: bytes):
+        self.etag = etag
+        self.body = body
+        self.gzipped = None
+
+
+class RenderedCache:
+    """
+    Réponses JSON encodées une fois par génération des données :
+    - clé = (route, paramètres) ; génération = versions des tables lues
+    - ETag fort = hash(process, clé, génération) ; If-None-Match -> 304 sans rien construire
+    - même génération -> mêmes octets, et la version gzip est compressée une seule fois
+      (ETag distinct, suffixe -gz, pour ne pas confondre les deux représentations) ;
+      niveau 6 comme GZipMiddleware, hors de la boucle asyncio au-delà de `thread_min_size`
+    - LRU borné en octets
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, gzip_min_size: int = 1024, compresslevel: int = 6,
+                 thread_min_size: int = 64 * 1024):
+        self.max_bytes = max_bytes
+        self.gzip_min_size = gzip_min_size
+        self.compresslevel = compresslevel
+        self.thread_min_size = thread_min_size
+        self._entries = OrderedDict()  # clé -> _Rendered
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def etag(key: tuple, generation: str) -> str:
+        digest = hashlib.blake2b(repr((INSTANCE, key, generation)).encode("utf-8"), digest_size=12).hexdigest()
+        return f'"{digest}"'
+
+    async def respond(self, request, key: tuple, generation: str, build) -> Response:
+        """`build()` (async) n'est appelé que si ni le client ni le cache n'ont cette génération."""
+        route = key[0]
+        etag = self.etag(key, generation)
+        gz_etag = etag[:-1] + '-gz"'
+
+        matched = etag_matches(request.headers.get("if-none-match"), [etag, gz_etag])
+        if matched:
+            RENDERED.inc(route=route, outcome="not_modified")
+            return Response(status_code=304, headers={"ETag": matched, "Cache-Control": "no-cache"})
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.etag == etag:
+                self._entries.move_to_end(key)
+            else:
+                entry = None
+
+        if entry is None:
+            RENDERED.inc(route=route, outcome="rendered")
+            body = JSONResponse(jsonable_encoder(await build())).body
+            entry = _Rendered(etag, body)
+            self._store(key, entry)
+        else:
+            RENDERED.inc(route=route, outcome="reused")
+
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if len(entry.body) >= self.gzip_min_size and "gzip" in request.headers.get("accept-encoding", ""):
+            if entry.gzipped is None:
+                self._attach_gzip(key, entry, await self._compress(entry.body))
+            headers["ETag"] = gz_etag
+            headers["Content-Encoding"] = "gzip"
+            return Response(entry.gzipped, media_type="application/json", headers=headers)
+        return Response(entry.body, media_type="application/json", headers=headers)
+
+    async def _compress(self, body: bytes) -> bytes:
+        if len(body) < self.thread_min_size:
+            return gzip.compress(body, self.compresslevel, mtime=0)
+        return await anyio.to_thread.run_sync(lambda: gzip.compress(body, self.compresslevel, mtime=0))
+
+    def _size(self, entry: _Rendered) -> int:
+        return len(entry.body) + (len(entry.gzipped) if entry.gzipped is not None else 0)
+
+    def _store(self, key: tuple, entry: _Rendered):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= self._size(old)
+            self._entries[key] = entry
+            self._bytes += self._size(entry)
+            self._evict()
+
+    def _attach_gzip(self, key: tuple, entry: _Rendered, gzipped: bytes):
+        with self._lock:
+            if entry.gzipped is not None:
+                return
+            entry.gzipped = gzipped
+            if self._entries.get(key) is entry:
+                self._bytes += len(gzipped)
+                self._evict()
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, old = self._entries.popitem(last=False)
+            self._bytes -= self._size(old)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes}
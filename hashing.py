@@ -0,0 +1,85 @@
+# hashing.py
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+from fastapi import HTTPException
+
+from metrics import Counter, Histogram
+
+
+BCRYPT_SECONDS = Histogram("bcrypt_duration_seconds", "Temps de calcul bcrypt", ["operation"])
+BCRYPT_QUEUE_SECONDS = Histogram("bcrypt_queue_seconds", "Attente avant calcul bcrypt", ["operation"])
+BCRYPT_REJECTED = Counter("bcrypt_rejected_total", "Calculs bcrypt refusés (file pleine)")
+
+
+class PasswordHasher:
+    """
+    bcrypt (~250 ms de CPU par appel) dans un pool dédié :
+    - `workers` threads (bcrypt relâche le GIL, pas besoin de processus)
+    - au-delà de `workers + max_queue` calculs en cours ou en attente -> 503,
+      au lieu d'occuper tous les threads pendant un pic de connexions
+    - `rounds` = coût des nouveaux hash ; un hash d'un autre coût est refait au login
+    """
+
+    def __init__(self, workers: int = 2, max_queue: int = 32, rounds: int = 12):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.rounds = rounds
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @staticmethod
+    def _timed(operation: str, fn, submitted: float, *args):
+        started = time.perf_counter()
+        BCRYPT_QUEUE_SECONDS.observe(started - submitted, operation=operation)
+        try:
+            return fn(*args)
+        finally:
+            BCRYPT_SECONDS.observe(time.perf_counter() - started, operation=operation)
+
+    async def _submit(self, operation: str, fn, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                BCRYPT_REJECTED.inc()
+                raise HTTPException(
+                    status_code=503,
+                    detail="Trop de connexions simultanées, réessaie dans un instant",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+        try:
+            return await asyncio.wrap_future(self._pool.submit(self._timed, operation, fn, time.perf_counter(), *args))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        return (await self._submit("hash", bcrypt.hashpw, password.encode("utf-8"), salt)).decode("utf-8")
+
+    async def verify(self, password: str, stored_hash: str) -> bool:
+        if not stored_hash:
+            return False
+        try:
+            return await self._submit("verify", bcrypt.checkpw, password.encode("utf-8"), stored_hash.encode("utf-8"))
+        except ValueError:
+            return False  # hash illisible dans le Sheet
+
+    def needs_rehash(self, stored_hash: str) -> bool:
+        """'$2b$12$...' -> coût 12 ; True si différent du coût configuré."""
+        try:
+            return int(stored_hash.split("$")[2]) != self.rounds
+        except (AttributeError, IndexError, ValueError):
+            return False
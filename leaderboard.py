@@ -0,0 +1,231 @@
+# leaderboard.py
+
+import threading
+from bisect import bisect_left, insort
+
+import numpy as np
+
+from tiers import assign_tiers, tier_progress
+
+
+ACTIVE_VALUES = ["true", "1", "yes", "vrai"]
+
+
+def is_active(user: dict) -> bool:
+    return str(user.get("is_active")).lower() in ACTIVE_VALUES
+
+
+class Leaderboard:
+    """
+    Classement matérialisé des users actifs.
+    - volume par user gardé en mémoire, mis à jour par delta à chaque perf créée/supprimée
+    - `order` : liste triée de clés (-volume, seq) -> rang = position (bisect, O(log n))
+    - les lectures ne calculent tier/score que sur la tranche demandée,
+      en un seul appel vectorisé (tiers.assign_tiers) ; un seul user : tiers.tier_progress
+    Reconstruit entièrement seulement quand les tables sources sont rechargées.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()        # court : deltas, lectures, échange
+        self._build_lock = threading.Lock()   # une seule reconstruction à la fois
+        self._members = {}   # user_id -> {"username", "seq", "volume"}
+        self._order = []     # [(-volume_int, seq, user_id)] trié
+        self._source = None
+        self._pending = None  # deltas notés pendant une reconstruction
+
+    # ---------- construction ----------
+
+    def is_current(self, users, perfs) -> bool:
+        source = self._source
+        return source is not None and source[0] is users and source[1] is perfs
+
+    def ensure(self, users, perfs):
+        """
+        Reconstruit si les tables en cache ont été rechargées depuis le dernier build.
+        Comme Progression.ensure : construction hors du verrou, les deltas arrivés
+        pendant ce temps (boucle asyncio) sont notés puis rejoués sur le résultat.
+        """
+        with self._build_lock:
+            if self.is_current(users, perfs):
+                return
+            with self._lock:
+                self._pending = []
+            members, counted = self._build(list(users.rows), perfs)
+
+            with self._lock:
+                self._replay(members, counted, self._pending)
+                self._members = members
+                self._order = sorted(self._key(uid, m) for uid, m in members.items())
+                self._source = (users, perfs)
+                self._pending = None
+
+    @staticmethod
+    def _build(users: list, perfs) -> tuple:
+        """(membres, user_id -> perfs comptées) ; les listes copiées servent au rejeu."""
+        members, counted = {}, {}
+        for seq, user in enumerate(users):
+            if not is_active(user):
+                continue
+            user_id = str(user.user_id)
+            rows = counted[user_id] = list(perfs.for_user(user_id))
+            members[user_id] = {
+                "user_id": user.user_id,
+                "username": user.username,
+                "seq": seq,
+                "volume": sum(p._weight or 0.0 for p in rows),
+            }
+        return members, counted
+
+    def _replay(self, members: dict, counted: dict, pending: list):
+        """
+        Deltas notés pendant la reconstruction : la copie des perfs d'un user a pu être
+        prise avant ou après la modification de la table. Une perf n'est ajoutée que si
+        elle manque à la copie, retirée que si elle y est.
+        """
+        if not pending:
+            return
+        touched = {id(row) for kind, row, _ in pending if kind == "perf"}
+        present = {
+            id(row)
+            for user_id in {str(row.user_id) for kind, row, _ in pending if kind == "perf"}
+            for row in counted.get(user_id, ())
+            if id(row) in touched
+        }
+        for kind, row, arg in pending:
+            if kind == "member":
+                self._add_member(members, None, row, arg)
+            elif (arg > 0) != (id(row) in present):
+                member = members.get(str(row.user_id))
+                if member is not None:
+                    member["volume"] += arg * (row._weight or 0.0)
+                if arg > 0:
+                    present.add(id(row))
+                else:
+                    present.discard(id(row))
+
+    @staticmethod
+    def _key(user_id, member):
+        return (-int(member["volume"]), member["seq"], user_id)
+
+    # ---------- mises à jour incrémentales ----------
+
+    def _add_member(self, members: dict, order, user: dict, seq: int):
+        user_id = str(user.get("user_id"))
+        if user_id in members:
+            return
+        member = {
+            "user_id": user.get("user_id"),
+            "username": user.get("username"),
+            "seq": seq,
+            "volume": 0.0,
+        }
+        members[user_id] = member
+        if order is not None:
+            insort(order, self._key(user_id, member))
+
+    def add_member(self, user: dict, seq: int):
+        """Nouveau user (volume 0) ajouté sans reconstruire le classement."""
+        if not is_active(user):
+            return
+        with self._lock:
+            self._add_member(self._members, self._order, user, seq)
+            if self._pending is not None:
+                self._pending.append(("member", user, seq))
+
+    def add(self, row):
+        """Perf ajoutée au cache."""
+        self._perf(row, 1)
+
+    def remove(self, row):
+        """Perf retirée du cache."""
+        self._perf(row, -1)
+
+    def _perf(self, row, sign: int):
+        with self._lock:
+            self.add_volume(row.user_id, sign * (row._weight or 0.0))
+            if self._pending is not None:
+                self._pending.append(("perf", row, sign))
+
+    def add_volume(self, user_id, delta: float):
+        user_id = str(user_id)
+        with self._lock:
+            member = self._members.get(user_id)
+            if member is None or not delta:
+                return
+
+            old_key = self._key(user_id, member)
+            member["volume"] += delta
+            new_key = self._key(user_id, member)
+            if new_key == old_key:
+                return
+
+            i = bisect_left(self._order, old_key)
+            if i < len(self._order) and self._order[i] == old_key:
+                del self._order[i]
+            insort(self._order, new_key)
+
+    # ---------- lectures ----------
+
+    def _entries(self, first_rank: int, keys: list) -> list:
+        members = [self._members[k[2]] for k in keys]
+        volumes = np.fromiter((int(m["volume"]) for m in members), dtype=np.int64, count=len(members))
+        tiers = assign_tiers(volumes)
+        return [
+            {
+                "user_id": m["user_id"],
+                "username": m["username"],
+                "volume": int(volume),
+                "score": int(score),
+                "tier": tier,
+                "next_tier": next_tier,
+                "to_next_tier": int(to_next),
+                "rank": first_rank + i,
+            }
+            for i, (m, volume, score, tier, next_tier, to_next) in enumerate(zip(
+                members, volumes, tiers["score"], tiers["tier"], tiers["next_tier"], tiers["to_next_tier"],
+            ))
+        ]
+
+    def __len__(self):
+        return len(self._order)
+
+    def page(self, offset: int = 0, limit: int = None) -> list:
+        with self._lock:
+            end = None if limit is None else offset + limit
+            return self._entries(offset + 1, self._order[offset:end])
+
+    def rank_of(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            member = self._members.get(user_id)
+            if member is None:
+                return None
+            return bisect_left(self._order, self._key(user_id, member)) + 1
+
+    def entry(self, user_id):
+        """Ligne de classement d'un user (None si inactif / inconnu)."""
+        with self._lock:
+            rank = self.rank_of(user_id)
+            if rank is None:
+                return None
+            member = self._members[str(user_id)]
+            volume = int(member["volume"])
+            progress = tier_progress(volume)
+            return {
+                "user_id": member["user_id"],
+                "username": member["username"],
+                "volume": volume,
+                "score": progress["score"],
+                "tier": progress["tier"],
+                "next_tier": progress["next_tier"],
+                "to_next_tier": progress["to_next_tier"],
+                "rank": rank,
+            }
+
+    def around(self, user_id, window: int = 5) -> list:
+        with self._lock:
+            rank = self.rank_of(user_id)
+            if rank is None:
+                return []
+            offset = max(0, rank - 1 - window)
+            return self.page(offset, rank - offset + window)
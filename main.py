@@ -1,68 +1,82 @@
 # main.py
 
 import os
+import io
+import hmac
+import csv
 import json
 import time
+import asyncio
 import uuid
-import tempfile
 from datetime import datetime
-from collections import defaultdict
+from contextlib import asynccontextmanager
 
-# ✅ Chat proxy (stdlib)
-import urllib.parse
-import urllib.request
-import urllib.error
-
-import bcrypt
-import gspread
-from google.oauth2.service_account import Credentials
+import anyio
 
 from fastapi import FastAPI, Request, Body, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
-
-# -------------------
-# CACHE SYSTEM
-# -------------------
-
-CACHE = {
-    "users": {"data": None, "ts": 0},
-    "exercises": {"data": None, "ts": 0},
-    "performances": {"data": None, "ts": 0},
-}
-
-CACHE_TTL = 30  # durée du cache en secondes
-
-
-def get_cached(key, loader):
-    now = time.time()
-    if key not in CACHE:
-        raise KeyError(key)
-
-    entry = CACHE[key]
-
-    # Recharge si vide ou expiré
-    if entry["data"] is None or now - entry["ts"] > CACHE_TTL:
-        print(f"🔄 Refresh cache: {key}")
-        entry["data"] = loader()
-        entry["ts"] = now
-
-    return entry["data"]
-
-
-def invalidate_cache(key: str):
-    if key in CACHE:
-        CACHE[key]["data"] = None
-        CACHE[key]["ts"] = 0
+from sheets import SheetsClient
+from cache import Cache
+from storage import SheetsStorage, SQLiteStorage, TABLES, PRIMARY_KEYS
+from writebehind import WriteBehindStorage
+from tables import UsersTable, ExercisesTable, PerformancesTable, TableLoader
+from records import PerformanceRecord
+from leaderboard import Leaderboard
+from upstream import BlockingUpstream, GasClient
+from chat import ChatHub
+from analytics import ExerciseAnalytics
+from progression import Progression, PERIODS
+from snapshot import save_snapshot, load_snapshot
+from metrics import REGISTRY, Histogram, MetricsMiddleware
+from hashing import PasswordHasher
+from conditional import RenderedCache, etag_matches
+from shared import SharedCache, apply_change
 
 
 # -------------------
 # APP CONFIG
 # -------------------
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # STORAGE.start() (rejeu du journal, 1re recopie SQLite...) tourne dans warm_up :
+    # /health répond dès le démarrage, /ready attend qu'il soit fini
+    if SHARED is not None:
+        SHARED.start()
+    await GAS.start()
+    warmup = asyncio.create_task(warm_up())
+    yield
+    warmup.cancel()
+    await CHAT_HUB.close()
+    await GAS.stop()
+    if CACHE_SNAPSHOT and SHARED is None:  # cache partagé : jamais relu (cf. warm_up)
+        tables = {name: CACHE.peek(name) for name in TABLE_TYPES}
+        try:
+            await anyio.to_thread.run_sync(
+                save_snapshot,
+                CACHE_SNAPSHOT,
+                {name: table.rows for name, table in tables.items() if table is not None},
+                {name: loader.watermark for name, loader in LOADERS.items()},
+            )
+        except Exception as e:
+            print(f"⚠️ Snapshot cache non écrit: {e}")
+    if SHARED is not None:
+        SHARED.stop()
+    STORAGE.stop()
+    HASHER.close()
+
+
+# Réponses compressées en gzip au-delà de GZIP_MIN_SIZE octets (pas de brotli :
+# aucune dépendance dispo ; les navigateurs acceptent tous gzip)
+GZIP_MIN_SIZE = int(os.environ.get("GZIP_MIN_SIZE", "1024"))
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE, compresslevel=6)
+app.add_middleware(MetricsMiddleware)  # en dernier = le plus externe : mesure les octets envoyés
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
@@ -83,158 +97,225 @@ STATS_SHEET = os.environ.get("STATS_SHEET", "stats").strip()
 # CHAT (Google Apps Script Web App) - PROXY OPTION B
 # -------------------
 GS_CHAT_WEBAPP = os.environ.get("GS_CHAT_WEBAPP", "").strip()  # ex: https://script.google.com/macros/s/.../exec
-
+CHAT_TIMEOUT = float(os.environ.get("CHAT_TIMEOUT", "10"))
 
 # -------------------
-# GOOGLE CREDS
+# UPSTREAMS (I/O async, concurrence bornée par service)
 # -------------------
+# gspread (bloquant) tourne dans ses propres threads ; GAS passe par un client httpx async.
+SHEETS_IO = BlockingUpstream("sheets", int(os.environ.get("SHEETS_CONCURRENCY", "8")))
+GAS = GasClient(GS_CHAT_WEBAPP, timeout=CHAT_TIMEOUT, max_concurrency=int(os.environ.get("GAS_CONCURRENCY", "20")))
 
-def get_google_creds_file():
-    """
-    Recrée dynamiquement un fichier JSON temporaire
-    depuis la variable d’environnement GOOGLE_CREDS_JSON
-    """
-    creds_json = os.environ.get("GOOGLE_CREDS_JSON")
-    if not creds_json:
-        raise RuntimeError("GOOGLE_CREDS_JSON non défini")
-
-    data = json.loads(creds_json)
-
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".json")
-    with open(temp_file.name, "w") as f:
-        json.dump(data, f)
+# Un seul poll GAS par room, quel que soit le nombre de clients connectés en SSE ;
+# les derniers messages de chaque room restent en mémoire (ring buffer) pour /api/chat/list
+CHAT_HUB = ChatHub(
+    GAS,
+    poll_interval=float(os.environ.get("CHAT_POLL_INTERVAL", "2")),
+    buffer_size=int(os.environ.get("CHAT_BUFFER_SIZE", "200")),
+    list_ttl=float(os.environ.get("CHAT_LIST_TTL", "2")),
+    max_rooms=int(os.environ.get("CHAT_MAX_ROOMS", "100")),
+)
 
-    return temp_file.name
 
-
-def get_client():
-    scopes = [
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive"
-    ]
-    creds_file = get_google_creds_file()
-    creds = Credentials.from_service_account_file(creds_file, scopes=scopes)
-    return gspread.authorize(creds)
-
-
-def _open_spreadsheet(client):
-    if SPREADSHEET_ID:
-        return client.open_by_key(SPREADSHEET_ID)
-    return client.open(SPREADSHEET_NAME)
+# -------------------
+# GOOGLE CREDS
+# -------------------
+# Un seul client authentifié par process (credentials en mémoire, worksheets réutilisés)
+# Quotas Sheets (par minute et par process) : au-delà, les appels attendent leur jeton
+# jusqu'à SHEETS_MAX_WAIT secondes, puis 503. Les 429 sont rejoués avec backoff.
+SHEETS = SheetsClient(
+    os.environ.get("GOOGLE_CREDS_JSON", ""),
+    spreadsheet_id=SPREADSHEET_ID,
+    spreadsheet_name=SPREADSHEET_NAME,
+    reads_per_minute=float(os.environ.get("SHEETS_READS_PER_MINUTE", "60")),
+    writes_per_minute=float(os.environ.get("SHEETS_WRITES_PER_MINUTE", "60")),
+    max_wait=float(os.environ.get("SHEETS_MAX_WAIT", "10")),
+    max_retries=int(os.environ.get("SHEETS_MAX_RETRIES", "4")),
+)
 
 
 def get_users_sheet():
-    client = get_client()
-    return _open_spreadsheet(client).worksheet(USERS_SHEET)
+    return SHEETS.worksheet(USERS_SHEET)
 
 
 def get_exercises_sheet():
-    client = get_client()
-    return _open_spreadsheet(client).worksheet(EXERCISES_SHEET)
+    return SHEETS.worksheet(EXERCISES_SHEET)
 
 
 def get_performances_sheet():
-    client = get_client()
-    return _open_spreadsheet(client).worksheet(PERFORMANCES_SHEET)
+    return SHEETS.worksheet(PERFORMANCES_SHEET)
 
 
 def get_stats_sheet():
-    client = get_client()
-    return _open_spreadsheet(client).worksheet(STATS_SHEET)
+    return SHEETS.worksheet(STATS_SHEET)
 
 
 # -------------------
-# CHAT HELPERS (Proxy -> Google Apps Script Web App)
+# STORAGE
 # -------------------
+# "sheets" : Google Sheets en direct (historique)
+# "sqlite" : base locale SQLite, Sheets devient une réplique synchronisée en tâche de fond
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "sheets").strip().lower()
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "gym.db").strip()
+SYNC_INTERVAL = float(os.environ.get("SYNC_INTERVAL", "15"))
+# Relecture complète d'un onglet au moins toutes les SYNC_FULL_EVERY secondes
+# (éditions à la main) ; sinon recopie / rafraîchissements incrémentaux.
+SYNC_FULL_EVERY = float(os.environ.get("SYNC_FULL_EVERY", "600"))
+
+# Backend "sheets" : écritures acquittées dès qu'elles sont dans le journal local,
+# envoyées ensuite par lots (append_rows). WRITE_BEHIND=0 pour écrire en direct.
+# Un journal par worker : WRITE_BEHIND_JOURNAL=write_behind.jsonl -> write_behind.<pid>.jsonl
+WRITE_BEHIND = os.environ.get("WRITE_BEHIND", "1").strip().lower() in ["1", "true", "yes"]
+WRITE_BEHIND_JOURNAL = os.environ.get("WRITE_BEHIND_JOURNAL", "write_behind.jsonl").strip()
+WRITE_BEHIND_INTERVAL = float(os.environ.get("WRITE_BEHIND_INTERVAL", "2"))
+WRITE_BEHIND_BATCH = int(os.environ.get("WRITE_BEHIND_BATCH", "50"))
+
+SHEET_NAMES = {
+    "users": USERS_SHEET,
+    "exercises": EXERCISES_SHEET,
+    "performances": PERFORMANCES_SHEET,
+}
 
-def _gs_assert_configured():
-    if not GS_CHAT_WEBAPP:
-        raise HTTPException(status_code=500, detail="GS_CHAT_WEBAPP non défini (Railway env var manquante).")
 
+def make_storage():
+    sheets = SheetsStorage(SHEETS, SHEET_NAMES)
+    if STORAGE_BACKEND == "sqlite":
+        return SQLiteStorage(SQLITE_PATH, replica=sheets, sync_interval=SYNC_INTERVAL, full_every=SYNC_FULL_EVERY)
+    if WRITE_BEHIND:
+        return WriteBehindStorage(
+            sheets,
+            WRITE_BEHIND_JOURNAL,
+            interval=WRITE_BEHIND_INTERVAL,
+            batch_size=WRITE_BEHIND_BATCH,
+        )
+    return sheets
 
-def gs_get(params: dict, timeout: int = 10):
-    """
-    Appelle le WebApp GAS en GET: ?action=list&room=...&limit=...
-    """
-    _gs_assert_configured()
-    qs = urllib.parse.urlencode(params)
-    url = f"{GS_CHAT_WEBAPP}?{qs}"
 
-    try:
-        req = urllib.request.Request(url, method="GET")
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            raw = resp.read().decode("utf-8", errors="replace")
-            return json.loads(raw) if raw else {}
-    except urllib.error.HTTPError as e:
-        body = e.read().decode("utf-8", errors="replace") if hasattr(e, "read") else ""
-        raise HTTPException(status_code=502, detail=f"GAS HTTPError {e.code}: {body}")
-    except Exception as e:
-        raise HTTPException(status_code=502, detail=f"GAS GET error: {str(e)}")
+STORAGE = make_storage()
 
 
-def gs_post(payload: dict, timeout: int = 10):
+# -------------------
+# CACHE SYSTEM
+# -------------------
+# Stale-while-revalidate : une donnée expirée est servie pendant qu'un seul
+# rafraîchissement tourne en tâche de fond. TTL (secondes) par table.
+TABLE_TYPES = {"users": UsersTable, "exercises": ExercisesTable, "performances": PerformancesTable}
+# Rafraîchissements incrémentaux (fin de l'onglet seulement) ; relecture complète
+# au moins toutes les SYNC_FULL_EVERY secondes pour rattraper les éditions à la main.
+# Le login lit les users en cache : une ligne modifiée à la main (is_active, password_hash)
+# n'est vue qu'à la prochaine relecture complète. L'onglet users est petit, il est donc
+# relu entièrement toutes les SYNC_FULL_EVERY_USERS secondes (et son TTL est court) :
+# un user désactivé peut encore se connecter au plus ~SYNC_FULL_EVERY_USERS + CACHE_TTL_USERS
+# secondes (1 min par défaut).
+SYNC_FULL_EVERY_USERS = float(os.environ.get("SYNC_FULL_EVERY_USERS", "30"))
+LOADERS = {
+    name: TableLoader(STORAGE, name, kind, PRIMARY_KEYS[name],
+                      full_every=SYNC_FULL_EVERY_USERS if name == "users" else SYNC_FULL_EVERY)
+    for name, kind in TABLE_TYPES.items()
+}
+
+CACHE_TTLS = {
+    "users": float(os.environ.get("CACHE_TTL_USERS", "30")),
+    "exercises": float(os.environ.get("CACHE_TTL_EXERCISES", "60")),
+    "performances": float(os.environ.get("CACHE_TTL_PERFORMANCES", "30")),
+}
+
+# Chargement partagé entre les workers uvicorn d'un même hôte (ex: /dev/shm/gym-cache) :
+# un seul worker interroge Sheets et publie le résultat, les écritures de chacun sont
+# rejouées chez les autres en moins de SHARED_CACHE_POLL secondes. Vide = désactivé.
+# Chaque worker garde sa propre copie des tables : la mémoire ne baisse pas.
+SHARED_CACHE_DIR = os.environ.get("SHARED_CACHE_DIR", "").strip()
+SHARED_CACHE_POLL = float(os.environ.get("SHARED_CACHE_POLL", "0.5"))
+
+
+def _on_cached_write(name: str, op: str, row: dict):
+    """Structures dérivées après un changement appliqué au cache (par ce worker ou un autre)."""
+    if name == "users" and op == "add":
+        LEADERBOARD.add_member(row, seq=len(CACHE.peek("users").rows) - 1)
+    elif name == "performances" and op == "add":
+        LEADERBOARD.add(row)
+        PROGRESSION.add(row)
+        ANALYTICS.add(row)
+    elif name == "performances" and op == "remove":
+        LEADERBOARD.remove(row)
+        PROGRESSION.remove(row)
+        ANALYTICS.remove(row)
+
+
+CACHE = Cache()
+SHARED = SharedCache(SHARED_CACHE_DIR, CACHE, interval=SHARED_CACHE_POLL) if SHARED_CACHE_DIR else None
+for _name, _ttl in CACHE_TTLS.items():
+    LOADERS[_name].on_applied = _on_cached_write  # lignes trouvées par un rafraîchissement incrémental
+    CACHE.register(
+        _name,
+        SHARED.table(_name, LOADERS[_name], _ttl, on_applied=_on_cached_write) if SHARED else LOADERS[_name],
+        ttl=_ttl,
+    )
+
+
+def cached_write(name: str, change: dict):
     """
-    Appelle le WebApp GAS en POST JSON (action=send).
+    Écriture faite par ce worker : appliquée au cache (sans recharger le Sheet) + delta
+    des structures dérivées, puis publiée aux autres workers si le cache est partagé.
     """
-    _gs_assert_configured()
-    data = json.dumps(payload).encode("utf-8")
-    headers = {"Content-Type": "application/json; charset=utf-8"}
+    table = CACHE.peek(name)
+    row = apply_change(table, PRIMARY_KEYS[name], change) if table is not None else None
+    if row is not None:
+        _on_cached_write(name, change["op"], row)
+    if SHARED is not None:
+        SHARED.publish(name, change)
+    return row
+
+
+# Snapshot binaire des tables + watermarks (restauré au démarrage, réécrit à l'arrêt) ;
+# au boot seules les lignes ajoutées depuis sont relues. Vide = désactivé.
+# Avec le cache partagé, pas de restauration : les workers reprennent l'état de SHARED_CACHE_DIR.
+CACHE_SNAPSHOT = os.environ.get("CACHE_SNAPSHOT", "cache_snapshot.bin").strip()
+CACHE_SNAPSHOT_MAX_AGE = float(os.environ.get("CACHE_SNAPSHOT_MAX_AGE", "86400"))
+
+
+# Tables en cache : lignes + index secondaires reconstruits à chaque rafraîchissement.
+# Un chargement à froid part dans un thread "sheets", jamais dans la boucle asyncio.
+async def users_table() -> UsersTable:
+    return await CACHE.aget("users", SHEETS_IO.limiter)
+
+
+async def exercises_table() -> ExercisesTable:
+    return await CACHE.aget("exercises", SHEETS_IO.limiter)
+
+
+async def performances_table() -> PerformancesTable:
+    return await CACHE.aget("performances", SHEETS_IO.limiter)
+
+
+# Endpoints de lecture : corps JSON encodé (et gzippé) une fois par génération des
+# tables lues, ETag fort + If-None-Match -> 304 sans rien reconstruire.
+RESPONSES = RenderedCache(
+    max_bytes=int(os.environ.get("RESPONSE_CACHE_BYTES", str(64 * 1024 * 1024))),
+    gzip_min_size=GZIP_MIN_SIZE,
+)
+
+
+def generation(*tables) -> str:
+    """Génération des données d'une réponse = versions des tables dont elle dépend."""
+    return ".".join(str(t.version) for t in tables)
+
+
+# -------------------
+# MOTS DE PASSE (bcrypt hors de la boucle, pool borné)
+# -------------------
+HASHER = PasswordHasher(
+    workers=int(os.environ.get("BCRYPT_WORKERS", str(min(4, os.cpu_count() or 1)))),
+    max_queue=int(os.environ.get("BCRYPT_QUEUE", "32")),
+    rounds=int(os.environ.get("BCRYPT_ROUNDS", "12")),
+)
 
-    try:
-        req = urllib.request.Request(GS_CHAT_WEBAPP, data=data, headers=headers, method="POST")
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            raw = resp.read().decode("utf-8", errors="replace")
-            return json.loads(raw) if raw else {}
-    except urllib.error.HTTPError as e:
-        body = e.read().decode("utf-8", errors="replace") if hasattr(e, "read") else ""
-        raise HTTPException(status_code=502, detail=f"GAS HTTPError {e.code}: {body}")
-    except Exception as e:
-        raise HTTPException(status_code=502, detail=f"GAS POST error: {str(e)}")
-
-
-# -------------------
-# TIER SYSTEM
-# -------------------
-
-def compute_tier(volume: int) -> str:
-    tiers = [
-        (10_000, "Bronze I"),
-        (50_000, "Bronze II"),
-        (100_000, "Bronze III"),
-        (200_000, "Argent I"),
-        (400_000, "Argent II"),
-        (600_000, "Argent III"),
-        (800_000, "Or I"),
-        (1_200_000, "Or II"),
-        (1_600_000, "Or III"),
-        (2_000_000, "Diamant I"),
-        (2_600_000, "Diamant II"),
-        (3_200_000, "Diamant III"),
-        (4_000_000, "Mythique I"),
-        (5_000_000, "Mythique II"),
-        (6_000_000, "Mythique III"),
-        (7_500_000, "Légendaire I"),
-        (9_000_000, "Légendaire II"),
-        (10_000_000, "Légendaire III"),
-        (12_000_000, "Élite I"),
-        (15_000_000, "Élite II"),
-        (18_000_000, "Élite III"),
-        (22_000_000, "Maître I"),
-        (27_000_000, "Maître II"),
-        (32_000_000, "Maître III"),
-        (38_000_000, "Titan I"),
-        (45_000_000, "Titan II"),
-        (52_000_000, "Titan III"),
-        (60_000_000, "Ombre I"),
-        (75_000_000, "Ombre II"),
-        (100_000_000, "Ombre III"),
-    ]
 
-    for limit, name in tiers:
-        if volume < limit:
-            return name
+# -------------------
+# CLASSEMENT (paliers : tiers.py)
+# -------------------
 
-    return "Ombre III"
+LEADERBOARD = Leaderboard()
 
 
 # -------------------
@@ -242,12 +323,12 @@ def compute_tier(volume: int) -> str:
 # -------------------
 
 @app.get("/", response_class=HTMLResponse)
-def home(request: Request):
+async def home(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 
 @app.get("/dashboard", response_class=HTMLResponse)
-def dashboard(request: Request, user: str):
+async def dashboard(request: Request, user: str):
     return templates.TemplateResponse("dashboard.html", {"request": request, "user": user})
 
 
@@ -255,55 +336,66 @@ def dashboard(request: Request, user: str):
 # API - USERS
 # -------------------
 
-@app.get("/api/users")
-def get_users():
-    try:
-        users_rows = get_cached("users", lambda: get_users_sheet().get_all_records())
-        perf_rows = get_cached("performances", lambda: get_performances_sheet().get_all_records())
+async def leaderboard() -> Leaderboard:
+    users = await users_table()
+    perfs = await performances_table()
+    if not LEADERBOARD.is_current(users, perfs):
+        # Reconstruction complète (tables rechargées) : hors de la boucle asyncio
+        with DERIVED_SECONDS.time(structure="leaderboard"):
+            await anyio.to_thread.run_sync(LEADERBOARD.ensure, users, perfs)
+    return LEADERBOARD
 
-        users = []
 
-        for user in users_rows:
-            if str(user.get("is_active")).lower() not in ["true", "1", "yes", "vrai"]:
-                continue
-
-            user_id = user.get("user_id")
-            username = user.get("username")
+@app.get("/api/users")
+async def get_users(request: Request):
+    try:
+        tables = [await users_table(), await performances_table()]
 
-            volume = 0.0
-            for p in perf_rows:
-                if str(p.get("user_id")) == str(user_id):
-                    try:
-                        w = p.get("weight")
-                        volume += float(w) if w not in ["", None] else 0.0
-                    except:
-                        pass
+        async def build():
+            return (await leaderboard()).page()
 
-            volume_int = int(volume)
-            tier = compute_tier(volume_int)
-            score = int(volume_int / 10)
+        return await RESPONSES.respond(request, ("users",), generation(*tables), build)
 
-            users.append({
-                "user_id": user_id,
-                "username": username,
-                "volume": volume_int,
-                "score": score,
-                "tier": tier
-            })
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        users.sort(key=lambda u: u["volume"], reverse=True)
 
-        for idx, u in enumerate(users, start=1):
-            u["rank"] = idx
+@app.get("/api/leaderboard")
+async def get_leaderboard(request: Request, offset: int = 0, limit: int = 20, user_id: str = "", window: int = 5):
+    """
+    Classement paginé.
+    - ?offset=0&limit=20 : top N
+    - ?user_id=...&window=5 : les `window` users avant/après ce user
+    """
+    try:
+        tables = [await users_table(), await performances_table()]
+        offset = max(0, offset)
+        limit = max(1, min(limit, 200))
+        window = max(0, min(window, 50))
+
+        async def build():
+            board = await leaderboard()
+            if user_id:
+                return {
+                    "total": len(board),
+                    "rank": board.rank_of(user_id),
+                    "items": board.around(user_id, window),
+                }
+            return {"total": len(board), "items": board.page(offset, limit)}
 
-        return users
+        key = ("leaderboard", user_id, window) if user_id else ("leaderboard", offset, limit)
+        return await RESPONSES.respond(request, key, generation(*tables), build)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/api/users")
-def create_user(data: dict = Body(...)):
+async def create_user(data: dict = Body(...)):
     username = data.get("username")
     password = data.get("password")
     role = data.get("role", "user")
@@ -315,16 +407,12 @@ def create_user(data: dict = Body(...)):
         raise HTTPException(status_code=400, detail="Champs manquants")
 
     try:
-        sheet = get_users_sheet()
-        rows = sheet.get_all_records()
+        if await SHEETS_IO.run(lambda: STORAGE.find("users", username=username)):
+            raise HTTPException(status_code=400, detail="Utilisateur déjà existant")
 
-        for row in rows:
-            if row.get("username") == username:
-                raise HTTPException(status_code=400, detail="Utilisateur déjà existant")
+        password_hash = await HASHER.hash(password)
 
-        password_hash = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
-
-        sheet.append_row([
+        row = [
             str(uuid.uuid4()),
             username,
             password_hash,
@@ -334,9 +422,11 @@ def create_user(data: dict = Body(...)):
             int(height) if height else "",
             True,
             datetime.utcnow().isoformat()
-        ])
+        ]
+        await SHEETS_IO.run(STORAGE.append, "users", row)
+
+        cached_write("users", {"op": "add", "row": dict(zip(TABLES["users"], row), is_active="TRUE")})
 
-        invalidate_cache("users")
         return {"success": True}
 
     except HTTPException:
@@ -349,8 +439,31 @@ def create_user(data: dict = Body(...)):
 # API - LOGIN
 # -------------------
 
+# Rehash lancés en tâche de fond (pas dans le temps de réponse du login) ;
+# références gardées jusqu'à la fin, un seul par user à la fois.
+REHASHING = {}
+
+
+def _schedule_rehash(row, password: str):
+    user_id = str(row.get("user_id"))
+    if user_id in REHASHING:
+        return
+    task = REHASHING[user_id] = asyncio.create_task(_rehash(row, password))
+    task.add_done_callback(lambda _: REHASHING.pop(user_id, None))
+
+
+async def _rehash(row: dict, password: str):
+    """Coût bcrypt changé (BCRYPT_ROUNDS) : nouveau hash enregistré au passage."""
+    try:
+        new_hash = await HASHER.hash(password)
+        if await SHEETS_IO.run(STORAGE.update, "users", row.get("user_id"), {"password_hash": new_hash}):
+            cached_write("users", {"op": "update", "key": row.get("user_id"), "values": {"password_hash": new_hash}})
+    except Exception as e:
+        print(f"⚠️ Rehash {row.get('user_id')} impossible: {e}")
+
+
 @app.post("/api/login")
-def login(data: dict = Body(...)):
+async def login(data: dict = Body(...)):
     username = data.get("username")
     password = data.get("password")
 
@@ -358,13 +471,12 @@ def login(data: dict = Body(...)):
         raise HTTPException(status_code=400, detail="Champs manquants")
 
     try:
-        sheet = get_users_sheet()
-        rows = sheet.get_all_records()
-
-        for row in rows:
-            if row.get("username") == username and str(row.get("is_active")).upper() == "TRUE":
+        for row in (await users_table()).named(username):
+            if str(row.get("is_active")).upper() == "TRUE":
                 stored_hash = row.get("password_hash")
-                if bcrypt.checkpw(password.encode("utf-8"), stored_hash.encode("utf-8")):
+                if await HASHER.verify(password, stored_hash):
+                    if HASHER.needs_rehash(stored_hash):
+                        _schedule_rehash(row, password)
                     return {"success": True}
 
         raise HTTPException(status_code=401, detail="Identifiants incorrects")
@@ -375,49 +487,106 @@ def login(data: dict = Body(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# -------------------
+# RÉSUMÉ USER (stats en colonnes, reconstruites quand les perfs changent)
+# -------------------
+ANALYTICS = ExerciseAnalytics()
+NO_STATS = {"sessions": 0, "volume": 0.0, "max_weight": None, "last_date": None,
+            "est_1rm": None, "weekly_volume": 0.0, "trend": None}
+
+
+async def exercise_stats(user_id) -> dict:
+    """exercise_id -> stats du user ; reconstruction éventuelle dans un thread."""
+    perfs = await performances_table()
+    if not ANALYTICS.is_current(perfs):
+        with DERIVED_SECONDS.time(structure="analytics"):
+            await anyio.to_thread.run_sync(ANALYTICS.ensure, perfs)
+    return ANALYTICS.for_user(user_id)
+
+
+def _perf_out(p: PerformanceRecord) -> dict:
+    """Format d'une performance côté API (/api/performances, /api/dashboard)."""
+    return {
+        "performance_id": p.perf_id or p.get("performance_id") or p.get("id"),
+        "user_id": p.user_id,
+        "exercise_id": p.exercise_id,
+        "date": p.date,
+        "weight": p.weight or 0,
+        "reps": p.reps or 0,
+        "rpe": p.ressenti if p.ressenti not in ["", None] else p.get("rpe"),
+        "notes": p.notes or "",
+        "created_at": p.created_at,
+    }
+
+
+def _user_summary(user_id, exercises: ExercisesTable, perfs: PerformancesTable,
+                  stats: dict, with_history: bool = False) -> dict:
+    """
+    Catalogue + stats par exercice (ExerciseAnalytics) + exercice le moins travaillé
+    (+ historique du user si demandé).
+    """
+    # Catalogue user
+    ex_map = {}
+    for ex in exercises.for_user(user_id):
+        ex_id = str(ex.exercise_id)
+        if ex_id:
+            ex_map[ex_id] = ex
+
+    result = []
+    for ex_id, ex in ex_map.items():
+        s = stats.get(ex_id) or NO_STATS
+        max_weight = s["max_weight"] or 0
+        result.append({
+            "exercise_id": ex_id,
+            "exercise": ex.name or "Exercice",
+            "zone": ex.zone or "",
+            "video_url": ex.video_url or "",
+            "max_weight": max_weight,
+            "training_weight": round(max_weight * 0.8, 1) if max_weight else 0,
+            "sessions": s["sessions"],
+            "last_date": s["last_date"].strftime("%Y-%m-%d") if s["last_date"] else None,
+            "est_1rm": s["est_1rm"],
+            "weekly_volume": s["weekly_volume"],
+            "trend": s["trend"],
+        })
+    result.sort(key=lambda x: (x["last_date"] or ""), reverse=True)
+
+    least = {"exercise": None, "volume": 0}
+    if ex_map:
+        least_ex_id = min(ex_map, key=lambda k: (stats.get(k) or NO_STATS)["volume"])
+        least = {
+            "exercise": ex_map[least_ex_id].name or "Exercice",
+            "volume": int((stats.get(least_ex_id) or NO_STATS)["volume"]),
+        }
+
+    history = []
+    if with_history:
+        history = [_perf_out(p) for p in perfs.for_user(user_id) if str(p.exercise_id) in ex_map]
+        history.sort(key=lambda x: x.get("date") or "", reverse=True)
+
+    return {"exercises": result, "least_exercise": least, "performances": history}
+
+
 # -------------------
 # API - LEAST EXERCISE (basé sur performances)
 # -------------------
 
 @app.get("/api/least-exercise")
-def get_least_exercise(user_id: str):
+async def get_least_exercise(request: Request, user_id: str):
     """
     Renvoie l'exercice le moins travaillé (volume le plus faible),
     basé sur performances + catalogue exercises.
     """
     try:
-        exercises_rows = get_cached("exercises", lambda: get_exercises_sheet().get_all_records())
-        perf_rows = get_cached("performances", lambda: get_performances_sheet().get_all_records())
-
-        # Exercices du user
-        user_exercises = [e for e in exercises_rows if str(e.get("user_id")) == str(user_id)]
-        if not user_exercises:
-            return {"exercise": None, "volume": 0}
-
-        # init volumes à 0 pour tous
-        volumes = {}
-        ex_name_by_id = {}
-        for e in user_exercises:
-            ex_id = str(e.get("exercise_id"))
-            if ex_id:
-                volumes[ex_id] = 0.0
-                ex_name_by_id[ex_id] = e.get("name") or "Exercice"
-
-        # cumule poids
-        for p in perf_rows:
-            if str(p.get("user_id")) != str(user_id):
-                continue
-            ex_id = str(p.get("exercise_id"))
-            if ex_id in volumes:
-                try:
-                    w = p.get("weight")
-                    volumes[ex_id] += float(w) if w not in ["", None] else 0.0
-                except:
-                    pass
+        exercises, perfs = await exercises_table(), await performances_table()
 
-        least_ex_id = min(volumes, key=volumes.get)
-        return {"exercise": ex_name_by_id.get(least_ex_id), "volume": int(volumes[least_ex_id])}
+        async def build():
+            return _user_summary(user_id, exercises, perfs, await exercise_stats(user_id))["least_exercise"]
 
+        return await RESPONSES.respond(request, ("least-exercise", user_id), generation(exercises, perfs), build)
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -427,81 +596,23 @@ def get_least_exercise(user_id: str):
 # -------------------
 
 @app.get("/api/exercises")
-def get_exercises(user_id: str):
+async def get_exercises(request: Request, user_id: str):
     try:
-        exercises_rows = get_cached("exercises", lambda: get_exercises_sheet().get_all_records())
-        perf_rows = get_cached("performances", lambda: get_performances_sheet().get_all_records())
-
-        # Catalogue user
-        user_exercises = [ex for ex in exercises_rows if str(ex.get("user_id")) == str(user_id)]
-
-        ex_map = {}
-        for ex in user_exercises:
-            ex_id = str(ex.get("exercise_id"))
-            if ex_id:
-                ex_map[ex_id] = {
-                    "name": ex.get("name") or "Exercice",
-                    "zone": ex.get("zone") or "",
-                    "video_url": ex.get("video_url") or "",
-                }
-
-        # Perfs user groupées
-        grouped = defaultdict(list)
-        for p in perf_rows:
-            if str(p.get("user_id")) != str(user_id):
-                continue
-            ex_id = str(p.get("exercise_id"))
-            if ex_id:
-                grouped[ex_id].append(p)
+        exercises, perfs = await exercises_table(), await performances_table()
 
-        result = []
+        async def build():
+            return _user_summary(user_id, exercises, perfs, await exercise_stats(user_id))["exercises"]
 
-        for ex_id, meta in ex_map.items():
-            rows = grouped.get(ex_id, [])
-
-            weights = []
-            dates = []
-
-            for r in rows:
-                w = r.get("weight")
-                try:
-                    if w not in ["", None]:
-                        weights.append(float(w))
-                except:
-                    pass
-
-                d = r.get("date")
-                try:
-                    if d:
-                        dates.append(datetime.fromisoformat(d))
-                except:
-                    pass
-
-            sessions = len(rows)
-            last_date = max(dates).strftime("%Y-%m-%d") if dates else None
-            max_weight = max(weights) if weights else 0
-            training_weight = round(max_weight * 0.8, 1) if max_weight else 0
-
-            result.append({
-                "exercise_id": ex_id,
-                "exercise": meta["name"],
-                "zone": meta["zone"],
-                "video_url": meta["video_url"],
-                "max_weight": max_weight,
-                "training_weight": training_weight,
-                "sessions": sessions,
-                "last_date": last_date
-            })
-
-        result.sort(key=lambda x: (x["last_date"] or ""), reverse=True)
-        return result
+        return await RESPONSES.respond(request, ("exercises", user_id), generation(exercises, perfs), build)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/api/exercises/create")
-def create_exercise(data: dict = Body(...)):
+async def create_exercise(data: dict = Body(...)):
     name = data.get("name")
     zone = data.get("zone")
     video_url = data.get("video_url", "")
@@ -511,20 +622,120 @@ def create_exercise(data: dict = Body(...)):
         raise HTTPException(status_code=400, detail="Champs manquants")
 
     try:
-        sheet = get_exercises_sheet()
-
-        sheet.append_row([
+        row = [
             str(uuid.uuid4()),          # exercise_id
             user_id,
             name,
             zone,
             video_url,
             datetime.utcnow().isoformat()
-        ])
+        ]
+        await SHEETS_IO.run(STORAGE.append, "exercises", row)
+
+        cached_write("exercises", {"op": "add", "row": dict(zip(TABLES["exercises"], row))})
 
-        invalidate_cache("exercises")
         return {"success": True}
 
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# -------------------
+# API - DASHBOARD (tout le nécessaire en un appel)
+# -------------------
+
+DASHBOARD_FIELDS = ["user", "exercises", "performances", "least_exercise"]
+
+
+@app.get("/api/dashboard")
+async def get_dashboard(request: Request, user_id: str, fields: str = ""):
+    """
+    Remplace /api/exercises + N x /api/performances (+ /api/users, /api/least-exercise).
+    fields=exercises,performances,... pour ne renvoyer qu'une partie (défaut : tout).
+    - user : rang / tier / score / volume (classement)
+    - exercises : même format que /api/exercises
+    - performances : historique complet du user (format /api/performances), date desc
+    - least_exercise : même format que /api/least-exercise
+    """
+    wanted = [f.strip() for f in fields.split(",") if f.strip()] or DASHBOARD_FIELDS
+    unknown = [f for f in wanted if f not in DASHBOARD_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"fields inconnus: {', '.join(unknown)}")
+
+    try:
+        needs_summary = any(f in wanted for f in ["exercises", "performances", "least_exercise"])
+        tables = [await performances_table()]
+        if "user" in wanted:
+            tables.append(await users_table())
+        if needs_summary:
+            tables.append(await exercises_table())
+
+        async def build():
+            out = {"user_id": user_id}
+
+            if "user" in wanted:
+                out["user"] = (await leaderboard()).entry(user_id)
+
+            if needs_summary:
+                summary = _user_summary(
+                    user_id,
+                    await exercises_table(),
+                    await performances_table(),
+                    await exercise_stats(user_id),
+                    with_history="performances" in wanted,
+                )
+                for f in ["exercises", "performances", "least_exercise"]:
+                    if f in wanted:
+                        out[f] = summary[f]
+
+            return out
+
+        return await RESPONSES.respond(request, ("dashboard", user_id, tuple(wanted)), generation(*tables), build)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# -------------------
+# API - PROGRESSION (séries jour / semaine / mois pré-agrégées)
+# -------------------
+PROGRESSION = Progression()
+
+
+async def progression() -> Progression:
+    perfs = await performances_table()
+    if not PROGRESSION.is_current(perfs):
+        with DERIVED_SECONDS.time(structure="progression"):
+            await anyio.to_thread.run_sync(PROGRESSION.ensure, perfs)
+    return PROGRESSION
+
+
+@app.get("/api/progression")
+async def get_progression(request: Request, user_id: str, exercise_id: str = "", period: str = "week",
+                          start: str = "", end: str = ""):
+    """
+    Points (volume, charge max, reps / RPE moyens) par période pour un exercice,
+    ou pour tous les exercices du user si exercise_id est vide.
+    """
+    if period not in PERIODS:
+        raise HTTPException(status_code=400, detail=f"period invalide (attendu: {', '.join(PERIODS)})")
+
+    try:
+        perfs = await performances_table()
+
+        async def build():
+            points = (await progression()).series(user_id, exercise_id, period, start, end)
+            return {"user_id": user_id, "exercise_id": exercise_id or None, "period": period, "points": points}
+
+        key = ("progression", user_id, exercise_id, period, start, end)
+        return await RESPONSES.respond(request, key, generation(perfs), build)
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -534,46 +745,34 @@ def create_exercise(data: dict = Body(...)):
 # -------------------
 
 @app.get("/api/performances")
-def get_performances(user_id: str, exercise_id: str):
+async def get_performances(request: Request, user_id: str, exercise_id: str):
     """
     Retourne la liste des performances d'un user sur un exercice.
     Compatible avec ton dashboard.js: /api/performances?user_id=...&exercise_id=...
     """
     try:
-        perf_rows = get_cached("performances", lambda: get_performances_sheet().get_all_records())
-
-        out = []
-        for p in perf_rows:
-            if str(p.get("user_id")) != str(user_id):
-                continue
-            if str(p.get("exercise_id")) != str(exercise_id):
-                continue
-
-            out.append({
-                "performance_id": p.get("perf_id") or p.get("performance_id") or p.get("id"),
-                "user_id": p.get("user_id"),
-                "exercise_id": p.get("exercise_id"),
-                "date": p.get("date"),
-                "weight": p.get("weight") or 0,
-                "reps": p.get("reps") or 0,
-                "rpe": p.get("ressenti") if p.get("ressenti") not in ["", None] else p.get("rpe"),
-                "notes": p.get("notes") or "",
-                "created_at": p.get("created_at"),
-            })
-
-        # Tri date desc si possible
-        def _key(x):
-            return x.get("date") or ""
-        out.sort(key=_key, reverse=True)
-
-        return out
+        perfs = await performances_table()
+
+        async def build():
+            out = [_perf_out(p) for p in perfs.for_exercise(user_id, exercise_id)]
+
+            # Tri date desc si possible
+            def _key(x):
+                return x.get("date") or ""
+            out.sort(key=_key, reverse=True)
 
+            return out
+
+        return await RESPONSES.respond(request, ("performances", user_id, exercise_id), generation(perfs), build)
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/api/performances/create")
-def create_performance(data: dict = Body(...)):
+async def create_performance(data: dict = Body(...)):
     user_id = data.get("user_id")
     exercise_id = data.get("exercise_id")
     date = data.get("date")  # attendu: YYYY-MM-DD
@@ -612,9 +811,7 @@ def create_performance(data: dict = Body(...)):
         raise HTTPException(status_code=400, detail="ressenti/rpe invalide")
 
     try:
-        sheet = get_performances_sheet()
-
-        sheet.append_row([
+        row = [
             str(uuid.uuid4()),          # perf_id
             user_id,
             exercise_id,
@@ -624,17 +821,28 @@ def create_performance(data: dict = Body(...)):
             ressenti,                   # colonne "ressenti" dans ton Sheet
             notes,
             datetime.utcnow().isoformat()
-        ])
+        ]
+        await SHEETS_IO.run(STORAGE.append, "performances", row)
+
+        # Pas de rechargement complet : on applique la ligne au cache + delta classement
+        cached_write("performances", {"op": "add", "row": dict(zip(TABLES["performances"], row))})
 
-        invalidate_cache("performances")
         return {"success": True}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _forget_performances(perf_ids):
+    """Retire des perfs supprimées du cache + delta classement."""
+    for perf_id in perf_ids:
+        cached_write("performances", {"op": "remove", "key": str(perf_id)})
+
+
 @app.post("/api/performances/delete")
-def delete_performance(data: dict = Body(...)):
+async def delete_performance(data: dict = Body(...)):
     user_id = data.get("user_id")
     performance_id = data.get("performance_id") or data.get("perf_id")
 
@@ -642,34 +850,129 @@ def delete_performance(data: dict = Body(...)):
         raise HTTPException(status_code=400, detail="Champs manquants")
 
     try:
-        sheet = get_performances_sheet()
+        if not await SHEETS_IO.run(STORAGE.delete, "performances", performance_id):
+            raise HTTPException(status_code=404, detail="Performance introuvable")
 
-        # On récupère toutes les valeurs (incluant header)
-        values = sheet.get_all_values()
-        if not values or len(values) < 2:
-            raise HTTPException(status_code=404, detail="Aucune donnée")
+        _forget_performances([performance_id])
+        return {"success": True}
 
-        header = values[0]
-        if "perf_id" not in header:
-            raise HTTPException(status_code=500, detail="Colonne perf_id introuvable dans l'onglet performances")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        perf_col = header.index("perf_id")
 
-        # Cherche la ligne
-        row_to_delete = None
-        for i in range(1, len(values)):
-            row = values[i]
-            if len(row) > perf_col and row[perf_col] == str(performance_id):
-                row_to_delete = i + 1  # index gspread 1-based
-                break
+@app.post("/api/performances/delete-bulk")
+async def delete_performances_bulk(data: dict = Body(...)):
+    """
+    Supprime plusieurs performances d'un user en un seul appel Sheets.
+    Payload: { user_id, performance_ids: [...] }
+    """
+    user_id = data.get("user_id")
+    performance_ids = data.get("performance_ids") or data.get("perf_ids") or []
 
-        if not row_to_delete:
-            raise HTTPException(status_code=404, detail="Performance introuvable")
+    if not user_id or not isinstance(performance_ids, list) or not performance_ids:
+        raise HTTPException(status_code=400, detail="Champs manquants")
 
-        sheet.delete_rows(row_to_delete)
+    try:
+        # On ne supprime que les perfs de ce user
+        perfs = await performances_table()
+        owned = []
+        for pid in performance_ids:
+            p = perfs.get(pid)
+            if p is not None and str(p.get("user_id")) == str(user_id):
+                owned.append(str(pid))
+
+        deleted = await SHEETS_IO.run(STORAGE.delete_many, "performances", owned) if owned else set()
+        _forget_performances(deleted)
+
+        return {
+            "success": True,
+            "deleted": sorted(deleted),
+            "not_found": [str(pid) for pid in performance_ids if str(pid) not in deleted],
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# -------------------
+# API - EXPORT (historique complet, en flux)
+# -------------------
+# Lu par tranches dans la table en cache (PerformancesTable.chunks) et encodé tranche
+# par tranche : ni liste complète en mémoire, ni un appel /api/performances par exercice.
+EXPORT_CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", "1000"))
+# Export de toute la salle (scope=gym) : pas d'authentification dans l'app (les user_id
+# sont publics via /api/users), donc réservé à qui connaît ce secret serveur, envoyé en
+# "Authorization: Bearer <secret>". Vide = export de la salle désactivé.
+EXPORT_ADMIN_TOKEN = os.environ.get("EXPORT_ADMIN_TOKEN", "").strip()
+EXPORT_COLUMNS = ["performance_id", "user_id", "exercise_id", "date", "weight", "reps", "rpe", "notes", "created_at"]
+
+
+def _export_ndjson(chunks):
+    for chunk in chunks:
+        yield "".join(json.dumps(_perf_out(p), ensure_ascii=False, default=str) + "\n" for p in chunk)
+
+
+def _export_csv(chunks):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_COLUMNS)
+    for chunk in chunks:
+        for p in chunk:
+            out = _perf_out(p)
+            writer.writerow([out[c] for c in EXPORT_COLUMNS])
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()  # en-tête seul (aucune perf)
+
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", _export_ndjson),
+    "csv": ("text/csv; charset=utf-8", _export_csv),
+}
 
-        invalidate_cache("performances")
-        return {"success": True}
+
+@app.get("/api/export")
+async def export_performances(request: Request, user_id: str = "", format: str = "ndjson", scope: str = "user"):
+    """
+    Toutes les performances, en NDJSON (une perf par ligne) ou CSV, au format de /api/performances.
+    - ?user_id=...&format=csv : perfs du user
+    - ?scope=gym : perfs de toute la salle (en-tête Authorization: Bearer EXPORT_ADMIN_TOKEN)
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="format invalide (ndjson|csv)")
+    if scope not in ["user", "gym"]:
+        raise HTTPException(status_code=400, detail="scope invalide (user|gym)")
+
+    if scope == "gym":
+        sent = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+        if not EXPORT_ADMIN_TOKEN or not hmac.compare_digest(sent.encode(), EXPORT_ADMIN_TOKEN.encode()):
+            raise HTTPException(status_code=403, detail="Export de la salle non autorisé")
+    elif not user_id:
+        raise HTTPException(status_code=400, detail="Champs manquants")
+
+    try:
+        if scope == "user" and (await users_table()).get(user_id) is None:
+            raise HTTPException(status_code=404, detail="Utilisateur introuvable")
+
+        perfs = await performances_table()
+        chunks = perfs.chunks(None if scope == "gym" else user_id, EXPORT_CHUNK_ROWS)
+        media_type, encode = EXPORT_FORMATS[format]
+
+        # Générateur synchrone : Starlette encode chaque tranche dans un thread, hors de la boucle
+        return StreamingResponse(
+            encode(chunks),
+            media_type=media_type,
+            headers={
+                "Content-Disposition": f'attachment; filename="performances-{scope}.{format}"',
+                "Cache-Control": "no-store",
+            },
+        )
 
     except HTTPException:
         raise
@@ -678,31 +981,45 @@ def delete_performance(data: dict = Body(...)):
 
 
 # -------------------
-# API - CHAT (Proxy Option B)
+# API - CHAT (Proxy Option B = Google Apps Script WebApp)
 # -------------------
 
+@app.get("/api/chat/ping")
+async def chat_ping():
+    # ping GAS
+    return await GAS.get({"action": "ping"})
+
+
 @app.get("/api/chat/list")
-def chat_list(room: str = "general", limit: int = 50):
+async def chat_list(request: Request, room: str = "general", limit: int = 50, since: str = "", before_ts: str = ""):
     """
-    Retourne les derniers messages.
-    Appelle GAS: ?action=list&room=...&limit=...
+    Retourne les derniers messages, depuis le buffer mémoire de la room.
+    - since=<ts> : messages plus récents que ts (rattrapage)
+    - before_ts=<ts> : page plus ancienne (GAS si au-delà du buffer)
+    ETag + If-None-Match -> 304 si rien n'a changé.
     """
     limit = max(1, min(int(limit or 50), 200))
-    data = gs_get({"action": "list", "room": room, "limit": limit}, timeout=10)
-    return data
+    data, etag = await CHAT_HUB.list(room, limit, since=since, before_ts=before_ts)
+
+    if etag is None:
+        return data
+    if etag_matches(request.headers.get("if-none-match"), [etag]):
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(data, headers={"ETag": etag, "Cache-Control": "no-cache"})
 
 
 @app.post("/api/chat/send")
-def chat_send(data: dict = Body(...)):
+async def chat_send(data: dict = Body(...)):
     """
     Envoie un message.
-    Payload attendu: { room, user_id, username, message }
+    Payload attendu: { room, user_id, username|user, message|text, client_id }
     Appelle GAS en POST JSON avec action=send
     """
     room = (data.get("room") or "general").strip()
     user_id = str(data.get("user_id") or "").strip()
-    username = (data.get("username") or "Profil").strip()
-    message = str(data.get("message") or "").strip()
+    username = str(data.get("username") or data.get("user") or "Profil").strip()
+    message = str(data.get("message") or data.get("text") or "").strip()
+    client_id = str(data.get("client_id") or "")
 
     if not message:
         raise HTTPException(status_code=400, detail="Message vide")
@@ -712,79 +1029,182 @@ def chat_send(data: dict = Body(...)):
         "room": room,
         "user_id": user_id,
         "username": username,
-        "message": message
+        "message": message,
+        "client_id": client_id
     }
-
-    out = gs_post(payload, timeout=10)
+    out = await GAS.post(payload)
+
+    # Si GAS renvoie l'id du message, il part directement dans le buffer de la room
+    sent = None
+    if isinstance(out, dict) and out.get("id"):
+        sent = {
+            "id": out.get("id"),
+            "ts": out.get("ts") or datetime.utcnow().isoformat(),
+            "user": username,
+            "message": message,
+        }
+    CHAT_HUB.sent(room, sent)
     return out
 
-import requests  # <-- ajoute cet import en haut avec les autres
+
+@app.get("/api/chat/stream")
+async def chat_stream(room: str = "general"):
+    """
+    Flux SSE d'une room :
+    - event "snapshot" : derniers messages (à la connexion)
+    - event "messages" : nouveaux messages uniquement
+    Données au même format que /api/chat/list : { ok, items }
+    """
+    async def events():
+        async with CHAT_HUB.subscribe(room) as queue:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    return
+                name, items = event
+                yield f"event: {name}\ndata: {json.dumps({'ok': True, 'items': items}, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 # -------------------
-# CHAT (Option B = Google Apps Script WebApp)
+# CACHE STATS
 # -------------------
 
-GS_CHAT_WEBAPP = os.environ.get("GS_CHAT_WEBAPP", "").strip()
-CHAT_TIMEOUT = float(os.environ.get("CHAT_TIMEOUT", "10"))
+@app.get("/api/sheets/stats")
+async def sheets_stats():
+    """Budget restant par classe de quota, attentes, 429 reçus, regroupement batchGet."""
+    return SHEETS.stats()
 
-def _require_chat_webapp():
-    if not GS_CHAT_WEBAPP:
-        raise HTTPException(status_code=500, detail="GS_CHAT_WEBAPP non défini (Railway env var manquante).")
 
-def _gas_get(params: dict):
-    _require_chat_webapp()
-    try:
-        r = requests.get(GS_CHAT_WEBAPP, params=params, timeout=CHAT_TIMEOUT)
-        r.raise_for_status()
-        return r.json()
-    except requests.exceptions.JSONDecodeError:
-        raise HTTPException(status_code=502, detail=f"GAS GET error: réponse non-JSON (status {r.status_code})")
-    except Exception as e:
-        raise HTTPException(status_code=502, detail=f"GAS GET error: {str(e)}")
+@app.get("/api/cache/stats")
+async def cache_stats():
+    stats = CACHE.stats()
+    for name, loader in LOADERS.items():
+        stats[name]["sync"] = loader.stats()
+    if SHARED is not None:
+        for name, shared in SHARED.stats().items():
+            stats[name]["shared"] = shared
+    stats["responses"] = RESPONSES.stats()
+    return stats
+
+
+# -------------------
+# MÉTRIQUES (/metrics, format Prometheus)
+# -------------------
+# Latence par route (middleware), appels Sheets / GAS / bcrypt et chargements du cache
+# (histogrammes déclarés dans leurs modules) ; le reste est lu au moment du scrape.
+DERIVED_SECONDS = Histogram(
+    "derived_build_duration_seconds", "Reconstruction des structures dérivées des tables", ["structure"],
+)
+
+
+@REGISTRY.collector
+def runtime_metrics():
+    cache = CACHE.stats()
+    sheets = SHEETS.stats()
+    return [
+        ("cache_requests_total", "counter", "Lectures du cache par résultat", [
+            ({"key": key, "result": result}, s[field])
+            for key, s in cache.items()
+            for result, field in [("hit", "hits"), ("stale", "stale_hits"), ("miss", "misses")]
+        ]),
+        ("cache_refreshes_total", "counter", "Rafraîchissements réussis du cache", [
+            ({"key": key}, s["refreshes"]) for key, s in cache.items()
+        ]),
+        ("cache_errors_total", "counter", "Rafraîchissements échoués du cache", [
+            ({"key": key}, s["errors"]) for key, s in cache.items()
+        ]),
+        ("cache_sync_loads_total", "counter", "Lectures Sheets du cache (complètes / incrémentales)", [
+            ({"key": name, "mode": mode}, loader.stats()[f"{mode}_loads"])
+            for name, loader in LOADERS.items() for mode in ["full", "delta"]
+        ]),
+        ("sheets_quota_available", "gauge", "Jetons disponibles par classe de quota Sheets", [
+            ({"kind": kind}, b["available"]) for kind, b in sheets["buckets"].items()
+        ]),
+        ("sheets_quota_wait_seconds_total", "counter", "Attente cumulée pour un jeton Sheets", [
+            ({"kind": kind}, b["wait_seconds"]) for kind, b in sheets["buckets"].items()
+        ]),
+        ("sheets_quota_rejected_total", "counter", "Appels Sheets refusés faute de budget", [
+            ({"kind": kind}, b["rejected"]) for kind, b in sheets["buckets"].items()
+        ]),
+        ("sheets_throttled_total", "counter", "Réponses 429 de Sheets", [({}, sheets["throttled"])]),
+        ("sheets_retries_total", "counter", "Appels Sheets rejoués", [({}, sheets["retries"])]),
+        ("rendered_cache_bytes", "gauge", "Octets des réponses JSON encodées en cache", [
+            ({}, RESPONSES.stats()["bytes"])
+        ]),
+        ("bcrypt_pending", "gauge", "Calculs bcrypt en cours ou en attente", [({}, HASHER.pending)]),
+        ("write_behind_pending_rows", "gauge", "Lignes en attente d'envoi vers Sheets", [
+            ({}, STORAGE.pending_count() if hasattr(STORAGE, "pending_count") else 0)
+        ]),
+    ]
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+# -------------------
+# DÉMARRAGE (warmup) / SANTÉ
+# -------------------
+# /health = liveness (le process répond) ; /ready = caches chargés et index construits.
+# Le load balancer ne doit router que vers les workers prêts.
+WARMUP_RETRY = float(os.environ.get("WARMUP_RETRY", "5"))
+WARMUP_STATE = {"ready": False, "restored": False, "duration_ms": None, "error": None}
+
+
+async def warm_up():
+    t0 = time.monotonic()
 
-def _gas_post(payload: dict):
-    _require_chat_webapp()
     try:
-        r = requests.post(GS_CHAT_WEBAPP, json=payload, timeout=CHAT_TIMEOUT)
-        r.raise_for_status()
-        return r.json()
-    except requests.exceptions.JSONDecodeError:
-        raise HTTPException(status_code=502, detail=f"GAS POST error: réponse non-JSON (status {r.status_code})")
+        await anyio.to_thread.run_sync(STORAGE.start)
     except Exception as e:
-        raise HTTPException(status_code=502, detail=f"GAS POST error: {str(e)}")
+        WARMUP_STATE["error"] = f"storage: {e}"
+        print(f"❌ Démarrage du stockage: {e}")
+        raise
 
-@app.get("/api/chat/ping")
-def chat_ping():
-    # ping GAS
-    return _gas_get({"action": "ping"})
+    if CACHE_SNAPSHOT and SHARED is None:
+        try:
+            saved = await anyio.to_thread.run_sync(load_snapshot, CACHE_SNAPSHOT, CACHE_SNAPSHOT_MAX_AGE)
+        except Exception as e:
+            saved = None
+            print(f"⚠️ Snapshot cache illisible: {e}")
 
-@app.get("/api/chat/list")
-def chat_list(room: str = "general", limit: int = 50, before_ts: str = ""):
-    # list messages
-    params = {"action": "list", "room": room, "limit": str(limit)}
-    if before_ts:
-        params["before_ts"] = before_ts
-    return _gas_get(params)
+        async def restore(name, rows, watermark):
+            # Snapshot + fin de l'onglet seulement (relecture complète si l'onglet a changé)
+            CACHE.prime(name, await SHEETS_IO.run(LOADERS[name].restore, rows, watermark), fresh=True)
 
-@app.post("/api/chat/send")
-def chat_send(data: dict = Body(...)):
-    # send message
-    room = data.get("room", "general")
-    user = data.get("user", "anonymous")
-    text = data.get("text", "")
-    client_id = data.get("client_id", "")
-
-    if not text or not str(text).strip():
-        raise HTTPException(status_code=400, detail="Message vide")
+        try:
+            await asyncio.gather(*[
+                restore(name, rows, watermark)
+                for name, (rows, watermark) in (saved or {}).items() if name in LOADERS
+            ])
+            WARMUP_STATE["restored"] = bool(saved)
+        except Exception as e:
+            print(f"⚠️ Restauration du snapshot: {e}")
+
+    while True:
+        try:
+            # Les trois onglets en parallèle, puis les structures dérivées
+            await asyncio.gather(users_table(), exercises_table(), performances_table())
+            await asyncio.gather(leaderboard(), progression(), exercise_stats(""))
+            break
+        except Exception as e:
+            WARMUP_STATE["error"] = str(e)
+            print(f"⚠️ Warmup: {e} (nouvel essai dans {WARMUP_RETRY}s)")
+            await asyncio.sleep(WARMUP_RETRY)
 
-    payload = {
-        "action": "send",
-        "room": room,
-        "user": user,
-        "text": text,
-        "client_id": client_id
-    }
-    return _gas_post(payload)
+    WARMUP_STATE.update(ready=True, error=None, duration_ms=round((time.monotonic() - t0) * 1000))
+    print(f"✅ Caches prêts en {WARMUP_STATE['duration_ms']} ms")
 
 
 # -------------------
@@ -792,5 +1212,12 @@ def chat_send(data: dict = Body(...)):
 # -------------------
 
 @app.api_route("/health", methods=["GET", "HEAD"])
-def health_check():
+async def health_check():
     return {"status": "ok"}
+
+
+@app.api_route("/ready", methods=["GET", "HEAD"])
+async def ready_check():
+    if not WARMUP_STATE["ready"]:
+        return JSONResponse({"status": "warming", **WARMUP_STATE}, status_code=503)
+    return {"status": "ready", **WARMUP_STATE}
@@ -0,0 +1,200 @@
+# metrics.py
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+
+# -------------------
+# MÉTRIQUES (format texte Prometheus, sans dépendance)
+# -------------------
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(v) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v)
+
+
+class Registry:
+    """
+    Métriques déclarées au niveau module (Counter, Histogram) + collecteurs appelés
+    au moment du scrape (compteurs et jauges déjà tenus ailleurs).
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        """fn() -> [(nom, type, aide, [(labels dict, valeur)])] ; erreurs ignorées au scrape."""
+        with self._lock:
+            self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics):
+            lines.extend(metric.render())
+        for fn in list(self._collectors):
+            try:
+                families = fn()
+            except Exception as e:
+                print(f"⚠️ Collecteur métriques {getattr(fn, '__name__', fn)}: {e}")
+                continue
+            for name, kind, help_text, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(list(labels.items()))} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames=(), registry: Registry = REGISTRY):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _header(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        with self._lock:
+            items = list(self._values.items())
+        return self._header() + [
+            f"{self.name}{_labels(list(zip(self.labelnames, key)))} {_number(v)}" for key, v in items
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=LATENCY_BUCKETS,
+                 registry: Registry = REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help_text, labelnames, registry)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def render(self) -> list:
+        with self._lock:
+            items = [(key, (list(s[0]), s[1], s[2])) for key, s in self._values.items()]
+
+        lines = self._header()
+        for key, (counts, total, count) in items:
+            base = list(zip(self.labelnames, key))
+            cumulative = 0
+            for le, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                lines.append(f"{self.name}_bucket{_labels(base + [('le', _number(float(le)))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(base)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(base)} {count}")
+        return lines
+
+
+# -------------------
+# MIDDLEWARE HTTP (ASGI)
+# -------------------
+
+HTTP_SECONDS = Histogram(
+    "http_request_duration_seconds", "Durée des requêtes HTTP par route", ["method", "route", "status"],
+)
+HTTP_RESPONSE_BYTES = Histogram(
+    "http_response_size_bytes", "Taille des réponses HTTP par route", ["method", "route"], buckets=SIZE_BUCKETS,
+)
+
+
+class MetricsMiddleware:
+    """
+    Durée et taille de réponse par route (gabarit de la route, pas l'URL brute).
+    Les flux SSE ne sont pas chronométrés : leur durée est celle de la connexion.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        t0 = time.perf_counter()
+        state = {"status": 500, "bytes": 0, "stream": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                for k, v in message.get("headers", []):
+                    if k == b"content-type" and v.startswith(b"text/event-stream"):
+                        state["stream"] = True
+            elif message["type"] == "http.response.body":
+                state["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope.get("method", "")
+            if not state["stream"]:
+                HTTP_SECONDS.observe(time.perf_counter() - t0, method=method, route=route, status=state["status"])
+            HTTP_RESPONSE_BYTES.observe(state["bytes"], method=method, route=route)
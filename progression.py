@@ -0,0 +1,227 @@
+# progression.py
+
+import threading
+from datetime import timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from records import parse_date
+
+
+PERIODS = ["day", "week", "month"]
+
+
+def period_key(d, period: str) -> str:
+    """Début de la période contenant `d` : jour, lundi de la semaine, ou mois."""
+    if period == "day":
+        return d.strftime("%Y-%m-%d")
+    if period == "week":
+        return (d - timedelta(days=d.weekday())).strftime("%Y-%m-%d")
+    return d.strftime("%Y-%m")
+
+
+@lru_cache(maxsize=8192)
+def _period_keys(day) -> tuple:
+    """Clés (jour, semaine, mois) d'une date, dans l'ordre de PERIODS ; calculées une fois par date."""
+    iso = day.isoformat()
+    return iso, (day - timedelta(days=day.weekday())).isoformat(), iso[:7]
+
+
+class _Bucket:
+    __slots__ = ("sessions", "volume", "weights", "reps_sum", "reps_n", "rpe_sum", "rpe_n")
+
+    def __init__(self):
+        self.sessions = 0
+        self.volume = 0.0
+        self.weights = {}  # poids -> nb de séances : garde le max juste après une suppression
+        self.reps_sum = 0.0
+        self.reps_n = 0
+        self.rpe_sum = 0.0
+        self.rpe_n = 0
+
+    def apply(self, weight, reps, rpe, sign: int):
+        self.sessions += sign
+        if weight is not None:
+            n = self.weights.get(weight, 0) + sign
+            if n > 0:
+                self.weights[weight] = n
+            else:
+                self.weights.pop(weight, None)
+            if reps is not None:
+                self.volume += sign * weight * reps
+        if reps is not None:
+            self.reps_sum += sign * reps
+            self.reps_n += sign
+        if rpe is not None:
+            self.rpe_sum += sign * rpe
+            self.rpe_n += sign
+
+    def out(self, key: str) -> dict:
+        return {
+            "period": key,
+            "sessions": self.sessions,
+            "volume": round(self.volume, 1),
+            "max_weight": max(self.weights) if self.weights else None,
+            "avg_reps": round(self.reps_sum / self.reps_n, 1) if self.reps_n else None,
+            "avg_rpe": round(self.rpe_sum / self.rpe_n, 1) if self.rpe_n else None,
+        }
+
+
+class Progression:
+    """
+    Séries pré-agrégées par (user, exercice) et par période (jour / semaine / mois) :
+    séances, volume (poids x reps), charge max, reps et RPE moyens.
+    exercise_id "" = tous les exercices du user.
+    Mises à jour par delta à chaque perf créée / supprimée ; reconstruites
+    entièrement seulement quand la table des perfs est rechargée.
+    La reconstruction se fait hors verrou dans un nouveau dict, échangé à la fin :
+    les deltas arrivés pendant ce temps (boucle asyncio) ne l'attendent jamais,
+    ils sont notés puis rejoués sur le nouveau dict.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()        # court : deltas, lecture, échange
+        self._build_lock = threading.Lock()  # une seule reconstruction à la fois
+        self._series = {}   # (user_id, exercise_id, period) -> {période: _Bucket}
+        self._source = None
+        self._pending = None  # deltas [(ligne, signe)] notés pendant une reconstruction
+
+    # ---------- construction ----------
+
+    def is_current(self, perfs) -> bool:
+        return self._source is not None and self._source is perfs
+
+    def ensure(self, perfs):
+        with self._build_lock:
+            if self.is_current(perfs):
+                return
+            with self._lock:
+                self._pending = []
+            rows = list(perfs.rows)
+            series = self._build(rows)
+
+            with self._lock:
+                self._replay(series, rows, self._pending)
+                self._series = series
+                self._source = perfs
+                self._pending = None
+
+    @staticmethod
+    def _build(rows: list) -> dict:
+        """Séries de toutes les lignes en un groupby pandas par période (plutôt que 6 deltas par ligne)."""
+        rows = [r for r in rows if r._date is not None]
+        if not rows:
+            return {}
+
+        day_codes, days = pd.factorize(pd.Series([r._date.date() for r in rows], dtype="object"))
+        keys = [_period_keys(d) for d in days]
+        weight = np.array([np.nan if r._weight is None else r._weight for r in rows], dtype="float64")
+        reps = np.array([np.nan if r._reps is None else r._reps for r in rows], dtype="float64")
+        df = pd.DataFrame({
+            "user_id": [str(r.user_id) for r in rows],
+            "exercise_id": [str(r.exercise_id) for r in rows],
+            "weight": weight,
+            "reps": reps,
+            "rpe": np.array([np.nan if r._rpe is None else r._rpe for r in rows], dtype="float64"),
+            "volume": np.nan_to_num(weight * reps),
+        })
+        for i, period in enumerate(PERIODS):
+            df[period] = np.array([k[i] for k in keys], dtype="object")[day_codes]
+        # exercise_id "" = tous les exercices du user
+        df = pd.concat([df, df.assign(exercise_id="")], ignore_index=True)
+
+        series = {}
+        for period in PERIODS:
+            by = ["user_id", "exercise_id", period]
+            agg = df.groupby(by, sort=False).agg(
+                sessions=("volume", "size"), volume=("volume", "sum"),
+                reps_sum=("reps", "sum"), reps_n=("reps", "count"),
+                rpe_sum=("rpe", "sum"), rpe_n=("rpe", "count"),
+            )
+            agg = agg.reset_index()  # colonnes plutôt que MultiIndex.tolist() (tuples lents)
+            for user_id, exercise_id, key, sessions, volume, reps_sum, reps_n, rpe_sum, rpe_n in zip(
+                *(agg[c].tolist() for c in agg.columns)
+            ):
+                bucket = _Bucket()
+                bucket.sessions, bucket.volume = sessions, volume
+                bucket.reps_sum, bucket.reps_n = reps_sum, reps_n
+                bucket.rpe_sum, bucket.rpe_n = rpe_sum, rpe_n
+                series.setdefault((user_id, exercise_id, period), {})[key] = bucket
+
+            counts = df[df["weight"].notna()].groupby(by + ["weight"], sort=False).size().reset_index()
+            for user_id, exercise_id, key, w, n in zip(*(counts[c].tolist() for c in counts.columns)):
+                series[(user_id, exercise_id, period)][key].weights[w] = n
+        return series
+
+    def _replay(self, series: dict, rows: list, pending: list):
+        """
+        Deltas notés pendant la reconstruction : la copie `rows` a pu être prise avant
+        ou après la modification de la table. Une ligne n'est ajoutée que si elle manque
+        à la copie, retirée que si elle y est.
+        """
+        if not pending:
+            return
+        touched = {id(row) for row, _ in pending}
+        present = {id(row) for row in rows if id(row) in touched}
+        for row, sign in pending:
+            if (sign > 0) != (id(row) in present):
+                self._apply(series, row, sign)
+                if sign > 0:
+                    present.add(id(row))
+                else:
+                    present.discard(id(row))
+
+    # ---------- mises à jour incrémentales ----------
+
+    def add(self, row: dict):
+        with self._lock:
+            self._apply(self._series, row, 1)
+            if self._pending is not None:
+                self._pending.append((row, 1))
+
+    def remove(self, row: dict):
+        with self._lock:
+            self._apply(self._series, row, -1)
+            if self._pending is not None:
+                self._pending.append((row, -1))
+
+    @staticmethod
+    def _apply(series: dict, row, sign: int):
+        d = row._date
+        if d is None:
+            return
+        weight, reps, rpe = row._weight, row._reps, row._rpe
+
+        user_id = str(row.user_id)
+        keys = _period_keys(d.date())
+        for exercise_id in (str(row.exercise_id), ""):
+            for period, key in zip(PERIODS, keys):
+                buckets = series.get((user_id, exercise_id, period))
+                if buckets is None:
+                    buckets = series[(user_id, exercise_id, period)] = {}
+                bucket = buckets.get(key)
+                if bucket is None:
+                    bucket = buckets[key] = _Bucket()
+                bucket.apply(weight, reps, rpe, sign)
+                if bucket.sessions <= 0:
+                    del buckets[key]
+
+    # ---------- lecture ----------
+
+    def series(self, user_id, exercise_id="", period: str = "week", start: str = "", end: str = "") -> list:
+        """Points triés par période ; start / end (YYYY-MM-DD) bornent l'intervalle."""
+        lo = parse_date(start)
+        hi = parse_date(end)
+        lo = period_key(lo, period) if lo else ""
+        hi = period_key(hi, period) if hi else ""
+
+        with self._lock:
+            buckets = self._series.get((str(user_id), str(exercise_id or ""), period), {})
+            points = [
+                b.out(k) for k, b in buckets.items()
+                if (not lo or k >= lo) and (not hi or k <= hi)
+            ]
+        points.sort(key=lambda p: p["period"])
+        return points
@@ -0,0 +1,156 @@
+# quota.py
+
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+from fastapi import HTTPException
+
+
+class QuotaExceeded(HTTPException):
+    """Budget Sheets épuisé (ou 429 persistant) : 503 + Retry-After au lieu d'un 500."""
+
+    def __init__(self, detail: str = "Google Sheets saturé, réessaie dans un instant", retry_after: float = 5):
+        super().__init__(status_code=503, detail=detail, headers={"Retry-After": str(max(1, round(retry_after)))})
+
+
+# -------------------
+# TOKEN BUCKET (par classe de quota : lecture / écriture)
+# -------------------
+
+class TokenBucket:
+    """
+    `per_minute` jetons par minute, au plus `burst` d'avance.
+    acquire() réserve un jeton (le solde peut passer en négatif) puis dort
+    le temps nécessaire ; au-delà de `max_wait` secondes d'attente -> QuotaExceeded.
+    """
+
+    def __init__(self, name: str, per_minute: float, burst: float = None):
+        self.name = name
+        self.rate = per_minute / 60.0
+        self.capacity = burst if burst is not None else max(1.0, per_minute / 6)
+        self._tokens = self.capacity
+        self._ts = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.acquired = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+        self.rejected = 0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._ts) * self.rate)
+        self._ts = now
+
+    def acquire(self, max_wait: float) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if wait > max_wait:
+                self.rejected += 1
+                raise QuotaExceeded(retry_after=wait)
+            self._tokens -= 1
+            self.acquired += 1
+            if wait:
+                self.waited += 1
+                self.wait_seconds += wait
+
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def drain(self):
+        """429 reçu : le budget réel est plus bas que prévu, tout le monde ralentit."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0)
+
+    def available(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+    def stats(self) -> dict:
+        return {
+            "per_minute": round(self.rate * 60, 1),
+            "burst": self.capacity,
+            "available": round(self.available(), 2),
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "wait_seconds": round(self.wait_seconds, 2),
+            "rejected": self.rejected,
+        }
+
+
+# -------------------
+# BACKOFF
+# -------------------
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 32.0) -> float:
+    """Backoff exponentiel avec jitter complet : uniforme dans [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+# -------------------
+# REGROUPEMENT DES LECTURES (batchGet)
+# -------------------
+
+class ReadBatcher:
+    """
+    Regroupe les lectures de plages concurrentes en un seul appel :
+    le premier appelant attend `window` secondes, puis envoie toutes les plages
+    en attente à `fetch(ranges) -> [values, ...]` et répartit les résultats.
+    """
+
+    def __init__(self, fetch, window: float = 0.02, max_ranges: int = 100):
+        self._fetch = fetch
+        self.window = window
+        self.max_ranges = max_ranges
+        self._lock = threading.Lock()
+        self._pending = []  # [(ranges, Future)]
+
+        self.calls = 0
+        self.ranges = 0
+
+    def read(self, ranges: list) -> list:
+        fut = Future()
+        with self._lock:
+            self._pending.append((list(ranges), fut))
+            leader = len(self._pending) == 1
+
+        if leader:
+            time.sleep(self.window)
+            self._flush()
+        return fut.result()
+
+    def _flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+
+        # Découpé si trop de plages pour un seul batchGet
+        group, size = [], 0
+        for item in batch:
+            if group and size + len(item[0]) > self.max_ranges:
+                self._send(group)
+                group, size = [], 0
+            group.append(item)
+            size += len(item[0])
+        if group:
+            self._send(group)
+
+    def _send(self, group: list):
+        ranges = [r for rs, _ in group for r in rs]
+        try:
+            values = self._fetch(ranges)
+        except BaseException as e:
+            for _, fut in group:
+                fut.set_exception(e)
+            return
+
+        self.calls += 1
+        self.ranges += len(ranges)
+        i = 0
+        for rs, fut in group:
+            fut.set_result(values[i:i + len(rs)])
+            i += len(rs)
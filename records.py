@@ -0,0 +1,195 @@
+# records.py
+
+import sys
+from datetime import datetime
+
+from storage import TABLES
+
+
+# -------------------
+# CONVERSIONS (faites une seule fois au chargement)
+# -------------------
+
+def to_float(v):
+    """Poids -> float, None si vide ou invalide."""
+    if type(v) is float or type(v) is int:  # cas courant : déjà numérisé par gspread
+        return float(v)
+    if v in ["", None]:
+        return None
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_date(v):
+    """Date ISO -> datetime, None si vide ou invalide."""
+    if not v:
+        return None
+    try:
+        return datetime.fromisoformat(str(v))
+    except ValueError:
+        return None
+
+
+def _intern(v):
+    return sys.intern(v) if type(v) is str else v
+
+
+# -------------------
+# LIGNES EN CACHE
+# -------------------
+# Une ligne du Sheet = un objet à __slots__ (pas de dict par ligne) :
+# - une colonne du schéma = un attribut (None si absente de l'onglet)
+# - identifiants référencés par d'autres tables internés : les 100k perfs d'un user
+#   partagent la même chaîne user_id
+# - champs calculés (`_weight`, `_date`...) convertis une fois, à la création
+# Les colonnes hors schéma (onglet modifié à la main) sont gardées dans `_extra`.
+# L'interface dict des lignes gspread reste disponible (get, [], in, items, update) pour
+# les chemins froids ; les boucles chaudes lisent les attributs directement.
+# Record n'a pas de constructeur : chaque sous-classe écrit le sien colonne par colonne
+# (une boucle setattr générique coûte ~5x plus cher sur 1M de perfs).
+
+class Record:
+    __slots__ = ("_extra",)
+    COLUMNS = ()
+    INTERNED = ()
+    DERIVED = ()
+
+    def _set_extra(self, row: dict):
+        if row.keys() <= self._column_set:
+            self._extra = None
+        else:
+            self._extra = {k: v for k, v in row.items() if k not in self._column_set and not k.startswith("_")} or None
+
+    @classmethod
+    def of(cls, row):
+        """Ligne brute (dict) -> record ; un record de ce type est renvoyé tel quel."""
+        return row if type(row) is cls else cls(row)
+
+    def _derive(self):
+        pass
+
+    # ---------- interface dict ----------
+
+    def get(self, key, default=None):
+        if key in self._fields:
+            v = getattr(self, key)
+            return default if v is None else v
+        extra = self._extra
+        return extra.get(key, default) if extra else default
+
+    def __getitem__(self, key):
+        if key in self._fields:
+            return getattr(self, key)
+        if self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        self.update({key: value})
+
+    def __contains__(self, key) -> bool:
+        # Comme un dict : une cellule vide ("", 0) est présente ; None = colonne absente
+        # de l'onglet. Les champs calculés existent toujours.
+        if key in self._column_set:
+            return getattr(self, key) is not None
+        if key in self._fields:
+            return True
+        return bool(self._extra) and key in self._extra
+
+    def keys(self) -> list:
+        return [k for k, _ in self.items()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def items(self):
+        """Colonnes telles que dans le Sheet (sans les champs calculés)."""
+        for c in self.COLUMNS:
+            v = getattr(self, c)
+            if v is not None:
+                yield c, v
+        if self._extra:
+            yield from self._extra.items()
+
+    def update(self, values: dict):
+        for k, v in values.items():
+            if k in self._column_set:
+                setattr(self, k, _intern(v) if k in self.INTERNED else v)
+            elif not k.startswith("_"):
+                if self._extra is None:
+                    self._extra = {}
+                self._extra[k] = v
+        self._derive()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self.items())!r})"
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._column_set = frozenset(cls.COLUMNS)
+        cls._fields = frozenset(cls.COLUMNS) | frozenset(cls.DERIVED)
+
+
+class UserRecord(Record):
+    COLUMNS = tuple(TABLES["users"])
+    INTERNED = ("user_id",)
+    __slots__ = COLUMNS
+
+    def __init__(self, row: dict):
+        get = row.get
+        self.user_id = _intern(get("user_id"))
+        self.username = get("username")
+        self.password_hash = get("password_hash")
+        self.role = get("role")
+        self.gender = get("gender")
+        self.age = get("age")
+        self.height = get("height")
+        self.is_active = get("is_active")
+        self.created_at = get("created_at")
+        self._set_extra(row)
+
+
+class ExerciseRecord(Record):
+    COLUMNS = tuple(TABLES["exercises"])
+    INTERNED = ("exercise_id", "user_id")
+    __slots__ = COLUMNS
+
+    def __init__(self, row: dict):
+        get = row.get
+        self.exercise_id = _intern(get("exercise_id"))
+        self.user_id = _intern(get("user_id"))
+        self.name = get("name")
+        self.zone = get("zone")
+        self.video_url = get("video_url")
+        self.created_at = get("created_at")
+        self._set_extra(row)
+
+
+class PerformanceRecord(Record):
+    """`_weight`, `_reps`, `_rpe` (float|None) et `_date` (datetime|None) calculés une fois."""
+    COLUMNS = tuple(TABLES["performances"])
+    INTERNED = ("user_id", "exercise_id")
+    DERIVED = ("_weight", "_reps", "_rpe", "_date")
+    __slots__ = COLUMNS + DERIVED
+
+    def __init__(self, row: dict):
+        get = row.get
+        self.perf_id = get("perf_id")
+        self.user_id = _intern(get("user_id"))
+        self.exercise_id = _intern(get("exercise_id"))
+        self.date = get("date")
+        self.weight = get("weight")
+        self.reps = get("reps")
+        self.ressenti = get("ressenti")
+        self.notes = get("notes")
+        self.created_at = get("created_at")
+        self._set_extra(row)
+        self._derive()
+
+    def _derive(self):
+        self._weight = to_float(self.weight)
+        self._reps = to_float(self.reps)
+        self._rpe = to_float(self.ressenti)
+        self._date = parse_date(self.date)
@@ -0,0 +1,311 @@
+# shared.py
+
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from snapshot import save_snapshot, load_snapshot
+
+
+# -------------------
+# CHANGEMENTS (format commun : écritures locales, deltas Sheets, journal partagé)
+# -------------------
+# {"op": "add", "row": {...}} | {"op": "remove", "key": k} | {"op": "update", "key": k, "values": {...}}
+
+def apply_change(table, pk: str, change: dict):
+    """Applique un changement à une table en cache ; renvoie la ligne touchée (None si sans effet)."""
+    op = change.get("op")
+    if op == "add":
+        row = dict(change["row"])
+        if table.get(row.get(pk)) is not None:
+            return None  # déjà présente (delta Sheets, ou rejoué après une relecture)
+        return table.add(row)
+    if op == "remove":
+        return table.remove(change["key"]) if hasattr(table, "remove") else None
+    if op == "update":
+        row = table.get(change["key"])
+        if row is not None:
+            row.update(change["values"])
+        return row
+    return None
+
+
+def _plain(row: dict) -> dict:
+    """Ligne telle que dans le Sheet (sans `_weight`, `_date`...)."""
+    return {k: v for k, v in row.items() if not k.startswith("_")}
+
+
+# -------------------
+# CHARGEMENT PARTAGÉ ENTRE WORKERS (même hôte, fichiers dans /dev/shm)
+# -------------------
+# Ce qui est partagé : les lectures Sheets (une par hôte au lieu d'une par worker) et
+# la propagation des écritures. Pas la mémoire : chaque worker décode le .snap dans ses
+# propres objets Python, l'empreinte reste proportionnelle au nombre de workers.
+# Les endpoints lisent directement des graphes d'objets (records, index by_id / by_user,
+# classement, séries, analytics) qui ne peuvent pas vivre dans un segment partagé ;
+# une mémoire plate demanderait des tables en colonnes (mmap / shared_memory) et la
+# réécriture de tous leurs lecteurs. Pour borner la mémoire : moins de workers.
+
+class SharedTable:
+    """
+    Loader de cache d'une table, dont le chargement est partagé par les workers d'un hôte
+    (chaque worker garde sa copie de la table en mémoire). Par table, dans `directory` :
+    - <table>.snap : dernière relecture complète (format snapshot.py)
+    - <table>.meta.json : génération du .snap, date du dernier rafraîchissement, watermark
+    - <table>.ops.jsonl : changements publiés depuis le .snap (écritures des workers,
+      lignes ajoutées trouvées par les rafraîchissements incrémentaux)
+    Un seul worker à la fois interroge Sheets (verrou <table>.refresh.lock) ; les autres
+    reprennent son résultat. Les fichiers de données sont protégés par <table>.lock
+    (partagé en lecture, exclusif en écriture).
+    """
+
+    def __init__(self, directory: str, name: str, loader, ttl: float, on_applied=None):
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self.on_applied = on_applied  # (table, op, ligne) -> structures dérivées de ce worker
+
+        base = os.path.join(directory, name)
+        self._snap = base + ".snap"
+        self._meta = base + ".meta.json"
+        self._ops = base + ".ops.jsonl"
+        self._data_lock = base + ".lock"
+        self._refresh_lock = base + ".refresh.lock"
+
+        self._lock = threading.RLock()
+        self._outbox_lock = threading.Lock()  # jamais tenu pendant un appel Sheets (publish depuis la boucle)
+        self._outbox = []
+        self.table = None
+        self._gen = None
+        self._offset = 0
+
+        self.adopted = 0
+        self.shared_hits = 0
+        self.refreshes = 0
+        self.published = 0
+        self.applied = 0
+
+    @staticmethod
+    @contextmanager
+    def _flock(path: str, mode: int):
+        with open(path, "a+b") as f:
+            fcntl.flock(f.fileno(), mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    # ---------- lecture de l'état partagé ----------
+
+    def _read_meta(self) -> dict:
+        try:
+            with open(self._meta, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, meta: dict):
+        tmp = self._meta + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, default=str)
+        os.replace(tmp, self._meta)
+
+    def _read_ops(self, offset: int):
+        """Changements complets à partir de `offset` -> (liste, nouvel offset)."""
+        try:
+            with open(self._ops, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], 0
+        end = data.rfind(b"\n") + 1
+        changes = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+        return changes, offset + end
+
+    def stale(self) -> bool:
+        """Une autre génération a été publiée (relecture complète ailleurs) : à reprendre."""
+        meta = self._read_meta()
+        return meta is not None and meta.get("gen") != self._gen
+
+    def sync(self, adopt: bool = True) -> bool:
+        """
+        Rattrape l'état partagé : nouvelle génération reprise (si `adopt`), puis changements
+        publiés par les autres workers. True si self.table a été remplacée.
+        """
+        with self._lock, self._flock(self._data_lock, fcntl.LOCK_SH):
+            return self._sync_locked(adopt)
+
+    def _sync_locked(self, adopt: bool = True) -> bool:
+        meta = self._read_meta()
+        if meta is None:
+            return False
+
+        replaced = False
+        if meta.get("gen") != self._gen:
+            if not adopt:
+                return False
+            # Copie privée de ce worker : seul le coût de la lecture Sheets est évité
+            saved = load_snapshot(self._snap, float("inf"))
+            if not saved or self.name not in saved:
+                return False
+            self.table = self.loader.kind(saved[self.name][0])
+            self._gen, self._offset = meta["gen"], 0
+            self.adopted += 1
+            replaced = True
+
+        if self.table is None:
+            return replaced
+
+        pid = os.getpid()
+        changes, self._offset = self._read_ops(self._offset)
+        for change in changes:
+            if change.get("pid") == pid:
+                continue
+            row = apply_change(self.table, self.loader.pk, change)
+            if row is not None:
+                self.applied += 1
+                if not replaced and self.on_applied:
+                    self.on_applied(self.name, change["op"], row)
+        return replaced
+
+    # ---------- publication ----------
+
+    def publish(self, change: dict):
+        """Changement fait par ce worker (déjà appliqué à son cache) ; écrit au prochain flush."""
+        if "row" in change:
+            change = {**change, "row": _plain(change["row"])}
+        with self._outbox_lock:
+            self._outbox.append({**change, "pid": os.getpid()})
+
+    def flush(self):
+        if self._outbox:
+            with self._flock(self._data_lock, fcntl.LOCK_EX):
+                self._flush_locked()
+
+    def _flush_locked(self, extra: list = ()):
+        with self._outbox_lock:
+            changes, self._outbox = self._outbox + list(extra), []
+        if not changes:
+            return
+        lines = "".join(json.dumps(c, default=str, ensure_ascii=False) + "\n" for c in changes)
+        with open(self._ops, "ab") as f:
+            f.write(lines.encode("utf-8"))
+        self.published += len(changes)
+
+    # ---------- chargement (appelé par le Cache) ----------
+
+    def __call__(self):
+        with self._flock(self._refresh_lock, fcntl.LOCK_EX), self._lock:
+            # Pendant l'attente du verrou, un autre worker a peut-être déjà rafraîchi
+            self.sync()
+            meta = self._read_meta()
+            if self.table is not None and meta and time.time() - meta["refreshed_at"] < self.ttl:
+                self.shared_hits += 1
+                return self.table
+
+            old = self.table
+            loader = self.loader
+            loader.table = old
+            loader.watermark = meta.get("watermark") if meta and old is not None else None
+            if meta and old is not None:
+                loader.full_at = time.monotonic() - (time.time() - meta["full_at"])
+            full_loads = loader.full_loads
+            known = len(old.rows) if old is not None else 0
+            table = loader()
+            self.refreshes += 1
+
+            now = time.time()
+            with self._flock(self._data_lock, fcntl.LOCK_EX):
+                self._flush_locked()
+                if table is not old or meta is None:
+                    # Relecture complète : changements publiés depuis le dernier .snap rejoués
+                    # (écritures encore en attente d'envoi vers Sheets), puis nouveau .snap
+                    for change in self._read_ops(0)[0]:
+                        apply_change(table, loader.pk, change)
+                    save_snapshot(self._snap, {self.name: table.rows}, {self.name: loader.watermark})
+                    open(self._ops, "wb").close()
+                    self._gen, self._offset = f"{os.getpid()}-{time.time_ns()}", 0
+                    self.table = table
+                    self._write_meta({"gen": self._gen, "refreshed_at": now, "full_at": now,
+                                      "watermark": loader.watermark})
+                    return table
+
+                # Incrémental : lignes nouvelles publiées pour les autres workers
+                if len(table.rows) > known:  # ajoutées en place par le loader
+                    pid = os.getpid()
+                    self._flush_locked([{"op": "add", "row": _plain(r), "pid": pid} for r in table.rows[known:]])
+                self.table = table
+                self._sync_locked()
+                full_at = now if loader.full_loads != full_loads else meta["full_at"]  # relue mais inchangée
+                self._write_meta({**meta, "refreshed_at": now, "full_at": full_at, "watermark": loader.watermark})
+                return table
+
+    def stats(self) -> dict:
+        return {
+            "generation": self._gen,
+            "adopted": self.adopted,
+            "shared_hits": self.shared_hits,
+            "refreshes": self.refreshes,
+            "published": self.published,
+            "applied": self.applied,
+        }
+
+
+class SharedCache:
+    """
+    Tables partagées + fil de fond : toutes les `interval` secondes, publie les
+    changements locaux, applique ceux des autres workers, et relance le Cache
+    quand une autre génération (relecture complète) a été publiée.
+    """
+
+    def __init__(self, directory: str, cache, interval: float = 0.5):
+        self.directory = directory
+        self.cache = cache
+        self.interval = interval
+        self.tables = {}
+        self._stop = threading.Event()
+        self._thread = None
+        os.makedirs(directory, exist_ok=True)
+
+    def table(self, name: str, loader, ttl: float, on_applied=None) -> SharedTable:
+        table = self.tables[name] = SharedTable(self.directory, name, loader, ttl, on_applied)
+        return table
+
+    def publish(self, name: str, change: dict):
+        self.tables[name].publish(change)
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="shared-cache", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.poll()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def poll(self):
+        for name, table in self.tables.items():
+            try:
+                table.flush()
+                if self.cache.peek(name) is None:
+                    continue
+                if table.stale():
+                    self.cache.invalidate(name)  # le loader reprendra le nouveau .snap
+                else:
+                    table.sync(adopt=False)
+            except Exception as e:
+                print(f"⚠️ Cache partagé {name}: {e}")
+
+    def stats(self) -> dict:
+        return {name: t.stats() for name, t in self.tables.items()}
@@ -0,0 +1,200 @@
+# sheets.py
+
+import json
+import threading
+import time
+
+import gspread
+from gspread.utils import absolute_range_name
+from google.auth.exceptions import RefreshError
+from google.oauth2.service_account import Credentials
+
+from quota import TokenBucket, ReadBatcher, QuotaExceeded, backoff_delay
+from metrics import Counter, Histogram
+
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive"
+]
+
+# Codes HTTP pour lesquels on jette la session et on se reconnecte
+RECONNECT_STATUSES = {401}
+
+# Codes rejoués avec backoff. Écritures : seulement 429 (requête non exécutée),
+# un 5xx sur un append a pu aboutir et le rejouer créerait un doublon.
+RETRY_STATUSES = {
+    "read": {429, 500, 502, 503},
+    "write": {429},
+}
+
+
+SHEETS_SECONDS = Histogram(
+    "sheets_call_duration_seconds", "Durée des appels Google Sheets", ["worksheet", "operation", "outcome"],
+)
+SHEETS_READ_RANGES = Counter("sheets_read_ranges_total", "Plages lues par onglet", ["worksheet"])
+
+
+def _worksheet_of(range_name: str) -> str:
+    """"'onglet'!A1:B2" ou "'onglet'" -> onglet (métriques par onglet d'un batchGet)."""
+    name = range_name if range_name.endswith("'") else (range_name.rpartition("!")[0] or range_name)
+    if len(name) >= 2 and name[0] == name[-1] == "'":
+        return name[1:-1].replace("''", "'")
+    return name
+
+
+def _status_of(error: gspread.exceptions.APIError) -> int:
+    try:
+        return int(error.response.status_code)
+    except Exception:
+        return 0
+
+
+class SheetsClient:
+    """
+    Client gspread unique par process.
+    - credentials construites en mémoire (pas de fichier temporaire)
+    - client / spreadsheet / worksheets ouverts une seule fois puis réutilisés
+    - le jeton OAuth est rafraîchi automatiquement par la session google-auth
+    - en cas d'erreur d'authentification, on se reconnecte et on rejoue une fois
+    - quotas : un token bucket par classe (lecture / écriture) devant chaque appel,
+      429 / 5xx rejoués avec backoff exponentiel + jitter, QuotaExceeded (503) sinon
+    - les lectures de plages concurrentes partent en un seul batchGet
+    """
+
+    def __init__(self, creds_json: str, spreadsheet_id: str = "", spreadsheet_name: str = "",
+                 reads_per_minute: float = 60, writes_per_minute: float = 60,
+                 max_wait: float = 10.0, max_retries: int = 4, batch_window: float = 0.02):
+        self._creds_json = creds_json
+        self._spreadsheet_id = spreadsheet_id
+        self._spreadsheet_name = spreadsheet_name
+
+        self._lock = threading.RLock()
+        self._client = None
+        self._spreadsheet = None
+        self._worksheets = {}
+
+        self.buckets = {
+            "read": TokenBucket("read", reads_per_minute),
+            "write": TokenBucket("write", writes_per_minute),
+        }
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self._batcher = ReadBatcher(self._batch_get, window=batch_window)
+        self.throttled = 0
+        self.retries = 0
+
+    def client(self) -> gspread.Client:
+        with self._lock:
+            if self._client is None:
+                if not self._creds_json:
+                    raise RuntimeError("GOOGLE_CREDS_JSON non défini")
+                info = json.loads(self._creds_json)
+                creds = Credentials.from_service_account_info(info, scopes=SCOPES)
+                self._client = gspread.authorize(creds)
+            return self._client
+
+    def spreadsheet(self) -> gspread.Spreadsheet:
+        with self._lock:
+            if self._spreadsheet is None:
+                client = self.client()
+                if self._spreadsheet_id:
+                    self._spreadsheet = client.open_by_key(self._spreadsheet_id)
+                else:
+                    self._spreadsheet = client.open(self._spreadsheet_name)
+            return self._spreadsheet
+
+    def worksheet(self, name: str) -> gspread.Worksheet:
+        with self._lock:
+            ws = self._worksheets.get(name)
+            if ws is None:
+                ws = self.spreadsheet().worksheet(name)
+                self._worksheets[name] = ws
+            return ws
+
+    def reset(self):
+        with self._lock:
+            self._client = None
+            self._spreadsheet = None
+            self._worksheets = {}
+
+    def run(self, name: str, op, kind: str = "read", operation: str = None):
+        """
+        Exécute op(worksheet) dans le budget `kind` ("read" ou "write") ;
+        reconnecte et rejoue une fois si la session n'est plus valide
+        (jeton révoqué, clé tournée, etc.). `operation` nomme l'appel dans les métriques.
+        """
+        return self._call(kind, name, lambda: op(self.worksheet(name)), operation or kind)
+
+    def read(self, name: str, ranges: list) -> list:
+        """
+        Plages A1 de l'onglet `name` ("" = onglet entier) -> listes de lignes.
+        Les lectures concurrentes (tous onglets confondus) partent en un seul batchGet.
+        """
+        SHEETS_READ_RANGES.inc(len(ranges), worksheet=name)
+        return self._batcher.read([absolute_range_name(name, r) if r else absolute_range_name(name) for r in ranges])
+
+    def _batch_get(self, ranges: list) -> list:
+        # Latence d'un batchGet observée une fois pour chacun des onglets qu'il lit
+        worksheets = sorted({_worksheet_of(r) for r in ranges})
+        response = self._call("read", ",".join(worksheets), lambda: self.spreadsheet().values_batch_get(ranges),
+                              "batch_get", worksheets)
+        return [vr.get("values", []) for vr in response.get("valueRanges", [])]
+
+    def _call(self, kind: str, label: str, fn, operation: str, worksheets=None):
+        """`worksheets` : onglets sous lesquels la durée est mesurée (par défaut `label`)."""
+        bucket = self.buckets[kind]
+        worksheets = worksheets or [label]
+        reconnected = False
+        attempt = 0
+        while True:
+            bucket.acquire(self.max_wait)
+            t0 = time.perf_counter()
+            try:
+                result = fn()
+                self._observe(time.perf_counter() - t0, worksheets, operation, "ok")
+                return result
+            except gspread.exceptions.APIError as e:
+                status = _status_of(e)
+                self._observe(time.perf_counter() - t0, worksheets, operation, str(status))
+                if status in RECONNECT_STATUSES and not reconnected:
+                    print(f"🔑 Reconnexion Google Sheets ({label})")
+                    self.reset()
+                    reconnected = True
+                    continue
+                if status not in RETRY_STATUSES[kind]:
+                    raise
+                if status == 429:
+                    self.throttled += 1
+                    bucket.drain()
+                if attempt >= self.max_retries:
+                    if status == 429:
+                        raise QuotaExceeded()
+                    raise
+            except RefreshError:
+                if reconnected:
+                    raise
+                print(f"🔑 Reconnexion Google Sheets ({label})")
+                self.reset()
+                reconnected = True
+                continue
+
+            delay = backoff_delay(attempt)
+            attempt += 1
+            self.retries += 1
+            print(f"⏳ Sheets {status} ({label}) : nouvel essai dans {delay:.1f}s")
+            time.sleep(delay)
+
+    @staticmethod
+    def _observe(seconds: float, worksheets: list, operation: str, outcome: str):
+        for worksheet in worksheets:
+            SHEETS_SECONDS.observe(seconds, worksheet=worksheet, operation=operation, outcome=outcome)
+
+    def stats(self) -> dict:
+        return {
+            "buckets": {kind: b.stats() for kind, b in self.buckets.items()},
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "batch_get_calls": self._batcher.calls,
+            "batch_get_ranges": self._batcher.ranges,
+        }
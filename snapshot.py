@@ -0,0 +1,114 @@
+# snapshot.py
+
+import contextlib
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+
+
+# Format : MAGIC | taille de l'en-tête (uint32 BE) | en-tête JSON | corps JSON
+# L'en-tête porte la date, la taille et le CRC32 du corps, et pour chaque table
+# son nombre de lignes et le watermark Sheets de la dernière lecture.
+# Corps en colonnes (nom -> {"columns": [...], "rows": [[...], ...]}) : uniquement des
+# données, jamais d'objets Python reconstruits à la lecture (le fichier peut être
+# déposé par un autre process, cf. SHARED_CACHE_DIR).
+# v1 (corps pickle) n'est plus relu : MAGIC différent -> ignoré comme format inconnu.
+MAGIC = b"GYMSNAP\x02"
+
+
+def _plain(row: dict) -> dict:
+    """Ligne telle que lue dans le Sheet (sans les champs calculés `_weight`, `_date`...)."""
+    return {k: v for k, v in row.items() if not k.startswith("_")}
+
+
+def _columns(rows: list) -> list:
+    """Union ordonnée des colonnes des lignes."""
+    columns = {}
+    for row in rows:
+        for k in row:
+            columns.setdefault(k, None)
+    return list(columns)
+
+
+def _encode(rows: list) -> dict:
+    rows = [_plain(r) for r in rows]
+    columns = _columns(rows)
+    return {"columns": columns, "rows": [[r.get(c) for c in columns] for r in rows]}
+
+
+def _decode(table: dict) -> list:
+    # null = colonne absente de la ligne (comme une cellule vide non lue)
+    columns = table["columns"]
+    return [{c: v for c, v in zip(columns, values) if v is not None} for values in table["rows"]]
+
+
+def save_snapshot(path: str, tables: dict, watermarks: dict):
+    """
+    Écrit les lignes des tables en cache (nom -> liste de dicts) et leurs watermarks.
+    Écriture atomique : fichier temporaire propre au process + fsync + rename
+    (plusieurs workers peuvent écrire le même snapshot à l'arrêt).
+    """
+    body = json.dumps({name: _encode(rows) for name, rows in tables.items()},
+                      ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+    header = json.dumps({
+        "saved_at": time.time(),
+        "body_len": len(body),
+        "crc32": zlib.crc32(body),
+        "tables": {
+            name: {"rows": len(rows), "watermark": watermarks.get(name)}
+            for name, rows in tables.items()
+        },
+    }, default=str).encode("utf-8")
+
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(MAGIC + struct.pack(">I", len(header)) + header)
+            f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+
+
+def load_snapshot(path: str, max_age: float) -> dict:
+    """
+    nom -> (lignes, watermark) ; None si pas de snapshot,
+    format inconnu, corps corrompu ou plus vieux que `max_age` secondes.
+    """
+    if not path or not os.path.exists(path) or os.path.getsize(path) <= len(MAGIC) + 4:
+        return None
+
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:len(MAGIC)] != MAGIC:
+        return None
+    start = len(MAGIC) + 4
+    (header_len,) = struct.unpack(">I", data[len(MAGIC):start])
+    try:
+        header = json.loads(data[start:start + header_len])
+    except ValueError:
+        return None
+
+    if time.time() - header.get("saved_at", 0) > max_age:
+        return None
+
+    offset = start + header_len
+    body = data[offset:offset + header["body_len"]]
+    if len(body) != header["body_len"] or zlib.crc32(body) != header["crc32"]:
+        return None
+    try:
+        tables = {name: _decode(table) for name, table in json.loads(body).items()}
+    except (ValueError, KeyError, TypeError):
+        return None
+
+    return {
+        name: (rows, header["tables"].get(name, {}).get("watermark"))
+        for name, rows in tables.items()
+    }
@@ -144,7 +144,7 @@ document.addEventListener("DOMContentLoaded", () => {
   // -------------------------
   async function loadProfiles() {
     try {
-      const res = await fetch("/api/users", { cache: "no-store" });
+      const res = await fetch("/api/users", { cache: "no-cache" });
       if (!res.ok) throw new Error("/api/users not ok");
 
       const users = await res.json();
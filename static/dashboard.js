@@ -60,7 +60,7 @@ async function tryGet(urls){
   let lastErr = null;
   for (const url of urls) {
     try {
-      const r = await fetch(url, { cache: "no-store" });
+      const r = await fetch(url, { cache: "no-cache" });
       if (!r.ok) throw new Error(`${url} -> HTTP ${r.status}`);
       const j = await r.json();
       return j;
@@ -240,7 +240,7 @@ async function fetchJsonWithTimeout(url, { timeoutMs = 7000 } = {}){
   const t = setTimeout(() => ctrl.abort(), timeoutMs);
 
   try{
-    const res = await fetch(url, { cache: "no-store", signal: ctrl.signal });
+    const res = await fetch(url, { cache: "no-cache", signal: ctrl.signal });
     if (!res.ok) {
       const txt = await res.text().catch(()=> "");
       throw new Error(`HTTP ${res.status} ${txt}`);
@@ -273,26 +273,11 @@ document.addEventListener("DOMContentLoaded", () => {
     if (!userId) return [];
     const u = encodeURIComponent(userId);
 
-    const exRes = await fetch(`/api/exercises?user_id=${u}`, { cache: "no-store" });
-    if (!exRes.ok) return [];
-    const exJson = await exRes.json().catch(()=>[]);
-    const exercises = Array.isArray(exJson) ? exJson : [];
-
-    const ids = exercises.map(e => e.exercise_id || e.id).filter(Boolean);
-    if (!ids.length) return [];
-
-    const packs = await Promise.all(ids.map(async (eid) => {
-      const url = `/api/performances?user_id=${u}&exercise_id=${encodeURIComponent(eid)}`;
-      const r = await fetch(url, { cache: "no-store" });
-      if (!r.ok) return [];
-      const j = await r.json().catch(()=>[]);
-      if (Array.isArray(j)) return j;
-      if (Array.isArray(j?.items)) return j.items;
-      if (Array.isArray(j?.data)) return j.data;
-      return [];
-    }));
-
-    return packs.flat();
+    // Un seul appel : tout l'historique du user (au lieu de /api/exercises + N x /api/performances)
+    const res = await fetch(`/api/dashboard?user_id=${u}&fields=performances`, { cache: "no-cache" });
+    if (!res.ok) return [];
+    const j = await res.json().catch(()=>({}));
+    return Array.isArray(j?.performances) ? j.performances : [];
   }
 
   function computeDashboardStats(perfs){
@@ -562,7 +547,7 @@ document.addEventListener("DOMContentLoaded", () => {
   }
 
   // --------------------
-  // CHAT (simple polling)
+  // CHAT (flux SSE, polling en secours)
   // --------------------
   let currentRoom = "general";
   let lastRenderedKey = "";
@@ -575,45 +560,77 @@ document.addEventListener("DOMContentLoaded", () => {
     }[m]));
   }
   
+  let chatItems = [];
+  let chatStream = null;
+
+  function setChatStatus(text){
+    const status = $("#chat-status"); // optionnel
+    if(status) status.textContent = text;
+  }
+
+  function renderChatItems(items){
+    // clé simple pour éviter de rerender si rien ne change
+    const key = items.map(m => `${m.id || ""}_${m.ts || ""}`).join("|");
+    if(key === lastRenderedKey) return;
+    lastRenderedKey = key;
+
+    const list = $("#chat-messages"); // <= IMPORTANT : ta zone messages doit avoir cet id
+    if(!list) return;
+
+    list.innerHTML = items.map(m => `
+      <div class="chat-msg">
+        <div class="chat-meta">
+          <strong>${escapeHtml(m.user || "User")}</strong>
+          <span>${escapeHtml(m.ts || "")}</span>
+        </div>
+        <div class="chat-text">${escapeHtml(m.message || "")}</div>
+      </div>
+    `).join("");
+
+    // scroll en bas
+    list.scrollTop = list.scrollHeight;
+  }
+  
   async function loadMessages(){
     try{
-      const res = await fetch(`/api/chat/list?room=${encodeURIComponent(currentRoom)}&limit=50`, { cache: "no-store" });
+      // no-cache : le navigateur revalide avec l'ETag (304 si rien de nouveau)
+      const res = await fetch(`/api/chat/list?room=${encodeURIComponent(currentRoom)}&limit=50`, { cache: "no-cache" });
       const data = await res.json();
   
       if(!data || !data.ok) return;
   
-      const items = data.items || [];
-  
-      // clé simple pour éviter de rerender si rien ne change
-      const key = items.map(m => `${m.id || ""}_${m.ts || ""}`).join("|");
-      if(key === lastRenderedKey) return;
-      lastRenderedKey = key;
-  
-      const list = $("#chat-messages"); // <= IMPORTANT : ta zone messages doit avoir cet id
-      if(!list) return;
-  
-      list.innerHTML = items.map(m => `
-        <div class="chat-msg">
-          <div class="chat-meta">
-            <strong>${escapeHtml(m.user || "User")}</strong>
-            <span>${escapeHtml(m.ts || "")}</span>
-          </div>
-          <div class="chat-text">${escapeHtml(m.message || "")}</div>
-        </div>
-      `).join("");
-  
-      // scroll en bas
-      list.scrollTop = list.scrollHeight;
-  
-      // petit statut
-      const status = $("#chat-status"); // optionnel
-      if(status) status.textContent = "online";
+      chatItems = data.items || [];
+      renderChatItems(chatItems);
+      setChatStatus("online");
     }catch(e){
-      const status = $("#chat-status");
-      if(status) status.textContent = "offline";
+      setChatStatus("offline");
       console.warn("loadMessages error", e);
     }
   }
+
+  // Flux SSE : le serveur pousse les nouveaux messages (un seul poll GAS par room côté serveur)
+  function startChatStream(){
+    if(!window.EventSource) return false;
+
+    chatStream = new EventSource(`/api/chat/stream?room=${encodeURIComponent(currentRoom)}`);
+
+    chatStream.addEventListener("snapshot", (e) => {
+      const data = JSON.parse(e.data || "{}");
+      chatItems = data.items || [];
+      renderChatItems(chatItems);
+    });
+
+    chatStream.addEventListener("messages", (e) => {
+      const data = JSON.parse(e.data || "{}");
+      chatItems = chatItems.concat(data.items || []).slice(-50);
+      renderChatItems(chatItems);
+    });
+
+    // EventSource se reconnecte tout seul après une coupure
+    chatStream.onopen = () => setChatStatus("online");
+    chatStream.onerror = () => setChatStatus("offline");
+    return true;
+  }
   
   async function sendMessage(){
     const input = $("#chat-input"); // <= IMPORTANT : ton input doit avoir cet id
@@ -644,7 +661,7 @@ document.addEventListener("DOMContentLoaded", () => {
     }
   
     input.value = "";
-    await loadMessages(); // refresh direct
+    if(!chatStream) await loadMessages(); // refresh direct (sinon le flux SSE pousse le message)
   }
   
   // Hook bouton envoyer + Enter
@@ -662,8 +679,11 @@ document.addEventListener("DOMContentLoaded", () => {
       });
     }
   
-    loadMessages();
-    setInterval(loadMessages, 2000);
+    // Fallback polling si le navigateur ne gère pas EventSource
+    if(!startChatStream()){
+      loadMessages();
+      setInterval(loadMessages, 2000);
+    }
   }
   
   // appelle initChat() quand ta page/onglet chat est affiché
@@ -1008,7 +1028,7 @@ document.addEventListener("DOMContentLoaded", () => {
         const targetName = String(leastExerciseRef?.name || label.textContent || "").trim();
         if (!targetName || targetName === "Chargement…" || targetName === "Aucun exercice") return;
 
-        const res = await fetch(`/api/exercises?user_id=${encodeURIComponent(userId)}`, { cache: "no-store" });
+        const res = await fetch(`/api/exercises?user_id=${encodeURIComponent(userId)}`, { cache: "no-cache" });
         if (!res.ok) throw new Error("Impossible de récupérer la liste des exercices");
 
         const exercises = await res.json().catch(() => []);
@@ -1084,7 +1104,7 @@ document.addEventListener("DOMContentLoaded", () => {
     grid.innerHTML = "Chargement...";
 
     try {
-      const res = await fetch(`/api/exercises?user_id=${encodeURIComponent(userId)}`, { cache: "no-store" });
+      const res = await fetch(`/api/exercises?user_id=${encodeURIComponent(userId)}`, { cache: "no-cache" });
       if (!res.ok) throw new Error(`API error ${res.status}`);
 
       const exercises = await res.json();
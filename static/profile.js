@@ -32,7 +32,7 @@ console.log("PROFILE JS chargé");
   }
 
   async function getJSON(url){
-    const r = await fetch(url, { cache: "no-store" });
+    const r = await fetch(url, { cache: "no-cache" });
     if (!r.ok) {
       const t = await r.text().catch(()=> "");
       throw new Error(`${url} -> HTTP ${r.status} ${t}`);
@@ -124,29 +124,26 @@ console.log("PROFILE JS chargé");
     qs("#profile-max-list").innerHTML = `<div style="opacity:.75;padding:10px 0;">Chargement…</div>`;
     qs("#profile-history").innerHTML = `<div style="opacity:.75;padding:10px 0;">Chargement…</div>`;
 
-    // 1) users : score / tier
+    // 1) un seul appel : score / tier + exercices + historique
+    let me = null;
+    let exercises = [];
+    let allPerfs = [];
     try {
-      const users = await getJSON("/api/users");
-      const me = Array.isArray(users) ? users.find(u => String(u.user_id) === String(userId)) : null;
-      if (me) {
-        qs("#profile-name").textContent = me.username || usernameFromUi || "Profil";
-        qs("#profile-tier").textContent = me.tier || "—";
-        qs("#profile-score").textContent = (me.score ?? "—");
-      }
+      const data = await getJSON(`/api/dashboard?user_id=${encodeURIComponent(userId)}&fields=user,exercises,performances`);
+      me = data?.user || null;
+      exercises = Array.isArray(data?.exercises) ? data.exercises : [];
+      allPerfs = Array.isArray(data?.performances) ? data.performances : [];
     } catch (e) {
-      console.error("Profil: erreur /api/users", e);
+      console.error("Profil: erreur /api/dashboard", e);
     }
 
-    // 2) exercises : max perfs + ids
-    let exercises = [];
-    try {
-      exercises = await getJSON(`/api/exercises?user_id=${encodeURIComponent(userId)}`);
-      if (!Array.isArray(exercises)) exercises = [];
-    } catch (e) {
-      console.error("Profil: erreur /api/exercises", e);
-      exercises = [];
+    if (me) {
+      qs("#profile-name").textContent = me.username || usernameFromUi || "Profil";
+      qs("#profile-tier").textContent = me.tier || "—";
+      qs("#profile-score").textContent = (me.score ?? "—");
     }
 
+    // 2) exercises : max perfs
     const maxBox = qs("#profile-max-list");
     if (exercises.length === 0) {
       maxBox.innerHTML = `<div style="opacity:.75;padding:10px 0;">Aucune performance maximale.</div>`;
@@ -176,25 +173,6 @@ console.log("PROFILE JS chargé");
       if (id) exNameById.set(String(id), name);
     }
 
-    let allPerfs = [];
-    try {
-      const ids = exercises.map(e => e.exercise_id).filter(Boolean);
-
-      const perEx = await Promise.all(ids.map(async (eid) => {
-        try {
-          const list = await getJSON(`/api/performances?user_id=${encodeURIComponent(userId)}&exercise_id=${encodeURIComponent(eid)}`);
-          return Array.isArray(list) ? list.map(p => ({ ...p, exercise_id: eid })) : [];
-        } catch {
-          return [];
-        }
-      }));
-
-      allPerfs = perEx.flat();
-    } catch (e) {
-      console.error("Profil: erreur historique", e);
-      allPerfs = [];
-    }
-
     let totalVol = 0;
     for (const p of allPerfs) totalVol += perfVolume(p);
     qs("#profile-volume").textContent = formatKgCompact(totalVol);
@@ -0,0 +1,758 @@
+# storage.py
+
+import fcntl
+import json
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from bisect import bisect_left, insort
+
+from gspread.utils import rowcol_to_a1, numericise_all, to_records
+
+
+# -------------------
+# SCHEMA (ordre des colonnes = ordre dans le Sheet)
+# -------------------
+
+TABLES = {
+    "users": [
+        "user_id", "username", "password_hash", "role", "gender",
+        "age", "height", "is_active", "created_at",
+    ],
+    "exercises": [
+        "exercise_id", "user_id", "name", "zone", "video_url", "created_at",
+    ],
+    "performances": [
+        "perf_id", "user_id", "exercise_id", "date", "weight",
+        "reps", "ressenti", "notes", "created_at",
+    ],
+}
+
+PRIMARY_KEYS = {
+    "users": "user_id",
+    "exercises": "exercise_id",
+    "performances": "perf_id",
+}
+
+# Colonnes comparées en texte (les endpoints font toujours str(...) == str(...))
+TEXT_COLUMNS = {"user_id", "exercise_id", "perf_id", "username"}
+
+INDEXES = {
+    "users": [("username",)],
+    "exercises": [("user_id",)],
+    "performances": [("user_id", "exercise_id"), ("user_id", "date")],
+}
+
+
+def matches(row: dict, filters: dict) -> bool:
+    return all(str(row.get(k)) == str(v) for k, v in filters.items())
+
+
+# -------------------
+# INDEX clé -> numéro de ligne (Sheets)
+# -------------------
+
+class RowIndex:
+    """
+    Clé primaire -> numéro de ligne dans l'onglet, sans relire l'onglet à chaque suppression.
+    Les numéros sont gardés dans la numérotation de la dernière lecture complète ;
+    les lignes supprimées depuis sont dans une liste triée, et le numéro courant vaut
+    `ligne d'origine - nb de lignes supprimées au-dessus` (bisect, O(log n)).
+    """
+
+    def __init__(self, header: list, keys: list, pk: str):
+        self.header = header
+        self.col = header.index(pk)
+        self.count = len(keys)  # lignes de données actuellement dans l'onglet
+        self._rows = {str(k): i + 2 for i, k in enumerate(keys) if k not in ["", None]}
+        self._deleted = []
+
+    def row_of(self, key):
+        orig = self._rows.get(str(key))
+        if orig is None:
+            return None
+        return orig - bisect_left(self._deleted, orig)
+
+    def appended(self, first_row: int, keys: list):
+        # Les lignes ajoutées sont après toutes les lignes supprimées
+        for i, k in enumerate(keys):
+            self._rows[str(k)] = first_row + i + len(self._deleted)
+        self.count += len(keys)
+
+    def removed(self, key):
+        orig = self._rows.pop(str(key), None)
+        if orig is not None:
+            insort(self._deleted, orig)
+            self.count -= 1
+
+
+def records_of(values: list) -> list:
+    """Valeurs brutes d'un onglet (en-tête en 1re ligne) -> dicts, comme get_all_records."""
+    if not values:
+        return []
+    header = values[0]
+    rows = [list(v) + [""] * (len(header) - len(v)) for v in values[1:]]
+    return to_records(header, [numericise_all(r, default_blank="") for r in rows])
+
+
+def _first_row_of(response) -> int:
+    """Première ligne écrite d'après la réponse append (updates.updatedRange = 'onglet!A12:I14')."""
+    try:
+        updated = response["updates"]["updatedRange"]
+        return int(re.search(r"[A-Z]+(\d+)", updated.split("!")[-1]).group(1))
+    except Exception:
+        return None
+
+
+# -------------------
+# BACKEND GOOGLE SHEETS (historique)
+# -------------------
+
+class SheetsStorage:
+    """
+    Google Sheets comme stockage principal : chaque lecture télécharge l'onglet.
+    `sheets` est le SheetsClient partagé, `names` associe table -> nom d'onglet.
+    Un RowIndex par table évite de retélécharger l'onglet pour supprimer.
+    """
+
+    def __init__(self, sheets, names: dict):
+        self._sheets = sheets
+        self._names = names
+        self._index = {}
+        self._index_lock = threading.Lock()
+
+    def _run(self, table: str, op, kind: str = "read", operation: str = None):
+        return self._sheets.run(self._names[table], op, kind, operation)
+
+    def _read(self, table: str, ranges: list) -> list:
+        return self._sheets.read(self._names[table], ranges)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def load(self, table: str) -> list:
+        records = records_of(self._read(table, [""])[0])
+
+        # get_all_records ne saute aucune ligne : records[i] = ligne i + 2
+        pk = PRIMARY_KEYS[table]
+        if records and pk in records[0]:
+            with self._index_lock:
+                self._index[table] = RowIndex(list(records[0].keys()), [r.get(pk) for r in records], pk)
+        return records
+
+    @staticmethod
+    def _checksum(header: list, record: dict) -> int:
+        return zlib.crc32("\x1f".join(str(record.get(h, "")) for h in header).encode("utf-8"))
+
+    @classmethod
+    def _watermark(cls, table: str, header: list, records: list) -> dict:
+        if not header:
+            return None
+        last = records[-1] if records else {}
+        return {
+            "header": list(header),
+            "count": len(records),
+            "last_key": str(last.get(PRIMARY_KEYS[table], "")),
+            "last_created": str(last.get("created_at", "")),
+            "last_crc": cls._checksum(header, last) if records else None,
+        }
+
+    def load_delta(self, table: str, watermark: dict = None):
+        """
+        Lignes ajoutées depuis `watermark` (nb de lignes + clé / created_at / CRC de la dernière),
+        en une lecture bornée à partir de la dernière ligne connue.
+        Renvoie (records, watermark, full) ; full=True si l'onglet a été relu entièrement
+        (pas de watermark, ou dernière ligne connue déplacée, modifiée ou supprimée :
+        une suppression plus haut décale les lignes, le contrôle échoue).
+        """
+        if watermark:
+            header, count = watermark["header"], watermark["count"]
+            last_col = re.sub(r"\d+", "", rowcol_to_a1(1, len(header)))
+            # records[i] = ligne i + 2 : on relit depuis la dernière ligne connue (ou l'en-tête)
+            values = self._read(table, [f"A{count + 1}:{last_col}"])[0]
+            values = [list(v) + [""] * (len(header) - len(v)) for v in values]
+
+            if values and self._unchanged(table, watermark, values[0]):
+                records = to_records(header, [numericise_all(v, default_blank="") for v in values[1:]])
+                with self._index_lock:
+                    index = self._index.get(table)
+                    if index is not None and index.count == count:
+                        index.appended(count + 2, [r.get(PRIMARY_KEYS[table]) for r in records])
+                    else:
+                        self._index.pop(table, None)
+
+                new_watermark = self._watermark(table, header, records) if records else watermark
+                if records:
+                    new_watermark["count"] += count
+                return records, new_watermark, False
+
+        records = self.load(table)
+        header = list(records[0].keys()) if records else None
+        return records, self._watermark(table, header, records), True
+
+    @classmethod
+    def _unchanged(cls, table: str, watermark: dict, row: list) -> bool:
+        header = watermark["header"]
+        if watermark["count"] == 0:
+            return [str(v) for v in row] == [str(h) for h in header]
+        record = dict(zip(header, numericise_all(row, default_blank="")))
+        if str(record.get(PRIMARY_KEYS[table], "")) != watermark["last_key"]:
+            return False
+        if "created_at" in record and str(record["created_at"]) != watermark["last_created"]:
+            return False
+        crc = watermark.get("last_crc")
+        return crc is None or cls._checksum(header, record) == crc
+
+    def find(self, table: str, **filters) -> list:
+        return [r for r in self.load(table) if matches(r, filters)]
+
+    def append(self, table: str, row: list):
+        self.append_many(table, [row])
+
+    def append_many(self, table: str, rows: list):
+        if not rows:
+            return
+        response = self._run(table, lambda ws: ws.append_rows(rows), "write", "append_rows")
+
+        with self._index_lock:
+            index = self._index.get(table)
+            if index is None:
+                return
+            first_row = _first_row_of(response) or index.count + 2
+            pk_pos = TABLES[table].index(PRIMARY_KEYS[table])
+            index.appended(first_row, [row[pk_pos] for row in rows])
+
+    def existing_keys(self, table: str, keys: list, margin: int = 500) -> set:
+        """
+        Clés de `keys` déjà présentes en fin d'onglet (une lecture de la colonne clé, à partir
+        de `margin` lignes avant la fin connue) : un append en échec (5xx, timeout) a pu être
+        appliqué quand même.
+        """
+        keys = {str(k) for k in keys}
+        pk = PRIMARY_KEYS[table]
+        with self._index_lock:
+            index = self._index.get(table)
+            header = index.header if index is not None else TABLES[table]
+            start = max(2, index.count + 2 - margin) if index is not None else 2
+        col = re.sub(r"\d+", "", rowcol_to_a1(1, header.index(pk) + 1))
+        values = self._read(table, [f"{col}{start}:{col}"])[0]
+        return {str(v[0]) for v in values if v and str(v[0]) in keys}
+
+    def _rebuild_index(self, table: str):
+        values = self._read(table, [""])[0]
+        pk = PRIMARY_KEYS[table]
+        if not values:
+            self._index.pop(table, None)
+            return None
+
+        header = values[0]
+        if pk not in header:
+            raise RuntimeError(f"Colonne {pk} introuvable dans l'onglet {table}")
+
+        col = header.index(pk)
+        keys = [row[col] if len(row) > col else "" for row in values[1:]]
+        index = self._index[table] = RowIndex(header, keys, pk)
+        return index
+
+    def _locate(self, table: str, index: RowIndex, keys: list) -> dict:
+        """
+        clé -> ligne, vérifié par un seul batch_get sur la colonne clé
+        (l'onglet a pu être modifié à la main ou par un autre worker).
+        """
+        rows = {k: index.row_of(k) for k in keys}
+        rows = {k: r for k, r in rows.items() if r is not None}
+        if not rows:
+            return {}
+
+        cells = [rowcol_to_a1(r, index.col + 1) for r in rows.values()]
+        found = self._read(table, cells)
+
+        for (k, _), value in zip(rows.items(), found):
+            actual = value[0][0] if value and value[0] else ""
+            if str(actual) != str(k):
+                return None
+        return rows
+
+    def _resolve(self, table: str, keys: list):
+        """(index, clé -> ligne) ; à appeler sous _index_lock."""
+        index = self._index.get(table)
+        fresh = index is None
+        if fresh:
+            index = self._rebuild_index(table)
+        if index is None:
+            return None, {}
+
+        rows = self._locate(table, index, keys)
+        if not fresh and (rows is None or len(rows) < len(keys)):
+            # Index désynchronisé, ou clé inconnue de l'index (ligne ajoutée par un autre
+            # worker ou à la main depuis la dernière lecture) : on relit l'onglet une fois
+            index = self._rebuild_index(table)
+            if index is None:
+                return None, {}
+            rows = self._locate(table, index, keys)
+        return index, rows or {}
+
+    def update(self, table: str, key: str, values: dict) -> bool:
+        """
+        Réécrit quelques colonnes de la ligne `key` (un seul batch_update de cellules).
+        Renvoie False si la ligne est introuvable.
+        """
+        key = str(key)
+        with self._index_lock:
+            index, rows = self._resolve(table, [key])
+            if key not in rows:
+                return False
+
+            data = [
+                {"range": rowcol_to_a1(rows[key], index.header.index(c) + 1), "values": [[v]]}
+                for c, v in values.items()
+            ]
+            self._run(table, lambda ws: ws.batch_update(data), "write", "update_cells")
+            return True
+
+    def delete(self, table: str, key: str) -> bool:
+        """
+        Supprime la ligne dont la clé primaire vaut `key`.
+        Renvoie False si la ligne est introuvable.
+        """
+        return str(key) in self.delete_many(table, [key])
+
+    def delete_many(self, table: str, keys: list) -> set:
+        """
+        Supprime plusieurs lignes en un seul batchUpdate (deleteDimension, du bas vers le haut).
+        Renvoie l'ensemble des clés effectivement supprimées.
+        """
+        keys = [str(k) for k in dict.fromkeys(keys)]
+        if not keys:
+            return set()
+
+        with self._index_lock:
+            index, rows = self._resolve(table, keys)
+            if not rows:
+                return set()
+
+            def _delete(ws):
+                requests = [
+                    {
+                        "deleteDimension": {
+                            "range": {
+                                "sheetId": ws.id,
+                                "dimension": "ROWS",
+                                "startIndex": r - 1,
+                                "endIndex": r,
+                            }
+                        }
+                    }
+                    for r in sorted(rows.values(), reverse=True)
+                ]
+                return ws.spreadsheet.batch_update({"requests": requests})
+
+            self._run(table, _delete, "write", "delete_rows")
+
+            for k in rows:
+                index.removed(k)
+            return set(rows)
+
+
+# -------------------
+# BACKEND SQLITE (local, Sheets en réplique asynchrone)
+# -------------------
+
+class SQLiteStorage:
+    """
+    Stockage local SQLite (mode WAL) avec tables indexées.
+    Les écritures sont appliquées localement puis mises dans une outbox ;
+    un thread de synchro pousse l'outbox vers Sheets et recopie Sheets en local.
+    Plusieurs workers partagent la base : un seul à la fois synchronise (verrou flock
+    sur <base>.sync.lock, libéré à la mort du process, un autre prend alors le relais),
+    sinon chaque ligne de l'outbox partirait une fois par worker.
+    La recopie de Sheets est incrémentale (SheetsStorage.load_delta, watermark gardé en
+    base), avec une relecture complète au moins toutes les `full_every` secondes.
+    """
+
+    def __init__(self, path: str, replica: SheetsStorage = None, sync_interval: float = 15.0,
+                 full_every: float = 600.0):
+        self.path = path
+        self.replica = replica
+        self.sync_interval = sync_interval
+        self.full_every = full_every
+        self._full_at = {}  # table -> time.monotonic() de la dernière recopie complète
+
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._sync_lock = None  # fichier verrouillé tant que ce process est le synchroniseur
+
+        self._init_schema()
+
+    # ---------- connexion ----------
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        with conn:
+            for table, columns in TABLES.items():
+                cols = ", ".join(
+                    f"{c} TEXT UNIQUE" if c == PRIMARY_KEYS[table]
+                    else (f"{c} TEXT" if c in TEXT_COLUMNS else c)
+                    for c in columns
+                )
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} "
+                    f"(seq INTEGER PRIMARY KEY AUTOINCREMENT, {cols}, extra TEXT)"
+                )
+                for idx_cols in INDEXES.get(table, []):
+                    name = f"idx_{table}_{'_'.join(idx_cols)}"
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(idx_cols)})")
+
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, tbl TEXT, op TEXT, key TEXT, payload TEXT, created REAL)"
+            )
+            # Date de la dernière recopie de Sheets (par le worker synchroniseur)
+            conn.execute("CREATE TABLE IF NOT EXISTS sync_state (name TEXT PRIMARY KEY, value REAL)")
+            # Watermark Sheets de la dernière recopie, par table (JSON)
+            conn.execute("CREATE TABLE IF NOT EXISTS sync_watermarks (tbl TEXT PRIMARY KEY, watermark TEXT)")
+
+    # ---------- conversion ----------
+
+    @staticmethod
+    def _to_db(table: str, record: dict) -> list:
+        columns = TABLES[table]
+        values = []
+        for c in columns:
+            v = record.get(c)
+            if v in ["", None]:
+                v = None if c in TEXT_COLUMNS else ""
+            elif isinstance(v, bool):
+                v = "TRUE" if v else "FALSE"  # rendu identique à Sheets
+            elif c in TEXT_COLUMNS:
+                v = str(v)
+            values.append(v)
+
+        extra = {k: v for k, v in record.items() if k not in columns}
+        values.append(json.dumps(extra, ensure_ascii=False) if extra else None)
+        return values
+
+    @staticmethod
+    def _from_db(table: str, row: sqlite3.Row) -> dict:
+        record = {c: ("" if row[c] is None else row[c]) for c in TABLES[table]}
+        if row["extra"]:
+            record.update(json.loads(row["extra"]))
+        return record
+
+    def _insert(self, conn, table: str, record: dict, ignore: bool = False):
+        columns = TABLES[table] + ["extra"]
+        verb = "INSERT OR IGNORE" if ignore else "INSERT OR REPLACE"
+        conn.execute(
+            f"{verb} INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            self._to_db(table, record),
+        )
+
+    # ---------- API stockage ----------
+
+    def load(self, table: str) -> list:
+        rows = self._conn().execute(f"SELECT * FROM {table} ORDER BY seq").fetchall()
+        return [self._from_db(table, r) for r in rows]
+
+    @staticmethod
+    def _generation(conn, table: str) -> int:
+        row = conn.execute("SELECT value FROM sync_state WHERE name = ?", (f"gen:{table}",)).fetchone()
+        return int(row["value"]) if row else 0
+
+    @staticmethod
+    def _bump_generation(conn, table: str):
+        """Ligne modifiée ou supprimée : les deltas par seq ne suffisent plus (relecture complète)."""
+        conn.execute(
+            "INSERT INTO sync_state (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (f"gen:{table}",),
+        )
+
+    def load_delta(self, table: str, watermark: dict = None):
+        """
+        Lignes insérées depuis `watermark` (seq local, AUTOINCREMENT donc jamais réutilisé).
+        Relecture complète si la table a eu des modifications / suppressions depuis
+        (génération différente) ou sans watermark local.
+        """
+        conn = self._conn()
+        gen = self._generation(conn, table)  # lue avant les lignes : un changement concurrent -> full au tour suivant
+        if watermark and watermark.get("gen") == gen and "seq" in watermark:
+            rows = conn.execute(f"SELECT * FROM {table} WHERE seq > ? ORDER BY seq", (watermark["seq"],)).fetchall()
+            if not rows:
+                return [], watermark, False
+            return [self._from_db(table, r) for r in rows], {
+                "gen": gen,
+                "seq": rows[-1]["seq"],
+                "count": watermark.get("count", 0) + len(rows),
+            }, False
+
+        rows = conn.execute(f"SELECT * FROM {table} ORDER BY seq").fetchall()
+        return [self._from_db(table, r) for r in rows], {
+            "gen": gen,
+            "seq": rows[-1]["seq"] if rows else 0,
+            "count": len(rows),
+        }, True
+
+    def find(self, table: str, **filters) -> list:
+        for k in filters:
+            if k not in TABLES[table]:
+                raise KeyError(k)
+
+        where = " AND ".join(f"{k} = ?" for k in filters) or "1"
+        rows = self._conn().execute(
+            f"SELECT * FROM {table} WHERE {where} ORDER BY seq",
+            [str(v) for v in filters.values()],
+        ).fetchall()
+        return [self._from_db(table, r) for r in rows]
+
+    def append(self, table: str, row: list):
+        self.append_many(table, [row])
+
+    def append_many(self, table: str, rows: list):
+        pk = PRIMARY_KEYS[table]
+        with self._write_lock, self._conn() as conn:
+            for row in rows:
+                record = dict(zip(TABLES[table], row))
+                self._insert(conn, table, record)
+                conn.execute(
+                    "INSERT INTO outbox (tbl, op, key, payload, created) VALUES (?, 'append', ?, ?, ?)",
+                    (table, str(record.get(pk)), json.dumps(row, ensure_ascii=False, default=str), time.time()),
+                )
+
+    def update(self, table: str, key: str, values: dict) -> bool:
+        for k in values:
+            if k not in TABLES[table]:
+                raise KeyError(k)
+
+        pk = PRIMARY_KEYS[table]
+        sets = ", ".join(f"{k} = ?" for k in values)
+        with self._write_lock, self._conn() as conn:
+            cur = conn.execute(
+                f"UPDATE {table} SET {sets} WHERE {pk} = ?",
+                [str(v) if k in TEXT_COLUMNS else v for k, v in values.items()] + [str(key)],
+            )
+            if cur.rowcount == 0:
+                return False
+            self._bump_generation(conn, table)
+            conn.execute(
+                "INSERT INTO outbox (tbl, op, key, payload, created) VALUES (?, 'update', ?, ?, ?)",
+                (table, str(key), json.dumps(values, ensure_ascii=False, default=str), time.time()),
+            )
+        return True
+
+    def delete(self, table: str, key: str) -> bool:
+        return str(key) in self.delete_many(table, [key])
+
+    def delete_many(self, table: str, keys: list) -> set:
+        pk = PRIMARY_KEYS[table]
+        deleted = set()
+        with self._write_lock, self._conn() as conn:
+            for key in dict.fromkeys(str(k) for k in keys):
+                cur = conn.execute(f"DELETE FROM {table} WHERE {pk} = ?", (key,))
+                if cur.rowcount == 0:
+                    continue
+                conn.execute(
+                    "INSERT INTO outbox (tbl, op, key, payload, created) VALUES (?, 'delete', ?, NULL, ?)",
+                    (table, key, time.time()),
+                )
+                deleted.add(key)
+            if deleted:
+                self._bump_generation(conn, table)
+        return deleted
+
+    # ---------- synchro Sheets ----------
+
+    def _is_syncer(self) -> bool:
+        """True si ce process synchronise la base (verrou pris maintenant ou déjà détenu)."""
+        if self._sync_lock is None:
+            f = open(self.path + ".sync.lock", "a+b")
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.close()
+                return False
+            self._sync_lock = f
+        return True
+
+    def _pulled(self) -> bool:
+        return self._conn().execute("SELECT 1 FROM sync_state WHERE name = 'pulled_at'").fetchone() is not None
+
+    def start(self, initial_wait: float = 60.0):
+        if self.replica is None or self._thread is not None:
+            return
+
+        # Premier démarrage : Sheets jamais recopié -> on le recopie avant de servir
+        # (ou on attend la copie faite par le worker synchroniseur)
+        if not self._pulled():
+            deadline = time.monotonic() + initial_wait
+            while not self._is_syncer() and not self._pulled() and time.monotonic() < deadline:
+                time.sleep(0.5)
+            if self._sync_lock is not None and not self._pulled():
+                try:
+                    self.sync_once()
+                except Exception as e:
+                    print(f"⚠️ Synchro Sheets initiale impossible: {e}")
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sync_loop, name="sheets-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.sync_interval + 5)
+            self._thread = None
+        if self.replica is not None and self._is_syncer():
+            try:
+                self._push()
+            except Exception as e:
+                print(f"⚠️ Outbox non vidée à l'arrêt: {e}")
+        if self._sync_lock is not None:
+            self._sync_lock.close()  # un autre worker reprend la synchro
+            self._sync_lock = None
+
+    def _sync_loop(self):
+        while not self._stop.wait(self.sync_interval):
+            try:
+                if self._is_syncer():
+                    self.sync_once()
+            except Exception as e:
+                print(f"⚠️ Synchro Sheets: {e}")
+
+    def sync_once(self):
+        self._push()
+        self._pull()
+
+    def _push(self):
+        """
+        Pousse l'outbox vers Sheets dans l'ordre ; les appends (ou deletes)
+        consécutifs d'une même table partent en un seul appel.
+        """
+        conn = self._conn()
+        ops = conn.execute("SELECT id, tbl, op, key, payload FROM outbox ORDER BY id").fetchall()
+
+        i = 0
+        while i < len(ops):
+            op = ops[i]
+            j = i
+            while j < len(ops) and ops[j]["op"] == op["op"] and ops[j]["tbl"] == op["tbl"]:
+                j += 1
+            batch = ops[i:j]
+
+            if op["op"] == "append":
+                self.replica.append_many(op["tbl"], [json.loads(o["payload"]) for o in batch])
+            elif op["op"] == "update":
+                for o in batch:
+                    self.replica.update(op["tbl"], o["key"], json.loads(o["payload"]))
+            else:
+                self.replica.delete_many(op["tbl"], [o["key"] for o in batch])
+
+            with self._write_lock, conn:
+                conn.executemany("DELETE FROM outbox WHERE id = ?", [(o["id"],) for o in batch])
+            i = j
+
+    def _pull(self):
+        """
+        Recopie chaque onglet en local : fin de l'onglet seulement (load_delta) si rien d'autre
+        n'a changé, sinon relecture complète appliquée comme un diff (seules les lignes
+        différentes sont écrites, le verrou d'écriture n'est tenu que pour ce diff).
+        Les lignes encore dans l'outbox (pas encore poussées) gardent leur version locale.
+        """
+        conn = self._conn()
+        for table in TABLES:
+            row = conn.execute("SELECT watermark FROM sync_watermarks WHERE tbl = ?", (table,)).fetchone()
+            watermark = json.loads(row["watermark"]) if row and row["watermark"] else None
+            if time.monotonic() - self._full_at.get(table, float("-inf")) >= self.full_every:
+                watermark = None
+
+            remote, watermark, full = self.replica.load_delta(table, watermark)
+            if full:
+                self._full_at[table] = time.monotonic()
+                self._pull_full(table, remote)
+            elif remote:
+                with self._write_lock, conn:
+                    pending = self._pending_keys(conn, table)
+                    pk = PRIMARY_KEYS[table]
+                    for record in remote:
+                        if str(record.get(pk)) not in pending:
+                            self._insert(conn, table, record, ignore=True)
+
+            with self._write_lock, conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO sync_watermarks (tbl, watermark) VALUES (?, ?)",
+                    (table, json.dumps(watermark, default=str) if watermark else None),
+                )
+
+        with self._write_lock, conn:
+            conn.execute("INSERT OR REPLACE INTO sync_state (name, value) VALUES ('pulled_at', ?)", (time.time(),))
+
+    @staticmethod
+    def _pending_keys(conn, table: str) -> set:
+        return {r["key"] for r in conn.execute("SELECT key FROM outbox WHERE tbl = ?", (table,))}
+
+    def _pull_full(self, table: str, remote: list):
+        """Onglet complet -> local : diff calculé hors verrou, appliqué en une transaction courte."""
+        conn = self._conn()
+        pk = PRIMARY_KEYS[table]
+        columns = TABLES[table] + ["extra"]
+        local = {}
+        local_orphans = []  # lignes sans clé : remplacées en bloc si elles diffèrent
+        for r in conn.execute(f"SELECT {', '.join(columns)} FROM {table}"):
+            values = tuple(r[c] for c in columns)
+            if r[pk] is None:
+                local_orphans.append(values)
+            else:
+                local[r[pk]] = values
+
+        upserts, orphans, seen = {}, [], set()
+        for record in remote:
+            values = tuple(self._to_db(table, record))
+            key = values[columns.index(pk)]
+            if key is None:
+                orphans.append(values)
+            elif key not in seen:  # clé en double dans l'onglet : la 1re ligne gagne
+                seen.add(key)
+                if local.pop(key, None) != values:
+                    upserts[key] = values
+        deletes = list(local)  # clés locales absentes de l'onglet
+        orphans_changed = sorted(orphans, key=repr) != sorted(local_orphans, key=repr)
+        if not upserts and not deletes and not orphans_changed:
+            return
+
+        sets = ", ".join(f"{c} = ?" for c in columns)
+        placeholders = ", ".join("?" * len(columns))
+        with self._write_lock, conn:
+            pending = self._pending_keys(conn, table)
+            changed = orphans_changed
+            for key in deletes:
+                if key not in pending:
+                    changed |= conn.execute(f"DELETE FROM {table} WHERE {pk} = ?", (key,)).rowcount > 0
+            for key, values in upserts.items():
+                if key in pending:
+                    continue
+                # UPDATE garde le seq de la ligne (ordre de l'onglet) ; INSERT si elle est nouvelle
+                if conn.execute(f"UPDATE {table} SET {sets} WHERE {pk} = ?", values + (key,)).rowcount:
+                    changed = True
+                else:
+                    conn.execute(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", values)
+            if orphans_changed:
+                conn.execute(f"DELETE FROM {table} WHERE {pk} IS NULL")
+                conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", orphans)
+            if changed:  # lignes ajoutées seulement : le delta par seq suffit
+                self._bump_generation(conn, table)
@@ -0,0 +1,256 @@
+# tables.py
+
+import itertools
+import threading
+import time
+from collections import defaultdict
+
+from records import UserRecord, ExerciseRecord, PerformanceRecord
+from shared import apply_change
+
+
+def perf_id_of(row: dict):
+    return row.get("perf_id") or row.get("performance_id") or row.get("id")
+
+
+# -------------------
+# TABLES INDEXÉES
+# -------------------
+# Chaque table garde les lignes converties une fois en records typés (records.py)
+# + des index secondaires construits une fois par rafraîchissement du cache.
+# `version` change à chaque rechargement et à chaque écriture locale ; les numéros
+# viennent d'un compteur commun au process, une table rechargée ne reprend donc
+# jamais un numéro déjà servi (ETags des endpoints de lecture).
+_VERSIONS = itertools.count(1)
+
+class UsersTable:
+    def __init__(self, rows: list):
+        self.rows = [UserRecord.of(r) for r in rows]
+        self.version = next(_VERSIONS)
+        self.by_id = {}
+        self.by_username = defaultdict(list)
+        for r in self.rows:
+            self._index(r)
+
+    def _index(self, row: UserRecord):
+        self.by_id[str(row.user_id)] = row
+        self.by_username[str(row.username)].append(row)
+
+    def add(self, row: dict) -> UserRecord:
+        row = UserRecord.of(row)
+        self.rows.append(row)
+        self._index(row)
+        self.version = next(_VERSIONS)
+        return row
+
+    def get(self, user_id):
+        return self.by_id.get(str(user_id))
+
+    def named(self, username) -> list:
+        return self.by_username.get(str(username), [])
+
+
+class ExercisesTable:
+    def __init__(self, rows: list):
+        self.rows = [ExerciseRecord.of(r) for r in rows]
+        self.version = next(_VERSIONS)
+        self.by_id = {}
+        self.by_user = defaultdict(list)
+        for r in self.rows:
+            self._index(r)
+
+    def _index(self, row: ExerciseRecord):
+        self.by_id[str(row.exercise_id)] = row
+        self.by_user[str(row.user_id)].append(row)
+
+    def add(self, row: dict) -> ExerciseRecord:
+        row = ExerciseRecord.of(row)
+        self.rows.append(row)
+        self._index(row)
+        self.version = next(_VERSIONS)
+        return row
+
+    def get(self, exercise_id):
+        return self.by_id.get(str(exercise_id))
+
+    def for_user(self, user_id) -> list:
+        return self.by_user.get(str(user_id), [])
+
+
+class PerformancesTable:
+    """
+    Index :
+    - by_user[user_id] -> lignes
+    - by_user_exercise[(user_id, exercise_id)] -> lignes
+    - by_id[perf_id] -> ligne
+    Lignes = PerformanceRecord (`_weight`, `_reps`, `_rpe`, `_date` déjà convertis).
+    `version` augmente à chaque ajout / suppression.
+    """
+
+    def __init__(self, rows: list):
+        self.rows = [PerformanceRecord.of(r) for r in rows]
+        self.version = next(_VERSIONS)
+        self.by_user = defaultdict(list)
+        self.by_user_exercise = defaultdict(list)
+        self.by_id = {}
+        self._lock = threading.Lock()
+        for r in self.rows:
+            self._index(r)
+
+    def _index(self, row: PerformanceRecord):
+        user_id = str(row.user_id)
+        self.by_user[user_id].append(row)
+        self.by_user_exercise[(user_id, str(row.exercise_id))].append(row)
+
+        perf_id = perf_id_of(row)
+        if perf_id:
+            self.by_id[str(perf_id)] = row
+
+    def add(self, row: dict) -> PerformanceRecord:
+        """Ajoute une ligne écrite par l'app (sans recharger le Sheet)."""
+        row = PerformanceRecord.of(row)
+        with self._lock:
+            self.rows.append(row)
+            self._index(row)
+            self.version = next(_VERSIONS)
+        return row
+
+    def remove(self, perf_id):
+        """Retire une ligne des index ; renvoie la ligne supprimée ou None."""
+        with self._lock:
+            row = self.by_id.pop(str(perf_id), None)
+            if row is None:
+                return None
+
+            user_id = str(row.user_id)
+            for bucket in (
+                self.rows,
+                self.by_user.get(user_id, []),
+                self.by_user_exercise.get((user_id, str(row.exercise_id)), []),
+            ):
+                for i, r in enumerate(bucket):
+                    if r is row:
+                        del bucket[i]
+                        break
+            self.version = next(_VERSIONS)
+            return row
+
+    def for_user(self, user_id) -> list:
+        return self.by_user.get(str(user_id), [])
+
+    def chunks(self, user_id=None, size: int = 1000):
+        """
+        Lignes d'un user (toutes si user_id est None) par tranches de `size`, copiées
+        une tranche à la fois sous le verrou : jamais de copie de la liste complète.
+        Une suppression pendant le parcours peut décaler la tranche suivante d'une ligne.
+        """
+        rows = self.rows if user_id is None else self.for_user(user_id)
+        start = 0
+        while True:
+            with self._lock:
+                chunk = rows[start:start + size]
+            if not chunk:
+                return
+            start += len(chunk)
+            yield chunk
+
+    def for_exercise(self, user_id, exercise_id) -> list:
+        return self.by_user_exercise.get((str(user_id), str(exercise_id)), [])
+
+    def get(self, perf_id):
+        return self.by_id.get(str(perf_id))
+
+
+# -------------------
+# CHARGEMENT (loaders du cache)
+# -------------------
+
+class TableLoader:
+    """
+    Loader de cache d'une table, incrémental :
+    - garde la table renvoyée et le watermark de la dernière lecture
+      (nb de lignes, dernière clé / created_at / CRC)
+    - un rafraîchissement ne relit que la fin de l'onglet ; les lignes nouvelles sont
+      ajoutées à la même table (comme une écriture locale, `on_applied` met à jour
+      classement, stats...) : coût proportionnel au delta, pas à la table
+    - relecture complète si le contrôle de la dernière ligne échoue (suppression,
+      modification) et au moins toutes les `full_every` secondes (éditions à la main) ;
+      contenu identique -> la table en cache est gardée
+    Le watermark est aussi enregistré dans le snapshot disque.
+    """
+
+    def __init__(self, storage, name: str, kind, pk: str, full_every: float = 600.0, on_applied=None):
+        self.storage = storage
+        self.name = name
+        self.kind = kind
+        self.pk = pk
+        self.full_every = full_every
+        self.on_applied = on_applied  # (table, op, ligne) -> structures dérivées
+        self.watermark = None
+        self.table = None
+        self.full_at = float("-inf")
+
+        self.full_loads = 0
+        self.delta_loads = 0
+        self.delta_rows = 0
+
+    def __call__(self):
+        if self.table is not None and self.watermark and time.monotonic() - self.full_at < self.full_every:
+            new, watermark, full = self.storage.load_delta(self.name, self.watermark)
+            if not full:
+                self.watermark = watermark
+                self.delta_loads += 1
+                return self._merge(self.table, new)
+        else:
+            new, watermark, full = self.storage.load_delta(self.name, None)
+        return self._full(new, watermark)
+
+    def restore(self, rows: list, watermark: dict):
+        """Lignes du snapshot + lignes ajoutées depuis (relecture complète si l'onglet a changé autrement)."""
+        new, watermark, full = self.storage.load_delta(self.name, watermark)
+        if full:
+            return self._full(new, watermark)
+        self.watermark = watermark
+        self.full_at = time.monotonic()  # snapshot = dernier état complet connu
+        # Structures dérivées pas encore construites : elles partiront de la table complète
+        return self._merge(self.kind(rows), new, notify=False)
+
+    def _full(self, rows: list, watermark: dict):
+        self.watermark = watermark
+        self.full_at = time.monotonic()
+        self.full_loads += 1
+        if self.table is not None and self._same(self.table, rows):
+            # Rien n'a changé : même table, même version (ETags et classement conservés)
+            return self.table
+        self.table = self.kind(rows)
+        return self.table
+
+    @staticmethod
+    def _same(table, rows: list) -> bool:
+        """Lignes relues identiques à celles de la table en cache (écritures locales comprises)."""
+        if len(table.rows) != len(rows):
+            return False
+        return all(
+            dict(cached.items()) == {k: v for k, v in row.items() if v is not None and not k.startswith("_")}
+            for cached, row in zip(table.rows, rows)
+        )
+
+    def _merge(self, table, new: list, notify: bool = True):
+        # Les lignes écrites par ce worker sont déjà dans la table (ajoutées par les endpoints) :
+        # apply_change les ignore (table.get), les autres sont ajoutées en place
+        for r in new:
+            row = apply_change(table, self.pk, {"op": "add", "row": r})
+            if row is not None:
+                self.delta_rows += 1
+                if notify and self.on_applied:
+                    self.on_applied(self.name, "add", row)
+        self.table = table
+        return table
+
+    def stats(self) -> dict:
+        return {
+            "rows": self.watermark["count"] if self.watermark else None,
+            "full_loads": self.full_loads,
+            "delta_loads": self.delta_loads,
+            "delta_rows": self.delta_rows,
+        }
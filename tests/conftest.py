@@ -0,0 +1,33 @@
+# tests/conftest.py
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.fake_sheets import FakeSpreadsheet  # noqa: E402
+from sheets import SheetsClient  # noqa: E402
+from storage import SheetsStorage, TABLES  # noqa: E402
+
+
+def perf(i, created="2024-01-01T00:00:00"):
+    """Ligne de l'onglet performances, clé P<i>."""
+    return [f"P{i}", "u1", "e1", "2024-01-01", 10, 5, 7, "", created]
+
+
+@pytest.fixture
+def sheet():
+    """
+    Onglet performances en mémoire (5 lignes, sans latence) + users / exercises vides,
+    et un SheetsStorage branché dessus.
+    """
+    fake = FakeSpreadsheet({
+        "perfs": [TABLES["performances"]] + [perf(i) for i in range(5)],
+        "users": [TABLES["users"]],
+        "exercises": [TABLES["exercises"]],
+    }, latency=0, jitter=0)
+    client = SheetsClient("{}")
+    client._spreadsheet = fake
+    return fake, SheetsStorage(client, {"performances": "perfs", "users": "users", "exercises": "exercises"})
@@ -0,0 +1,45 @@
+# tests/test_chat.py
+
+import asyncio
+
+from chat import ChatHub
+
+
+class FakeGas:
+    def __init__(self, responses: list):
+        self.responses = list(responses)
+        self.calls = 0
+
+    async def get(self, params: dict):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+def test_gas_error_is_returned_and_not_cached():
+    error = {"ok": False, "error": "quota"}
+    gas = FakeGas([error, {"ok": True, "items": [{"id": "m1", "ts": 1, "message": "hi"}]}])
+    hub = ChatHub(gas, list_ttl=60)
+
+    async def run():
+        first = await hub.list("general", 10)
+        second = await hub.list("general", 10)
+        return first, second
+
+    (data, etag), (data2, etag2) = asyncio.run(run())
+    assert data == error and etag is None
+    assert data2["ok"] and [m["id"] for m in data2["items"]] == ["m1"] and etag2
+    assert gas.calls == 2
+
+
+def test_idle_rooms_are_bounded():
+    gas = FakeGas([{"ok": True, "items": []} for _ in range(10)])
+    hub = ChatHub(gas, max_rooms=3)
+
+    async def run():
+        for i in range(5):
+            await hub.list(f"room{i}", 10)
+        await hub.list("room2", 10)  # récemment utilisée : gardée
+        await hub.list("room5", 10)
+
+    asyncio.run(run())
+    assert list(hub._rooms) == ["room4", "room2", "room5"]
@@ -0,0 +1,99 @@
+# tests/test_leaderboard.py
+
+import threading
+
+from leaderboard import Leaderboard
+from tables import PerformancesTable, UsersTable
+
+
+def users():
+    return UsersTable([
+        {"user_id": "u1", "username": "bob", "is_active": "true"},
+        {"user_id": "u2", "username": "al", "is_active": "true"},
+        {"user_id": "u3", "username": "off", "is_active": "false"},
+    ])
+
+
+def perf(i, user_id="u1", weight=1000):
+    return {"perf_id": f"P{i}", "user_id": user_id, "exercise_id": "e1", "date": "2024-01-01", "weight": weight}
+
+
+def volumes(board) -> dict:
+    return {e["user_id"]: e["volume"] for e in board.page()}
+
+
+def write(board, perfs, row):
+    """Comme main.cached_write : table d'abord, puis structures dérivées."""
+    board.add(perfs.add(row))
+
+
+def test_build_and_deltas():
+    board, perfs = Leaderboard(), PerformancesTable([perf(0), perf(1, "u2", 500)])
+    board.ensure(users(), perfs)
+    assert volumes(board) == {"u1": 1000, "u2": 500}
+
+    write(board, perfs, perf(2, "u2", 800))
+    board.remove(perfs.remove("P0"))
+    assert [e["user_id"] for e in board.page()] == ["u2", "u1"]
+    assert board.entry("u2")["rank"] == 1 and board.entry("u3") is None
+
+
+def test_write_after_rows_copied_during_rebuild(monkeypatch):
+    board, perfs = Leaderboard(), PerformancesTable([perf(i) for i in range(7)])
+    build = Leaderboard._build
+
+    def slow_build(rows, table):
+        result = build(rows, table)
+        write(board, perfs, perf(7))  # arrive pendant la reconstruction, absente de la copie
+        return result
+
+    monkeypatch.setattr(Leaderboard, "_build", staticmethod(slow_build))
+    board.ensure(users(), perfs)
+    assert volumes(board)["u1"] == 8000
+
+
+def test_write_before_rows_copied_is_not_counted_twice(monkeypatch):
+    board, perfs = Leaderboard(), PerformancesTable([perf(i) for i in range(6)])
+    build = Leaderboard._build
+
+    def racing_build(rows, table):
+        write(board, perfs, perf(6))  # déjà dans la table quand la copie est prise
+        return build(rows, table)
+
+    monkeypatch.setattr(Leaderboard, "_build", staticmethod(racing_build))
+    board.ensure(users(), perfs)
+    assert volumes(board)["u1"] == 7000
+
+
+def test_deltas_do_not_wait_for_rebuild(monkeypatch):
+    board, perfs = Leaderboard(), PerformancesTable([perf(0)])
+    started, release = threading.Event(), threading.Event()
+    build = Leaderboard._build
+
+    def blocked_build(rows, table):
+        started.set()
+        release.wait(5)
+        return build(rows, table)
+
+    monkeypatch.setattr(Leaderboard, "_build", staticmethod(blocked_build))
+    rebuild = threading.Thread(target=board.ensure, args=(users(), perfs))
+    rebuild.start()
+    assert started.wait(5)
+
+    done = threading.Event()
+    writer = threading.Thread(target=lambda: (write(board, perfs, perf(1)), board.page(), done.set()))
+    writer.start()
+    assert done.wait(1), "delta bloqué par la reconstruction"
+
+    release.set()
+    rebuild.join(5)
+    writer.join(5)
+    assert volumes(board)["u1"] == 2000
+
+
+def test_single_entry_matches_page():
+    perfs = PerformancesTable([perf(0, "u1", 60000), perf(1, "u2", 3e8), perf(2, "u1", 5)])
+    board = Leaderboard()
+    board.ensure(users(), perfs)
+    assert [board.entry(e["user_id"]) for e in board.page()] == board.page()
+    assert board.entry("u2")["next_tier"] is None and board.entry("u2")["to_next_tier"] == 0
@@ -0,0 +1,70 @@
+# tests/test_sqlite_sync.py
+
+import pytest
+
+from conftest import perf
+from storage import SQLiteStorage
+
+
+@pytest.fixture
+def local(sheet, tmp_path):
+    fake, replica = sheet
+    full_loads = []
+    load = replica.load
+    replica.load = lambda table: full_loads.append(table) or load(table)
+    db = SQLiteStorage(str(tmp_path / "gym.db"), replica=replica, sync_interval=3600, full_every=3600)
+    db.sync_once()
+    yield fake, db, full_loads
+    db.stop()
+
+
+def keys(db) -> list:
+    return [r["perf_id"] for r in db.load("performances")]
+
+
+def test_pull_reads_only_the_end_of_the_tab(local):
+    fake, db, full_loads = local
+    assert keys(db) == ["P0", "P1", "P2", "P3", "P4"]
+    assert full_loads.count("performances") == 1
+
+    fake.worksheet("perfs").append_rows([perf(5)])
+    db.sync_once()
+    db.sync_once()
+    assert keys(db) == ["P0", "P1", "P2", "P3", "P4", "P5"]
+    assert full_loads.count("performances") == 1
+
+
+def test_full_pull_applies_hand_edits_as_a_diff(local):
+    fake, db, _ = local
+    seqs = {r["perf_id"]: r["seq"] for r in db._conn().execute("SELECT perf_id, seq FROM performances")}
+
+    ws = fake.worksheet("perfs")
+    ws.delete_rows(3)                                # P1 supprimée à la main
+    ws.batch_update([{"range": "E2", "values": [[99]]}])  # P0 modifiée
+    db.append("performances", perf(9))               # écriture locale pas encore poussée
+    db.full_every = 0
+    db._pull()
+
+    rows = {r["perf_id"]: r for r in db.load("performances")}
+    assert list(rows) == ["P0", "P2", "P3", "P4", "P9"]
+    assert rows["P0"]["weight"] == 99
+    after = {r["perf_id"]: r["seq"] for r in db._conn().execute("SELECT perf_id, seq FROM performances")}
+    assert all(after[k] == seqs[k] for k in ["P0", "P2", "P3", "P4"])  # lignes gardées en place
+
+
+def test_local_delta_by_seq(local):
+    _, db, _ = local
+    rows, watermark, full = db.load_delta("performances")
+    assert full and len(rows) == 5
+
+    assert db.load_delta("performances", watermark) == ([], watermark, False)
+
+    db.append("performances", perf(5))
+    rows, watermark, full = db.load_delta("performances", watermark)
+    assert not full and [r["perf_id"] for r in rows] == ["P5"] and watermark["count"] == 6
+
+    # Modification / suppression : le delta par seq ne la verrait pas -> relecture complète
+    db.delete("performances", "P0")
+    rows, watermark, full = db.load_delta("performances", watermark)
+    assert full and len(rows) == 5
+    assert db.load_delta("performances", watermark)[2] is False
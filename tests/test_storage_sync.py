@@ -0,0 +1,165 @@
+# tests/test_storage_sync.py
+
+from conftest import perf
+from storage import RowIndex, SheetsStorage, TABLES
+from tables import PerformancesTable, TableLoader
+
+
+def keys_of(fake) -> list:
+    return [row[0] for row in fake.worksheet("perfs")._values[1:]]
+
+
+# -------------------
+# RowIndex
+# -------------------
+
+def test_row_index_shifts_rows_below_deletions():
+    index = RowIndex(["perf_id"], ["P0", "P1", "P2", "P3"], "perf_id")
+    index.removed("P1")
+    assert index.row_of("P0") == 2
+    assert index.row_of("P1") is None
+    assert index.row_of("P3") == 4
+    assert index.count == 3
+
+
+def test_row_index_appended_after_deletions():
+    index = RowIndex(["perf_id"], ["P0", "P1", "P2"], "perf_id")
+    index.removed("P0")
+    index.appended(index.count + 2, ["P3", "P4"])
+    assert [index.row_of(k) for k in ["P1", "P2", "P3", "P4"]] == [2, 3, 4, 5]
+    assert index.count == 4
+
+
+# -------------------
+# load_delta / _unchanged
+# -------------------
+
+def test_append_then_delta(sheet):
+    fake, storage = sheet
+    records, watermark, full = storage.load_delta("performances")
+    assert full and len(records) == 5 and watermark["count"] == 5
+
+    fake.worksheet("perfs").append_rows([perf(5), perf(6)])
+    records, watermark, full = storage.load_delta("performances", watermark)
+    assert not full
+    assert [r["perf_id"] for r in records] == ["P5", "P6"]
+    assert watermark["count"] == 7 and watermark["last_key"] == "P6"
+
+    # Rien de nouveau : delta vide, watermark inchangé
+    records, same, full = storage.load_delta("performances", watermark)
+    assert (records, same, full) == ([], watermark, False)
+
+
+def test_delta_rows_are_known_to_the_index(sheet):
+    fake, storage = sheet
+    _, watermark, _ = storage.load_delta("performances")
+    fake.worksheet("perfs").append_rows([perf(5)])
+    storage.load_delta("performances", watermark)
+
+    reads = fake.calls["values_batch_get"]
+    assert storage.delete("performances", "P5")
+    assert keys_of(fake) == ["P0", "P1", "P2", "P3", "P4"]
+    assert fake.calls["values_batch_get"] == reads + 1  # vérification de la cellule, pas de relecture
+
+
+def test_delete_above_watermark_forces_full_reload(sheet):
+    fake, storage = sheet
+    _, watermark, _ = storage.load_delta("performances")
+
+    fake.worksheet("perfs").delete_rows(3)  # P1, fait à la main
+    records, watermark, full = storage.load_delta("performances", watermark)
+    assert full
+    assert [r["perf_id"] for r in records] == ["P0", "P2", "P3", "P4"]
+    assert watermark["count"] == 4
+
+
+def test_delete_and_append_keeping_count_forces_full_reload(sheet):
+    fake, storage = sheet
+    _, watermark, _ = storage.load_delta("performances")
+
+    fake.worksheet("perfs").delete_rows(2)
+    fake.worksheet("perfs").append_rows([perf(5)])
+    records, _, full = storage.load_delta("performances", watermark)
+    assert full
+    assert [r["perf_id"] for r in records] == ["P1", "P2", "P3", "P4", "P5"]
+
+
+def test_unchanged_detects_edited_last_row(sheet):
+    _, storage = sheet
+    _, watermark, _ = storage.load_delta("performances")
+    assert SheetsStorage._unchanged("performances", watermark, [str(v) for v in perf(4)])
+
+    edited = perf(4)
+    edited[4] = 12
+    assert not SheetsStorage._unchanged("performances", watermark, [str(v) for v in edited])
+    assert not SheetsStorage._unchanged("performances", watermark, [str(v) for v in perf(4, created="x")])
+
+
+def test_unchanged_on_empty_tab_compares_header(sheet):
+    _, storage = sheet
+    header = ["perf_id", "user_id"]
+    watermark = {"header": header, "count": 0, "last_key": "", "last_created": "", "last_crc": None}
+    assert SheetsStorage._unchanged("performances", watermark, header)
+    assert not SheetsStorage._unchanged("performances", watermark, ["perf_id", "other"])
+
+
+# -------------------
+# Suppressions après des ajouts
+# -------------------
+
+def test_delete_row_appended_by_someone_else(sheet):
+    fake, storage = sheet
+    storage.load("performances")
+
+    fake.worksheet("perfs").append_rows([perf(5)])  # autre worker / à la main
+    assert storage.delete("performances", "P5")
+    assert keys_of(fake) == ["P0", "P1", "P2", "P3", "P4"]
+
+
+def test_delete_after_own_appends(sheet):
+    fake, storage = sheet
+    storage.load("performances")
+
+    storage.append_many("performances", [perf(5), perf(6)])
+    assert storage.delete_many("performances", ["P1", "P6", "missing"]) == {"P1", "P6"}
+    assert keys_of(fake) == ["P0", "P2", "P3", "P4", "P5"]
+
+    # Numérotation décalée par les suppressions : la ligne suivante reste trouvée
+    assert storage.delete("performances", "P5")
+    assert keys_of(fake) == ["P0", "P2", "P3", "P4"]
+
+
+# -------------------
+# TableLoader (rafraîchissement incrémental du cache)
+# -------------------
+
+def test_loader_delta_applies_new_rows_in_place(sheet):
+    fake, storage = sheet
+    applied = []
+    loader = TableLoader(storage, "performances", PerformancesTable, "perf_id",
+                         on_applied=lambda name, op, row: applied.append((op, row.perf_id)))
+    table = loader()
+    version = table.version
+
+    assert loader() is table and table.version == version  # rien de nouveau
+    table.add(dict(zip(TABLES["performances"], perf(5))))  # écrite par ce worker, déjà en cache
+    fake.worksheet("perfs").append_rows([perf(5), perf(6)])
+
+    assert loader() is table
+    assert [r.perf_id for r in table.rows] == ["P0", "P1", "P2", "P3", "P4", "P5", "P6"]
+    assert applied == [("add", "P6")]
+    assert loader.stats()["delta_rows"] == 1 and loader.full_loads == 1
+
+
+def test_loader_full_reload_keeps_unchanged_table(sheet):
+    fake, storage = sheet
+    loader = TableLoader(storage, "performances", PerformancesTable, "perf_id", full_every=0)
+    table = loader()
+    version = table.version
+
+    assert loader() is table and table.version == version
+    assert loader.full_loads == 2
+
+    fake.worksheet("perfs").batch_update([{"range": "E3", "values": [[99]]}])  # P1 modifiée à la main
+    changed = loader()
+    assert changed is not table and changed.get("P1")._weight == 99
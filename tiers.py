@@ -0,0 +1,100 @@
+# tiers.py
+
+from bisect import bisect_right
+
+import numpy as np
+
+
+# -------------------
+# PALIERS (volume < borne -> palier) ; au-delà de la dernière borne : dernier palier
+# -------------------
+
+TIERS = (
+    (10_000, "Bronze I"),
+    (50_000, "Bronze II"),
+    (100_000, "Bronze III"),
+    (200_000, "Argent I"),
+    (400_000, "Argent II"),
+    (600_000, "Argent III"),
+    (800_000, "Or I"),
+    (1_200_000, "Or II"),
+    (1_600_000, "Or III"),
+    (2_000_000, "Diamant I"),
+    (2_600_000, "Diamant II"),
+    (3_200_000, "Diamant III"),
+    (4_000_000, "Mythique I"),
+    (5_000_000, "Mythique II"),
+    (6_000_000, "Mythique III"),
+    (7_500_000, "Légendaire I"),
+    (9_000_000, "Légendaire II"),
+    (10_000_000, "Légendaire III"),
+    (12_000_000, "Élite I"),
+    (15_000_000, "Élite II"),
+    (18_000_000, "Élite III"),
+    (22_000_000, "Maître I"),
+    (27_000_000, "Maître II"),
+    (32_000_000, "Maître III"),
+    (38_000_000, "Titan I"),
+    (45_000_000, "Titan II"),
+    (52_000_000, "Titan III"),
+    (60_000_000, "Ombre I"),
+    (75_000_000, "Ombre II"),
+    (100_000_000, "Ombre III"),
+)
+
+LIMITS = tuple(limit for limit, _ in TIERS)
+# Un nom de plus que de bornes : l'index len(LIMITS) = volume au-delà de la dernière borne
+NAMES = tuple(name for _, name in TIERS) + (TIERS[-1][1],)
+# Dernière bande (< 100M) et au-delà portent le même nom : sommet atteint dès TOP
+TOP = len(LIMITS) - 1
+
+_LIMITS = np.array(LIMITS, dtype=np.float64)
+_LIMITS.setflags(write=False)
+_NAMES = np.array(NAMES, dtype=object)
+_NAMES.setflags(write=False)
+
+
+def score_of(volume) -> int:
+    return int(volume / 10)
+
+
+# -------------------
+# UN SEUL VOLUME (bisect)
+# -------------------
+
+def tier_progress(volume) -> dict:
+    """Palier, score, prochain palier et volume manquant pour l'atteindre (None / 0 au sommet)."""
+    i = bisect_right(LIMITS, volume)
+    top = i >= TOP
+    return {
+        "tier": NAMES[i],
+        "score": score_of(volume),
+        "next_tier": None if top else NAMES[i + 1],
+        "to_next_tier": 0 if top else LIMITS[i] - volume,
+    }
+
+
+# -------------------
+# TABLEAU DE VOLUMES (NumPy, sans boucle Python)
+# -------------------
+
+def assign_tiers(volumes) -> dict:
+    """
+    volumes (séquence / ndarray) -> tableaux alignés :
+    - index : numéro du palier (len(LIMITS) au-delà de la dernière borne)
+    - tier : nom du palier
+    - score : volume / 10 tronqué
+    - next_tier : nom du palier suivant (None au sommet)
+    - to_next_tier : volume manquant pour y arriver (0 au sommet)
+    """
+    v = np.asarray(volumes, dtype=np.float64)
+    index = np.searchsorted(_LIMITS, v, side="right")
+    top = index >= TOP
+    nxt = np.minimum(index, TOP)
+    return {
+        "index": index,
+        "tier": _NAMES[index],
+        "score": np.trunc(v / 10).astype(np.int64),
+        "next_tier": np.where(top, None, _NAMES[nxt + 1]),
+        "to_next_tier": np.where(top, 0.0, _LIMITS[nxt] - v),
+    }
@@ -0,0 +1,93 @@
+# upstream.py
+
+import time
+
+import anyio
+import httpx
+from fastapi import HTTPException
+
+from metrics import Histogram
+
+
+GAS_SECONDS = Histogram("gas_request_duration_seconds", "Durée des appels au WebApp GAS (chat)", ["method", "outcome"])
+
+
+# -------------------
+# APPELS BLOQUANTS (gspread) -> threads dédiés, concurrence bornée
+# -------------------
+
+class BlockingUpstream:
+    """
+    gspread est synchrone : ses appels partent dans des threads, mais avec un
+    limiteur propre à l'upstream au lieu du threadpool partagé de Starlette.
+    Une requête qui attend Sheets ne bloque ni la boucle asyncio ni les autres endpoints.
+    """
+
+    def __init__(self, name: str, max_concurrency: int):
+        self.name = name
+        self.limiter = anyio.CapacityLimiter(max_concurrency)
+
+    async def run(self, fn, *args):
+        return await anyio.to_thread.run_sync(fn, *args, limiter=self.limiter)
+
+
+# -------------------
+# GOOGLE APPS SCRIPT (chat) -> client HTTP async mutualisé
+# -------------------
+
+class GasClient:
+    """
+    Client async vers le WebApp GAS du chat : un seul pool de connexions
+    keep-alive, nombre de requêtes simultanées borné.
+    """
+
+    def __init__(self, url: str, timeout: float = 10.0, max_concurrency: int = 20):
+        self.url = url
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._sem = anyio.Semaphore(max_concurrency)
+        self._client = None
+
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=True,  # GAS répond par un 302 vers googleusercontent
+                limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=10),
+            )
+
+    async def stop(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _require(self):
+        if not self.url:
+            raise HTTPException(status_code=500, detail="GS_CHAT_WEBAPP non défini (Railway env var manquante).")
+
+    async def _request(self, method: str, **kwargs):
+        self._require()
+        await self.start()
+        outcome = "error"
+        t0 = time.perf_counter()
+        try:
+            async with self._sem:
+                t0 = time.perf_counter()  # sans l'attente du sémaphore
+                r = await self._client.request(method, self.url, **kwargs)
+            outcome = str(r.status_code)
+            r.raise_for_status()
+            return r.json() if r.content else {}
+        except httpx.HTTPStatusError as e:
+            raise HTTPException(status_code=502, detail=f"GAS HTTPError {e.response.status_code}: {e.response.text}")
+        except ValueError:
+            raise HTTPException(status_code=502, detail=f"GAS {method} error: réponse non-JSON (status {r.status_code})")
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"GAS {method} error: {str(e)}")
+        finally:
+            GAS_SECONDS.observe(time.perf_counter() - t0, method=method, outcome=outcome)
+
+    async def get(self, params: dict):
+        return await self._request("GET", params=params)
+
+    async def post(self, payload: dict):
+        return await self._request("POST", json=payload)
@@ -0,0 +1,280 @@
+# writebehind.py
+
+import fcntl
+import glob
+import json
+import os
+import threading
+
+from storage import TABLES, PRIMARY_KEYS, matches
+
+
+def _as_record(table: str, row: list) -> dict:
+    """Ligne en attente -> dict au format get_all_records (booléens rendus comme Sheets)."""
+    record = dict(zip(TABLES[table], row))
+    for k, v in record.items():
+        if isinstance(v, bool):
+            record[k] = "TRUE" if v else "FALSE"
+    return record
+
+
+class WriteBehindStorage:
+    """
+    Écritures différées vers Google Sheets.
+    - chaque append est écrit + fsync dans un journal local (JSON lines) puis acquitté
+    - un thread envoie les lignes par lots (append_rows) toutes les `interval` s
+      ou dès qu'une table atteint `batch_size` lignes
+    - au démarrage, le journal est rejoué : rien n'est perdu si le process tombe
+    - un journal par process (<base>.<pid>.jsonl, verrou flock tant que le process vit) :
+      les workers uvicorn ne réécrivent jamais le journal d'un autre ; au démarrage,
+      les journaux non verrouillés (process mort) sont repris par un worker
+    - un envoi en échec (5xx, timeout) a pu être appliqué : avant de le renvoyer, on
+      cherche ses clés dans la fin de l'onglet (Sheets ne rejoue pas les écritures)
+    Les lectures renvoient les lignes du Sheet + celles encore en attente.
+    """
+
+    def __init__(self, inner, journal_path: str, interval: float = 2.0, batch_size: int = 50):
+        self.inner = inner
+        base, ext = os.path.splitext(journal_path)
+        self.journal_base = journal_path
+        self.journal_path = f"{base}.{os.getpid()}{ext or '.jsonl'}"
+        self.interval = interval
+        self.batch_size = batch_size
+
+        self._lock = threading.Lock()          # pending + journal
+        self._flush_lock = threading.Lock()    # un seul flush à la fois
+        self._pending = {t: [] for t in TABLES}  # table -> [(seq, row)]
+        self._seq = 0
+        self._journal = None
+        self._in_doubt = set()  # tables dont le dernier append_rows a échoué
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---------- journal ----------
+
+    def _journals(self) -> list:
+        """Journaux des autres process (et ancien journal unique, sans pid)."""
+        base, ext = os.path.splitext(self.journal_base)
+        paths = [self.journal_base] + sorted(glob.glob(f"{glob.escape(base)}.*{ext or '.jsonl'}"))
+        return [p for p in paths if p != self.journal_path and not p.endswith(".tmp")]
+
+    def _read_journal(self, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # ligne tronquée (crash pendant l'écriture)
+                yield entry
+
+    def _replay(self):
+        """Journal de ce pid (redémarrage) + journaux orphelins ; appelé sous _lock."""
+        if os.path.exists(self.journal_path):
+            for entry in self._read_journal(self.journal_path):
+                self._seq = max(self._seq, entry["seq"])
+                self._pending[entry["table"]].append((entry["seq"], entry["row"]))
+
+        adopted = orphans = 0
+        for path in self._journals():
+            try:
+                f = open(path, "r+b")
+            except FileNotFoundError:
+                continue
+            with f:
+                try:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # process vivant
+                if os.fstat(f.fileno()).st_nlink == 0:
+                    continue  # déjà repris par un autre worker
+                for entry in self._read_journal(path):
+                    self._seq += 1
+                    self._pending[entry["table"]].append((self._seq, entry["row"]))
+                    adopted += 1
+                orphans += 1
+                # Lignes reprises dans notre journal (fsync) avant de supprimer l'orphelin
+                self._compact()
+                os.unlink(path)
+
+        count = self.pending_count()
+        if count:
+            print(f"📒 Journal write-behind: {count} ligne(s) à renvoyer vers Sheets"
+                  + (f" (dont {adopted} reprise(s) de {orphans} journal(aux) orphelin(s))" if adopted else ""))
+
+    @staticmethod
+    def _line(table: str, seq: int, row: list) -> str:
+        return json.dumps({"seq": seq, "table": table, "row": row}, ensure_ascii=False, default=str) + "\n"
+
+    def _compact(self):
+        """Réécrit le journal avec les seules lignes encore en attente (appelé sous _lock)."""
+        tmp = self.journal_path + ".tmp"
+        f = open(tmp, "w", encoding="utf-8")
+        # Verrouillé avant d'être visible : jamais pris pour un orphelin
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        for table, entries in self._pending.items():
+            for seq, row in entries:
+                f.write(self._line(table, seq, row))
+        f.flush()
+        os.fsync(f.fileno())
+
+        os.replace(tmp, self.journal_path)
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = f
+
+    def _open_journal(self):
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        fcntl.flock(self._journal.fileno(), fcntl.LOCK_EX)
+
+    # ---------- cycle de vie ----------
+
+    def start(self):
+        self.inner.start()
+        with self._lock:
+            self._open_journal()
+            self._replay()
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._flush_loop, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=30)
+            self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"⚠️ Write-behind: {self.pending_count()} ligne(s) restent dans le journal: {e}")
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        self.inner.stop()
+
+    def _flush_loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️ Write-behind flush: {e}")
+                self._stop.wait(self.interval)
+
+    def flush(self):
+        """Envoie chaque table en attente en un seul append_rows."""
+        pk_index = {t: TABLES[t].index(PRIMARY_KEYS[t]) for t in TABLES}
+        with self._flush_lock:
+            for table in TABLES:
+                with self._lock:
+                    batch = list(self._pending[table])
+                if not batch:
+                    continue
+
+                if table in self._in_doubt:
+                    # Envoi précédent peut-être appliqué : pas de doublon
+                    present = self.inner.existing_keys(table, [row[pk_index[table]] for _, row in batch])
+                    self._in_doubt.discard(table)
+                    if present:
+                        self._sent(table, {seq for seq, row in batch if str(row[pk_index[table]]) in present})
+                        batch = [(seq, row) for seq, row in batch if str(row[pk_index[table]]) not in present]
+                        if not batch:
+                            continue
+
+                try:
+                    self.inner.append_many(table, [row for _, row in batch])
+                except Exception:
+                    self._in_doubt.add(table)
+                    raise
+
+                self._sent(table, {seq for seq, _ in batch})
+
+    def _sent(self, table: str, sent: set):
+        with self._lock:
+            self._pending[table] = [e for e in self._pending[table] if e[0] not in sent]
+            self._compact()
+
+    def pending_count(self) -> int:
+        return sum(len(v) for v in self._pending.values())
+
+    # ---------- API stockage ----------
+
+    def _with_pending(self, table: str, rows: list) -> list:
+        with self._lock:
+            pending = [_as_record(table, row) for _, row in self._pending[table]]
+        if not pending:
+            return rows
+
+        # Un flush a pu aboutir entre la lecture et ici : pas de doublon
+        pk = PRIMARY_KEYS[table]
+        seen = {str(r.get(pk)) for r in rows}
+        return rows + [r for r in pending if str(r.get(pk)) not in seen]
+
+    def load(self, table: str) -> list:
+        return self._with_pending(table, self.inner.load(table))
+
+    def load_delta(self, table: str, watermark: dict = None):
+        rows, watermark, full = self.inner.load_delta(table, watermark)
+        return self._with_pending(table, rows), watermark, full
+
+    def find(self, table: str, **filters) -> list:
+        return [r for r in self.load(table) if matches(r, filters)]
+
+    def append(self, table: str, row: list):
+        self.append_many(table, [row])
+
+    def append_many(self, table: str, rows: list):
+        with self._lock:
+            for row in rows:
+                self._seq += 1
+                self._journal.write(self._line(table, self._seq, row))
+                self._pending[table].append((self._seq, row))
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            full = len(self._pending[table]) >= self.batch_size
+
+        if full:
+            self._wake.set()
+
+    def update(self, table: str, key: str, values: dict) -> bool:
+        key = str(key)
+        columns = TABLES[table]
+        pk_index = columns.index(PRIMARY_KEYS[table])
+
+        with self._flush_lock:
+            with self._lock:
+                for _, row in self._pending[table]:
+                    if str(row[pk_index]) == key:
+                        # Pas encore dans le Sheet : on modifie la ligne en attente
+                        for c, v in values.items():
+                            row[columns.index(c)] = v
+                        self._compact()
+                        return True
+
+            return self.inner.update(table, key, values)
+
+    def delete(self, table: str, key: str) -> bool:
+        return str(key) in self.delete_many(table, [key])
+
+    def delete_many(self, table: str, keys: list) -> set:
+        keys = {str(k) for k in keys}
+        pk_index = TABLES[table].index(PRIMARY_KEYS[table])
+
+        # Sérialisé avec le flush : une ligne "en vol" est forcément arrivée dans le Sheet
+        with self._flush_lock:
+            with self._lock:
+                entries = self._pending[table]
+                local = {str(row[pk_index]) for _, row in entries} & keys
+                if local:
+                    self._pending[table] = [e for e in entries if str(e[1][pk_index]) not in local]
+                    self._compact()
+
+            remote = keys - local
+            return local | (self.inner.delete_many(table, list(remote)) if remote else set())